@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import User, Topic, Room, Message
+from .models import User, Topic, Room, Message, Vote, Job
 
 admin.site.register(User)
 admin.site.register(Topic)
 admin.site.register(Room)
 admin.site.register(Message)
+admin.site.register(Vote)
+admin.site.register(Job)
@@ -0,0 +1,16 @@
+from django.urls import path
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# Same routes as base.urls, the read-heavy pages are served by async views
+async_pages = {
+    'home-page': async_views.home_view,
+    'topic-page': async_views.topic_view,
+    'room-page': async_views.room_view,
+    'profile-page': async_views.profile_view,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), async_pages.get(pattern.name, pattern.callback), name=pattern.name)
+    for pattern in sync_urlpatterns
+]
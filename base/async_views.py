@@ -0,0 +1,131 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponseForbidden, HttpResponseNotFound
+from django.shortcuts import render
+from .models import Topic, Room, User
+from .tracking import view_recorder
+from . import activity, conditional, views
+
+
+# Async versions of the read-heavy pages, served by forum.asgi (see base.async_urls).
+# Django 3.2 has no async ORM yet, so independent queries run concurrently in worker threads.
+# Writes are delegated to the sync views.
+
+def in_thread(func):
+    """Runs func in a worker thread, with the thread's own database connection."""
+    @sync_to_async(thread_sensitive=False)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+@in_thread
+def get_popular_rooms():
+    return Room.get_popular()
+
+
+@in_thread
+def get_object_or_none(queryset, **kwargs):
+    return queryset.filter(**kwargs).first()
+
+
+@in_thread
+def get_list(queryset):
+    return list(queryset)
+
+
+async def render_async(request, template_name, context):
+    # Rendering touches request.user and lazy relations, it stays in the request's thread
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def home_view(request):
+    # Access checks touch request.user, which is loaded in the request's thread
+    visible = await sync_to_async(Topic.visible_filter)(request.user)
+    topics, popular_rooms = await asyncio.gather(get_list(Topic.objects.filter(visible)), get_popular_rooms())
+    context = {'topics': topics, 'popular_rooms': popular_rooms}
+    return await render_async(request, 'base/home.html', context)
+
+
+async def topic_view(request, key):
+    topic = await get_object_or_none(Topic.objects.all(), id=key)
+    if topic is None:
+        return HttpResponseNotFound()
+    if not await sync_to_async(Topic.is_visible)(topic.id, topic.is_restricted, request.user):
+        return HttpResponseForbidden()
+    validators = await sync_to_async(conditional.topic_validators)(request, topic)
+    response = conditional.not_modified(request, *validators)
+    if response is not None:
+        return response
+    rooms, popular_rooms = await asyncio.gather(
+        get_list(Room.objects.filter(topic=key).select_related('host')),
+        get_popular_rooms(),
+    )
+    context = {'rooms': rooms,
+               'topic_name': topic.name,
+               'description': topic.description,
+               'topic_key': key,
+               'popular_rooms': popular_rooms}
+    response = await render_async(request, 'base/topic_rooms.html', context)
+    return conditional.set_validators(response, *validators)
+
+
+@in_thread
+def get_room_pagination(request, room):
+    pagination = views.room_pagination(request, room)
+    pagination['messages_to_render'] = list(pagination['messages_to_render'])
+    return pagination
+
+
+async def room_view(request, key):
+    if request.method != 'GET':
+        return await sync_to_async(views.room_view)(request, key)
+    room = await get_object_or_none(Room.objects.select_related('topic', 'host'), id=key)
+    if room is None:
+        return HttpResponseNotFound()
+    if room.topic and not await sync_to_async(Topic.is_visible)(room.topic_id, room.topic.is_restricted, request.user):
+        return HttpResponseForbidden()
+
+    if await sync_to_async(lambda: request.user.is_authenticated)():
+        view_recorder.record(room.id, request.user.id)
+    validators = await sync_to_async(conditional.room_validators)(request, room)
+    response = conditional.not_modified(request, *validators)
+    if response is not None:
+        return response
+    pagination, popular_rooms = await asyncio.gather(
+        get_room_pagination(request, room),
+        get_popular_rooms(),
+    )
+    context = {'room': room,
+               'popular_rooms': popular_rooms,
+               **pagination}
+    response = await render_async(request, 'base/room.html', context)
+    return conditional.set_validators(response, *validators)
+
+
+async def profile_view(request, key):
+    if request.method != 'GET':
+        return await sync_to_async(views.profile_view)(request, key)
+    profile_user, popular_rooms = await asyncio.gather(
+        get_object_or_none(User.objects.all(), id=key),
+        get_popular_rooms(),
+    )
+    if profile_user is None:
+        return HttpResponseNotFound()
+    is_modifications_allowed = await sync_to_async(lambda: request.user == profile_user)()
+    querysets = await sync_to_async(activity.feed_querysets)(profile_user.id, request.user, request.GET.get('cursor'),
+                                                             settings.ACTIVITY_PER_PAGE)
+    results = await asyncio.gather(*(get_list(queryset) for name, queryset in querysets))
+    context = {'profile_user': profile_user,
+               'is_modifications_allowed': is_modifications_allowed,
+               'activity': activity.merge([(name, objects) for (name, queryset), objects in zip(querysets, results)],
+                                          settings.ACTIVITY_PER_PAGE),
+               'popular_rooms': popular_rooms}
+    return await render_async(request, 'base/profile.html', context)
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = 'user_%s'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend loading the logged in user of every request from the cache.
+    Cached users are dropped whenever the user is saved or deleted (see base.signals)
+    and expire after USER_CACHE_TTL seconds.
+    """
+
+    def get_user(self, user_id):
+        key = USER_KEY % user_id
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TTL)
+        return user if self.user_can_authenticate(user) else None
+
+    @staticmethod
+    def invalidate(user_id):
+        cache.delete(USER_KEY % user_id)
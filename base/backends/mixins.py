@@ -0,0 +1,42 @@
+import time
+
+from base.performance import record_connection
+
+
+class ConnectionMixin:
+    """
+    Health checks of persistent connections, like CONN_HEALTH_CHECKS of Django 4.1:
+    a connection kept between requests (CONN_MAX_AGE) is tested with is_usable() before
+    the first query of the next request and replaced when the server dropped it.
+    The time spent connecting and checking is recorded by base.performance.
+    """
+
+    health_check_done = False
+
+    @property
+    def health_checks_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def connect(self):
+        # A new connection needs no check, connect() itself already runs ensure_connection()
+        self.health_check_done = True
+        start = time.perf_counter()
+        super().connect()
+        record_connection(time.perf_counter() - start)
+
+    def ensure_connection(self):
+        # Transactions are never interrupted, a dropped connection fails them anyway
+        if self.connection is not None and self.health_checks_enabled and not self.health_check_done \
+                and not self.in_atomic_block:
+            self.health_check_done = True
+            start = time.perf_counter()
+            if self.is_usable():
+                record_connection(time.perf_counter() - start)
+            else:
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        # Runs when requests start and finish, the next request checks the connection again
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
@@ -0,0 +1,90 @@
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of at most `size` DB-API connections.
+    acquire() returns an idle connection or opens a new one, and waits up to `timeout` seconds
+    when all of them are in use. Idle connections older than `max_idle` seconds are closed,
+    servers and firewalls drop them anyway.
+    """
+
+    def __init__(self, size=10, timeout=10, max_idle=300):
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        # (connection, released at), the most recently used connection is reused first
+        self._idle = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self.opened = self.waits = 0
+        self.wait_time = 0.0
+
+    def acquire(self, connect):
+        """Returns a pooled connection, or one opened with connect()."""
+        start = time.monotonic()
+        stale = []
+        with self._condition:
+            while self._idle and start - self._idle[0][1] > self.max_idle:
+                stale.append(self._idle.pop(0)[0])
+                self._open -= 1
+            if not self._idle and self._open >= self.size:
+                self.waits += 1
+                while not self._idle and self._open >= self.size:
+                    remaining = start + self.timeout - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout('All %s connections are in use' % self.size)
+                    self._condition.wait(remaining)
+                self.wait_time += time.monotonic() - start
+            if self._idle:
+                connection = self._idle.pop()[0]
+            else:
+                connection = None
+                self._open += 1
+                self.opened += 1
+        for old in stale:
+            close_quietly(old)
+        if connection is not None:
+            return connection
+        try:
+            return connect()
+        except BaseException:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, connection, discard=False):
+        """Returns connection to the pool, or closes it when discard is true."""
+        with self._condition:
+            if discard:
+                self._open -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+        if discard:
+            close_quietly(connection)
+
+    def close_idle(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for connection, released in idle:
+            close_quietly(connection)
+
+    def stats(self):
+        with self._condition:
+            return {'size': self.size, 'open': self._open, 'idle': len(self._idle), 'opened': self.opened,
+                    'waits': self.waits, 'wait_time': self.wait_time}
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
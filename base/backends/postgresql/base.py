@@ -0,0 +1,59 @@
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from ..mixins import ConnectionMixin
+from ..pool import ConnectionPool
+
+# {(process, alias, connection parameters): ConnectionPool}, shared by the threads of a process
+pools = {}
+pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(ConnectionMixin, base.DatabaseWrapper):
+    """
+    PostgreSQL backend with health checks (CONN_HEALTH_CHECKS) and an optional connection pool,
+    OPTIONS 'pool': {'size': 10, 'timeout': 10, 'max_idle': 300} (see base.backends.pool).
+    With a pool, closing a connection returns it to the pool, so CONN_MAX_AGE should be 0:
+    every request takes a connection for its duration, and a process needs at most `size`
+    connections whatever the number of threads serving it.
+    """
+
+    pool = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        pool_options = params.pop('pool', None)
+        if pool_options is not None:
+            key = (os.getpid(), self.alias, tuple(sorted((name, str(value)) for name, value in params.items())))
+            with pools_lock:
+                if key not in pools:
+                    pools[key] = ConnectionPool(**pool_options)
+                self.pool = pools[key]
+        return params
+
+    def get_new_connection(self, conn_params):
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        connection = self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # The pool may return a connection opened by another thread's wrapper
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level', connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        # A connection closed inside a transaction stays referenced by this wrapper until
+        # the outermost atomic block exits, it must not be handed to another thread
+        discard = connection.closed or self.errors_occurred or self.in_atomic_block
+        if not discard:
+            try:
+                # Rolls back an open transaction and resets session settings
+                connection.reset()
+            except base.Database.Error:
+                discard = True
+        self.pool.release(connection, discard)
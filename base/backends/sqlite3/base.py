@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+from ..mixins import ConnectionMixin
+
+
+class DatabaseWrapper(ConnectionMixin, base.DatabaseWrapper):
+    """
+    SQLite backend with health checks (see base.backends.mixins) and two more OPTIONS,
+    named like their Django 5.1 counterparts: init_command, statements (PRAGMAs) run on every
+    new connection, and transaction_mode, e.g. IMMEDIATE to take the write lock when a
+    transaction starts. A deferred transaction that reads first and writes later fails with
+    "database is locked" instead of waiting whenever another connection wrote in between.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.init_command = params.pop('init_command', None)
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for statement in (self.init_command or '').split(';'):
+            if statement.strip():
+                connection.execute(statement)
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute('BEGIN %s' % self.transaction_mode)
+        else:
+            super()._start_transaction_under_autocommit()
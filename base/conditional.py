@@ -0,0 +1,65 @@
+import hashlib
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .models import Room, Notification
+
+
+# Validators of conditional GETs (If-None-Match / If-Modified-Since) for room and topic pages.
+# They are computed from the room, or one aggregate query over the rooms of a topic, so an unchanged
+# page is answered with 304 Not Modified before its messages, rooms and popular rooms are loaded or rendered.
+# Pages show relative times and the popular rooms, validators change at least every
+# CONDITIONAL_GET_INTERVAL seconds and with the popular rooms version.
+
+def interval_start():
+    # Start of the current CONDITIONAL_GET_INTERVAL, as an aware datetime
+    seconds = time.time() // settings.CONDITIONAL_GET_INTERVAL * settings.CONDITIONAL_GET_INTERVAL
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def page_validators(request, parts, modified):
+    """Returns (etag, last_modified timestamp or None) of a page built from `parts` and last changed at `modified`."""
+    modified = max(filter(None, (modified, interval_start())))
+    user = request.user
+    # The navbar shows the unread notifications of logged in users
+    viewer = (user.id, Notification.get_unread_count(user)) if user.is_authenticated else None
+    data = repr((*parts, viewer, Room.get_popular_version(), modified))
+    etag = quote_etag(hashlib.md5(data.encode()).hexdigest())
+    # Pages differ per user, a Last-Modified date alone can't tell a logged in user's copy from
+    # an anonymous one, so only anonymous pages get one
+    return etag, None if user.is_authenticated else int(modified.timestamp())
+
+
+def room_validators(request, room):
+    # Posting, editing, deleting and voting bump room.updated, posts and deletes also message_count.
+    # Reading the latest message instead scans every index entry of the room.
+    page = (request.GET.get('page'), request.GET.get('cursor'))
+    return page_validators(request, ('room', room.id, room.updated, room.message_count, page), room.updated)
+
+
+def topic_validators(request, topic):
+    rooms = Room.objects.filter(topic=topic.id).aggregate(
+        count=Count('id'), updated=Max('updated'), messages=Sum('message_count'),
+        participants=Sum('participant_count'), viewers=Sum('viewer_count'))
+    return page_validators(request, ('topic', topic.id, topic.name, topic.description, *rooms.values()),
+                           rooms['updated'])
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Browsers revalidate every time, shared caches must not store per-user pages
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    """Returns a 304 response when the client's copy is still valid, None otherwise."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return None if response is None else set_validators(response, etag, last_modified)
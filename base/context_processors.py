@@ -0,0 +1,9 @@
+from .models import Notification
+
+
+def notifications(request):
+    # Looked up only by templates showing the count, from the cache
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notifications': lambda: Notification.get_unread_count(user)}
@@ -0,0 +1,47 @@
+import csv
+import json
+
+from .models import Message
+
+
+# Streaming export of messages in the archive format read by base.importer.
+# Rows are ordered by id and read with iterator(), so memory does not depend on the number of messages.
+# An interrupted export is resumed by passing the id of the last received row as `after`.
+
+FIELDS = ('id', 'room', 'user', 'answer_to', 'content', 'created', 'is_changed', 'plus_count', 'minus_count')
+COLUMNS = ('id', 'room_id', 'user_id', 'answer_to_id', 'content', 'created', 'is_changed',
+           'plus_count', 'minus_count')
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Line:
+    # csv.writer target returning the formatted line instead of storing it
+    def write(self, value):
+        return value
+
+
+def export_messages(messages, format='jsonl', after=None, chunk_size=2000):
+    """Yields lines of the messages of the queryset, answers refer to their thread by answer_to."""
+    if after is not None:
+        messages = messages.filter(id__gt=after)
+    rows = messages.order_by('id').values_list(*COLUMNS).iterator(chunk_size=chunk_size)
+    created = COLUMNS.index('created')
+    if format == 'csv':
+        writer = csv.writer(Line())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            yield writer.writerow(row[:created] + (row[created].isoformat(),) + row[created + 1:])
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(FIELDS, row)), default=lambda value: value.isoformat()) + '\n'
+
+
+def room_messages(room_id):
+    return Message.objects.filter(room_id=room_id)
+
+
+def topic_messages(topic_id):
+    return Message.objects.filter(room__topic_id=topic_id)
@@ -0,0 +1,62 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+
+# Cached room, topic and message cards.
+# A card is stored under a key built from everything it shows (id, version, counters...),
+# so a changed object simply gets a new key and the stale entry expires on its own.
+
+STATS_KEY = 'card_cache_%s_%s'
+
+
+class FragmentStats:
+    """
+    Counts cache hits and misses of cards in memory, they are added to the shared cache
+    after the response (see flush) so `manage.py card_cache_stats` can read them.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name, hit):
+        with self._lock:
+            self._counts[(name, 'hits' if hit else 'misses')] += 1
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        for (name, kind), count in counts.items():
+            key = STATS_KEY % (name, kind)
+            cache.add(key, 0, None)
+            cache.incr(key, count)
+        return counts
+
+    @staticmethod
+    def read(names):
+        """Returns {name: (hits, misses)} of the shared counters."""
+        values = cache.get_many([STATS_KEY % (name, kind) for name in names for kind in ('hits', 'misses')])
+        return {name: (values.get(STATS_KEY % (name, 'hits'), 0), values.get(STATS_KEY % (name, 'misses'), 0))
+                for name in names}
+
+    @staticmethod
+    def reset(names):
+        cache.delete_many([STATS_KEY % (name, kind) for name in names for kind in ('hits', 'misses')])
+
+
+fragment_stats = FragmentStats()
+
+
+def render_card(name, vary_on, render):
+    """Returns the cached card, or the result of render() which is cached for the next time."""
+    key = make_template_fragment_key('card_%s' % name, vary_on)
+    content = cache.get(key)
+    fragment_stats.record(name, content is not None)
+    if content is None:
+        content = render()
+        cache.set(key, content, settings.CARD_CACHE_TTL)
+    return content
@@ -0,0 +1,172 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import User, Topic, Room, Message, Vote
+from . import search
+
+
+# Synthetic forum data for benchmarks and local testing (`manage.py generate_data`).
+# Everything is inserted with bulk_create and explicit ids, so signals are skipped;
+# counters and the search index are rebuilt once at the end.
+# The same seed always produces the same data on an empty database.
+
+PASSWORD = 'password'
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    # Lets bulk_create store given `created`/`updated`-like values instead of the current time
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def reset_sequences(*models):
+    # Rows inserted with explicit ids don't advance sequences (PostgreSQL), the next insert would reuse their ids
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def skewed_weights(count, exponent=1.0):
+    # A few rooms and users get most of the activity, like on a real forum
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(users=100, topics=10, rooms=100, messages=5000, reply_ratio=0.5, votes=3, viewers=20,
+             days=90, seed=0, batch_size=5000, index=True, log=lambda line: None):
+    """
+    Inserts users, topics, rooms, messages with answers, votes and room viewers.
+    votes and viewers are averages per message and per room. Returns the number of created rows per model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+    created = {}
+
+    with transaction.atomic():
+        first_user = next_id(User)
+        password = make_password(PASSWORD)
+        user_ids = list(range(first_user, first_user + users))
+        User.objects.bulk_create(
+            (User(id=user_id, username='user%s' % user_id, email='user%s@example.com' % user_id, password=password,
+                  first_name='First%s' % user_id, last_name='Last%s' % user_id) for user_id in user_ids),
+            batch_size=batch_size)
+        created['users'] = users
+        log('%s users' % users)
+
+        first_topic = next_id(Topic)
+        topic_ids = list(range(first_topic, first_topic + topics))
+        Topic.objects.bulk_create(
+            Topic(id=topic_id, name='Topic %s' % topic_id, description='Description of topic %s' % topic_id)
+            for topic_id in topic_ids)
+        created['topics'] = topics
+        log('%s topics' % topics)
+
+        first_room = next_id(Room)
+        room_ids = list(range(first_room, first_room + rooms))
+        room_started = {room_id: start + timedelta(seconds=rng.uniform(0, days * 86400 / 2)) for room_id in room_ids}
+        # Messages are generated in time order, a room's last message time becomes its `updated`
+        room_updated = dict(room_started)
+
+        message_times = sorted(rng.uniform(days * 86400 / 2, days * 86400) for _ in range(messages))
+        message_rooms = rng.choices(room_ids, skewed_weights(rooms), k=messages)
+        message_users = rng.choices(user_ids, skewed_weights(users, 0.7), k=messages)
+        first_message = next_id(Message)
+        roots = {room_id: [] for room_id in room_ids}
+        participants = set()
+
+        def message_rows():
+            for offset, seconds in enumerate(message_times):
+                message_id = first_message + offset
+                room_id, user_id = message_rooms[offset], message_users[offset]
+                answer_to = None
+                if roots[room_id] and rng.random() < reply_ratio:
+                    # Recent threads get most of the answers
+                    answer_to = roots[room_id][-1 - min(int(rng.expovariate(0.3)), len(roots[room_id]) - 1)]
+                else:
+                    roots[room_id].append(message_id)
+                time = start + timedelta(seconds=seconds)
+                room_updated[room_id] = time
+                participants.add((room_id, user_id))
+                yield Message(id=message_id, content='Message %s %s' % (message_id, rng.choice(WORDS)),
+                              user_id=user_id, room_id=room_id, answer_to_id=answer_to, created=time)
+
+        with explicit_timestamps(Message._meta.get_field('created')):
+            for batch in batches(message_rows(), batch_size):
+                Message.objects.bulk_create(batch)
+        created['messages'] = messages
+
+        with explicit_timestamps(Room._meta.get_field('created'), Room._meta.get_field('updated')):
+            Room.objects.bulk_create(
+                (Room(id=room_id, name='Room %s' % room_id, description='Description of room %s' % room_id,
+                      host_id=rng.choice(user_ids), topic_id=rng.choice(topic_ids),
+                      created=room_started[room_id], updated=room_updated[room_id]) for room_id in room_ids),
+                batch_size=batch_size)
+        created['rooms'] = rooms
+        log('%s rooms, %s messages' % (rooms, messages))
+
+        through = Room.participants.through
+        through.objects.bulk_create((through(room_id=room_id, user_id=user_id) for room_id, user_id in participants),
+                                    batch_size=batch_size)
+        through = Room.viewers.through
+        viewer_rows = set()
+        for room_id in room_ids:
+            for user_id in rng.sample(user_ids, min(users, int(rng.expovariate(1 / viewers)) if viewers else 0)):
+                viewer_rows.add((room_id, user_id))
+        viewer_rows |= participants
+        through.objects.bulk_create((through(room_id=room_id, user_id=user_id) for room_id, user_id in viewer_rows),
+                                    batch_size=batch_size)
+        created['viewers'] = len(viewer_rows)
+
+        def vote_rows():
+            for message_id in range(first_message, first_message + messages):
+                count = min(users, int(rng.expovariate(1 / votes))) if votes else 0
+                for user_id in rng.sample(user_ids, count):
+                    yield Vote(message_id=message_id, user_id=user_id,
+                               value=Vote.PLUS if rng.random() < 0.75 else Vote.MINUS)
+
+        created['votes'] = 0
+        for batch in batches(vote_rows(), batch_size):
+            Vote.objects.bulk_create(batch)
+            created['votes'] += len(batch)
+        log('%s votes, %s viewers' % (created['votes'], created['viewers']))
+
+        Topic.update_counters()
+        Room.update_counters(Room.objects.filter(id__gte=first_room))
+        Message.update_counters(Message.objects.filter(id__gte=first_message))
+        reset_sequences(User, Topic, Room, Message)
+    Room.invalidate_popular()
+    if index:
+        log('%s documents indexed' % search.rebuild(batch_size))
+    return created
+
+
+WORDS = ['django', 'python', 'database', 'query', 'index', 'cache', 'template', 'server', 'release',
+         'question', 'answer', 'performance', 'memory', 'thread', 'async', 'websocket', 'search', 'vote']
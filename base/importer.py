@@ -0,0 +1,316 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .generator import batches, explicit_timestamps, reset_sequences
+from .models import User, Topic, Room, Message, Vote
+from . import generator, search
+
+
+# Streaming import of forum archives (`manage.py import_forum`).
+# Every file is read row by row and written with bulk_create in transactions of chunk_size rows,
+# so memory only grows with the id maps: archive id -> id in this database, one int pair per row.
+# Rows get new ids; users, topics and rooms already in the database are matched by email or name.
+# Answers to answers are attached to the thread they belong to, the forum shows a single level of answers.
+# Counters, participants and the search index are rebuilt once at the end.
+
+KINDS = ('users', 'topics', 'rooms', 'messages', 'votes')
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def read_rows(path):
+    """Yields dicts of a .jsonl or .csv file, empty csv values become None."""
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.suffix == '.csv':
+            for row in csv.DictReader(file):
+                yield {name: value if value != '' else None for name, value in row.items()}
+        else:
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as error:
+                        raise ArchiveError('%s, line %s: %s' % (path.name, number, error))
+
+
+def find_files(directory):
+    """Returns {kind: path} of the exports found in directory."""
+    files = {}
+    for kind in KINDS:
+        for suffix in ('.jsonl', '.csv'):
+            path = Path(directory) / (kind + suffix)
+            if path.exists():
+                files[kind] = path
+                break
+    return files
+
+
+def key(value):
+    # Archive ids are compared as strings, csv and jsonl files of one archive may be mixed
+    return None if value is None else str(value)
+
+
+def thread_root(parents, message_id):
+    """Returns the message starting the thread of message_id, None for answers in a cycle."""
+    seen = set()
+    while message_id in parents:
+        if message_id in seen:
+            return None
+        seen.add(message_id)
+        message_id = parents[message_id][0]
+    return message_id
+
+
+def parse_time(value, default):
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ArchiveError('Invalid date: %s' % value)
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def parse_bool(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def parse_vote(value):
+    value = str(value).strip()
+    if value in ('1', '+', '+1', 'plus'):
+        return Vote.PLUS
+    if value in ('-1', '-', 'minus'):
+        return Vote.MINUS
+    raise ArchiveError('Invalid vote value: %s' % value)
+
+
+class ForumImporter:
+    def __init__(self, batch_size=2000, chunk_size=20000, log=lambda line: None):
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.log = log
+        self.ids = {kind: {} for kind in KINDS}
+        self.first_ids = {}
+        self.skipped = {kind: 0 for kind in KINDS}
+        self.now = timezone.now()
+
+    def run(self, directory, index=True):
+        """Imports the files found in directory, returns {kind: (rows, seconds)}."""
+        files = find_files(directory)
+        if not files:
+            raise ArchiveError('No %s files (.jsonl or .csv) in %s' % ('/'.join(KINDS), directory))
+        report = {}
+        for kind in KINDS:
+            if kind in files:
+                start = time.perf_counter()
+                rows = getattr(self, 'import_%s' % kind)(read_rows(files[kind]))
+                report[kind] = rows, time.perf_counter() - start
+                self.log('%s: %s rows in %.1f s, %.0f rows/s%s' % (
+                    kind, rows, report[kind][1], rows / max(report[kind][1], 1e-9),
+                    ', %s skipped' % self.skipped[kind] if self.skipped[kind] else ''))
+        start = time.perf_counter()
+        self.finish(index)
+        report['rebuild'] = 0, time.perf_counter() - start
+        return report
+
+    def import_chunks(self, kind, rows, import_chunk):
+        count = 0
+        for chunk in batches(rows, self.chunk_size):
+            with transaction.atomic():
+                import_chunk(chunk)
+            count += len(chunk)
+        return count - self.skipped[kind]
+
+    def existing(self, model, field, values):
+        # Rows already in the database are reused instead of duplicated
+        existing = {}
+        for batch in batches(values, self.batch_size):
+            existing.update(model.objects.filter(**{field + '__in': batch}).values_list(field, 'id'))
+        return existing
+
+    def usernames(self, rows, next_id):
+        """
+        Returns the usernames of new users, cut to the length of the field. Names already taken get a number
+        appended, None stands for rows whose name is taken even then, they are skipped.
+        """
+        length = User._meta.get_field('username').max_length
+        names = [(row.get('username') or row['email'])[:length] for row in rows]
+        taken = set(self.existing(User, 'username', names))
+        used = set()
+        for index, name in enumerate(names):
+            if name in taken or name in used:
+                suffix = '_%s' % (next_id + index)
+                name = name[:length - len(suffix)] + suffix
+            names[index] = None if name in used else name
+            used.add(name)
+        taken = set(self.existing(User, 'username', [name for name in names if name is not None]))
+        return [None if name in taken else name for name in names]
+
+    def import_users(self, rows):
+        self.first_ids['users'] = next_id = generator.next_id(User)
+        ids = self.ids['users']
+
+        def import_chunk(chunk):
+            nonlocal next_id
+            existing = self.existing(User, 'email', [row['email'] for row in chunk])
+            new_rows = []
+            for row in chunk:
+                if row['email'] in existing:
+                    ids[key(row['id'])] = existing[row['email']]
+                else:
+                    existing[row['email']] = None
+                    new_rows.append(row)
+            users = []
+            for row, username in zip(new_rows, self.usernames(new_rows, next_id)):
+                if username is None:
+                    self.skipped['users'] += 1
+                    continue
+                ids[key(row['id'])] = next_id
+                users.append(User(
+                    id=next_id, email=row['email'], username=username,
+                    first_name=row.get('first_name') or '', last_name=row.get('last_name') or '',
+                    # Hashes are taken as they are, users without one have to reset their password
+                    password=row.get('password') or make_password(None),
+                    date_joined=parse_time(row.get('date_joined'), self.now)))
+                next_id += 1
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+
+        return self.import_chunks('users', rows, import_chunk)
+
+    def import_topics(self, rows):
+        self.first_ids['topics'] = next_id = generator.next_id(Topic)
+        ids = self.ids['topics']
+
+        def import_chunk(chunk):
+            nonlocal next_id
+            existing = self.existing(Topic, 'name', [row['name'] for row in chunk])
+            topics = []
+            for row in chunk:
+                if row['name'] in existing:
+                    ids[key(row['id'])] = existing[row['name']]
+                    continue
+                ids[key(row['id'])] = existing[row['name']] = next_id
+                topics.append(Topic(id=next_id, name=row['name'], description=row.get('description'),
+                                    is_restricted=parse_bool(row.get('is_restricted'))))
+                next_id += 1
+            Topic.objects.bulk_create(topics, batch_size=self.batch_size)
+
+        return self.import_chunks('topics', rows, import_chunk)
+
+    def import_rooms(self, rows):
+        self.first_ids['rooms'] = next_id = generator.next_id(Room)
+        ids, users, topics = self.ids['rooms'], self.ids['users'], self.ids['topics']
+
+        def import_chunk(chunk):
+            nonlocal next_id
+            existing = self.existing(Room, 'name', [row['name'] for row in chunk])
+            rooms = []
+            for row in chunk:
+                if row['name'] in existing:
+                    ids[key(row['id'])] = existing[row['name']]
+                    continue
+                ids[key(row['id'])] = existing[row['name']] = next_id
+                created = parse_time(row.get('created'), self.now)
+                rooms.append(Room(id=next_id, name=row['name'], description=row.get('description'),
+                                  host_id=users.get(key(row.get('host'))),
+                                  topic_id=topics.get(key(row.get('topic'))),
+                                  is_closed=parse_bool(row.get('is_closed')), created=created,
+                                  updated=parse_time(row.get('updated'), created)))
+                next_id += 1
+            Room.objects.bulk_create(rooms, batch_size=self.batch_size)
+
+        with explicit_timestamps(Room._meta.get_field('created'), Room._meta.get_field('updated')):
+            return self.import_chunks('rooms', rows, import_chunk)
+
+    def import_messages(self, rows):
+        self.first_ids['messages'] = next_id = generator.next_id(Message)
+        ids, users, rooms = self.ids['messages'], self.ids['users'], self.ids['rooms']
+        # Answers to messages further down the file, set once the whole file is imported
+        forward = []
+        # answer id -> (id of the message it answers, answer_to_id it was inserted with)
+        parents = {}
+        seen_participants = set()
+
+        def import_chunk(chunk):
+            nonlocal next_id
+            messages, participants = [], set()
+            for row in chunk:
+                room_id, user_id = rooms.get(key(row.get('room'))), users.get(key(row.get('user')))
+                if room_id is None or user_id is None:
+                    self.skipped['messages'] += 1
+                    continue
+                answer_to = key(row.get('answer_to'))
+                parent = ids.get(answer_to)
+                answer_to_id = None
+                if answer_to is not None and parent is None:
+                    forward.append((next_id, answer_to))
+                elif parent is not None:
+                    # Root as far as it is known, answers to forward references are fixed below
+                    answer_to_id = thread_root(parents, parent)
+                    parents[next_id] = parent, answer_to_id
+                ids[key(row['id'])] = next_id
+                messages.append(Message(id=next_id, content=row.get('content') or '', user_id=user_id,
+                                        room_id=room_id, answer_to_id=answer_to_id,
+                                        is_changed=parse_bool(row.get('is_changed')),
+                                        created=parse_time(row.get('created'), self.now)))
+                if (room_id, user_id) not in seen_participants:
+                    participants.add((room_id, user_id))
+                next_id += 1
+            Message.objects.bulk_create(messages, batch_size=self.batch_size)
+            seen_participants.update(participants)
+            through = Room.participants.through
+            through.objects.bulk_create(
+                [through(room_id=room_id, user_id=user_id) for room_id, user_id in participants],
+                batch_size=self.batch_size, ignore_conflicts=True)
+
+        with explicit_timestamps(Message._meta.get_field('created')):
+            count = self.import_chunks('messages', rows, import_chunk)
+        for message_id, answer_to in forward:
+            # Answers to messages missing from the archive become threads
+            if answer_to in ids:
+                parents[message_id] = ids[answer_to], None
+        changed = []
+        for message_id, (parent, answer_to_id) in parents.items():
+            root = thread_root(parents, parent)
+            if root != answer_to_id:
+                changed.append(Message(id=message_id, answer_to_id=root))
+        for chunk in batches(changed, self.chunk_size):
+            with transaction.atomic():
+                Message.objects.bulk_update(chunk, ['answer_to'], batch_size=self.batch_size)
+        return count
+
+    def import_votes(self, rows):
+        messages, users = self.ids['messages'], self.ids['users']
+
+        def import_chunk(chunk):
+            votes = []
+            for row in chunk:
+                message_id, user_id = messages.get(key(row.get('message'))), users.get(key(row.get('user')))
+                if message_id is None or user_id is None:
+                    self.skipped['votes'] += 1
+                    continue
+                votes.append(Vote(message_id=message_id, user_id=user_id, value=parse_vote(row['value']),
+                                  created=parse_time(row.get('created'), self.now)))
+            # A second vote of the same user for the same message is dropped
+            Vote.objects.bulk_create(votes, batch_size=self.batch_size, ignore_conflicts=True)
+
+        with explicit_timestamps(Vote._meta.get_field('created')):
+            return self.import_chunks('votes', rows, import_chunk)
+
+    def finish(self, index):
+        with transaction.atomic():
+            reset_sequences(User, Topic, Room, Message)
+            Topic.update_counters()
+            Room.update_counters()
+            if 'messages' in self.first_ids:
+                Message.update_counters(Message.objects.filter(id__gte=self.first_ids['messages']))
+        Room.invalidate_popular()
+        if index:
+            self.log('search index: %s documents' % search.rebuild(self.batch_size))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from base.fragments import FragmentStats
+
+CARDS = ('room', 'topic', 'message')
+
+
+class Command(BaseCommand):
+    help = 'Shows cache hits and misses of rendered room, topic and message cards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='reset the counters after showing them')
+
+    def handle(self, *args, **options):
+        for name, (hits, misses) in FragmentStats.read(CARDS).items():
+            total = hits + misses
+            self.stdout.write('%-8s %8s hits %8s misses %6.1f%% hit rate' % (
+                name, hits, misses, 100 * hits / total if total else 0))
+        if options['reset']:
+            FragmentStats.reset(CARDS)
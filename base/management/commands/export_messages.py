@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from base.export import export_messages, room_messages, topic_messages, FORMATS
+from base.models import Room, Topic
+
+
+class Command(BaseCommand):
+    help = 'Streams messages of a room or a topic as JSONL or CSV, in the format read by import_forum'
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--room', type=int)
+        scope.add_argument('--topic', type=int)
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--after', type=int, help='resume after the message with this id')
+        parser.add_argument('--output', help='file to write to instead of the standard output')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['room'] is not None:
+            if not Room.objects.filter(id=options['room']).exists():
+                raise CommandError('Room %s does not exist' % options['room'])
+            messages = room_messages(options['room'])
+        else:
+            if not Topic.objects.filter(id=options['topic']).exists():
+                raise CommandError('Topic %s does not exist' % options['topic'])
+            messages = topic_messages(options['topic'])
+        lines = export_messages(messages, options['format'], options['after'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+                file.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
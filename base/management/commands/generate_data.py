@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from base import generator
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with synthetic users, topics, rooms, messages, votes and viewers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--topics', type=int, default=10)
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--messages', type=int, default=5000)
+        parser.add_argument('--reply-ratio', type=float, default=0.5, help='share of messages answering a thread')
+        parser.add_argument('--votes', type=float, default=3, help='average votes per message')
+        parser.add_argument('--viewers', type=float, default=20, help='average viewers per room')
+        parser.add_argument('--days', type=int, default=90, help='period the messages are spread over')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-index', action='store_true', help='do not rebuild the search index')
+
+    def handle(self, *args, **options):
+        created = generator.generate(
+            users=options['users'], topics=options['topics'], rooms=options['rooms'],
+            messages=options['messages'], reply_ratio=options['reply_ratio'], votes=options['votes'],
+            viewers=options['viewers'], days=options['days'], seed=options['seed'],
+            batch_size=options['batch_size'], index=not options['no_index'],
+            log=lambda line: self.stdout.write('  ' + line) if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS('Generated %s' % ', '.join(
+            '%s %s' % (count, name) for name, count in created.items())))
+        self.stdout.write('Every user can log in with the password "%s"' % generator.PASSWORD)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from base.importer import ForumImporter, ArchiveError, KINDS
+
+
+class Command(BaseCommand):
+    help = ('Imports a forum archive: a directory with %s files, each in .jsonl or .csv format'
+            % ', '.join(KINDS))
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--batch-size', type=int, default=2000, help='rows per INSERT')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='rows per transaction')
+        parser.add_argument('--no-index', action='store_true', help='do not rebuild the search index')
+
+    def handle(self, *args, **options):
+        importer = ForumImporter(options['batch_size'], options['chunk_size'], log=self.stdout.write)
+        try:
+            report = importer.run(options['directory'], index=not options['no_index'])
+        except (ArchiveError, KeyError) as error:
+            raise CommandError('Import failed: %s' % (error if isinstance(error, ArchiveError)
+                                                      else 'missing column %s' % error))
+        rows = sum(count for count, _ in report.values())
+        seconds = sum(elapsed for _, elapsed in report.values())
+        self.stdout.write(self.style.SUCCESS('Imported %s rows in %.1f s, %.0f rows/s' % (
+            rows, seconds, rows / max(seconds, 1e-9))))
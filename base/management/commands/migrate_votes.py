@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from base.models import Message, Vote
+
+
+OLD_TABLES = (('base_message_pluses', Vote.PLUS), ('base_message_minuses', Vote.MINUS))
+
+
+class Command(BaseCommand):
+    help = 'Moves votes from the old pluses/minuses tables of messages to the vote table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop-old-tables', action='store_true',
+                            help='drop the old tables once their votes are copied')
+
+    def handle(self, *args, **options):
+        existing = set(connection.introspection.table_names())
+        tables = [(table, value) for table, value in OLD_TABLES if table in existing]
+        if not tables:
+            self.stdout.write('No old vote tables found')
+            return
+        vote_table = connection.ops.quote_name(Vote._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Pluses go first, a user found in both tables keeps the plus
+            for table, value in tables:
+                cursor.execute('INSERT INTO %s (message_id, user_id, value, created) '
+                               'SELECT message_id, user_id, %%s, %%s FROM %s WHERE true '
+                               'ON CONFLICT DO NOTHING' % (vote_table, connection.ops.quote_name(table)),
+                               [value, timezone.now()])
+                self.stdout.write('%s: %s votes copied' % (table, cursor.rowcount))
+            Message.update_counters()
+            if options['drop_old_tables']:
+                for table, _ in tables:
+                    cursor.execute('DROP TABLE %s' % connection.ops.quote_name(table))
+        self.stdout.write(self.style.SUCCESS('Votes migrated'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from base.models import Job
+from base.performance import ViewStats, METRICS
+from base.tasks import queue_lag
+
+
+class Command(BaseCommand):
+    help = 'Shows query count, database time, connection time, render time and latency percentiles of every view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='only show the given URL name')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Task queue: %s jobs waiting, %s failed, lag %.1f s' % (
+            Job.objects.exclude(status=Job.FAILED).count(), Job.objects.filter(status=Job.FAILED).count(), queue_lag()))
+        snapshots = ViewStats.read()
+        if not snapshots:
+            self.stdout.write('No published metrics, they are published after requests of running servers')
+        for process, summary in snapshots.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(process))
+            for view_name, stats in sorted(summary.items()):
+                if options['view'] and view_name != options['view']:
+                    continue
+                self.stdout.write('  %s: %s requests, %s over the query budget' % (
+                    view_name, stats['requests'], stats['over_budget']))
+                for metric in METRICS:
+                    p50, p95, p99, maximum = stats[metric]
+                    if metric == 'queries':
+                        self.stdout.write('    %-12s p50 %7d   p95 %7d   p99 %7d   max %7d' % (
+                            metric, p50, p95, p99, maximum))
+                    else:
+                        self.stdout.write('    %-12s p50 %7.1f   p95 %7.1f   p99 %7.1f   max %7.1f ms' % (
+                            metric, p50 * 1000, p95 * 1000, p99 * 1000, maximum * 1000))
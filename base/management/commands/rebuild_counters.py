@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from base.models import Topic, Room, Message
+
+
+class Command(BaseCommand):
+    help = 'Recalculates denormalized counters of topics, rooms and messages from scratch'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Topic.update_counters()
+            Room.update_counters()
+            Message.update_counters()
+        self.stdout.write(self.style.SUCCESS('Counters rebuilt'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from base import search
+
+
+class Command(BaseCommand):
+    help = 'Recreates the full-text search index of topics, rooms and messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        total = search.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Indexed %s documents' % total))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from base.models import Room
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the cached popular rooms leaderboard, meant to be run on a schedule'
+
+    def handle(self, *args, **options):
+        rooms = Room.get_popular(refresh=True)
+        self.stdout.write(self.style.SUCCESS('Popular rooms refreshed: %s' % ', '.join(room.name for room in rooms)))
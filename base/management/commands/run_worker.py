@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from base import tasks
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background tasks until stopped, or until the queue is drained with --once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='exit once no job is due')
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                count = tasks.work(options['batch_size'])
+                total += count
+                if not count:
+                    if options['once']:
+                        break
+                    time.sleep(settings.TASK_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Ran %s jobs' % total))
@@ -1,6 +1,19 @@
-from django.db import models
-from django.db.models import Count
+import threading
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, Subquery, OuterRef, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+
+
+def count_subquery(queryset, group_by):
+    # Correlated COUNT(*) usable in update(), 0 when there are no rows
+    counts = queryset.order_by().values(group_by).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts), Value(0))
 
 
 class User(AbstractUser):
@@ -16,11 +29,77 @@ class Topic(models.Model):
     description = models.TextField(null=True, blank=True)
     is_restricted = models.BooleanField(default=False)
     whitelist = models.ManyToManyField(User, related_name='whitelist', blank=True)
+    room_count = models.PositiveIntegerField(default=0)
+
+    @staticmethod
+    def get_whitelisted_ids(user):
+        # Ids of the topics whose whitelist includes user, cached until the whitelists of user change
+        if not user.is_authenticated:
+            return frozenset()
+        return cache.get_or_set('topic_whitelist_%s' % user.id, lambda: frozenset(
+            Topic.whitelist.through.objects.filter(user_id=user.id).values_list('topic_id', flat=True)),
+            settings.TOPIC_WHITELIST_TTL)
+
+    @staticmethod
+    def invalidate_whitelisted_ids(user_ids):
+        cache.delete_many(['topic_whitelist_%s' % user_id for user_id in user_ids])
+
+    @staticmethod
+    def get_restricted_ids():
+        # Ids of all restricted topics, cached until a topic is saved or deleted
+        return cache.get_or_set('topic_restricted', lambda: frozenset(
+            Topic.objects.filter(is_restricted=True).values_list('id', flat=True)), settings.TOPIC_WHITELIST_TTL)
+
+    @staticmethod
+    def invalidate_restricted_ids():
+        cache.delete('topic_restricted')
+
+    @staticmethod
+    def is_visible(topic_id, is_restricted, user):
+        # Restricted topics, their rooms and messages are only shown to whitelisted users
+        return not is_restricted or user.is_superuser or topic_id in Topic.get_whitelisted_ids(user)
+
+    @staticmethod
+    def visible_filter(user, path=''):
+        """
+        Q of the rows user may see, for topics (path '') or for models reaching their topic
+        through path, e.g. 'topic__' for rooms. Rows without a topic are visible.
+        """
+        if user.is_superuser:
+            return Q()
+        visible = Q(**{path + 'is_restricted': False}) | Q(**{path + 'id__in': Topic.get_whitelisted_ids(user)})
+        return visible | Q(**{path + 'isnull': True}) if path else visible
+
+    @staticmethod
+    def update_counters(topics=None):
+        topics = Topic.objects.all() if topics is None else topics
+        topics.update(room_count=count_subquery(Room.objects.filter(topic=OuterRef('pk')), 'topic'))
 
     def __str__(self):
         return self.name
 
 
+class DeletedRooms(threading.local):
+    """
+    Ids of the rooms being deleted by this thread, base.signals skips the handlers of their messages.
+    Cleared when the delete returns, whether it succeeded or not.
+    """
+
+    def __init__(self):
+        self.ids = set()
+
+
+deleted_rooms = DeletedRooms()
+
+
+class RoomQuerySet(models.QuerySet):
+    def delete(self):
+        try:
+            return super().delete()
+        finally:
+            deleted_rooms.ids.clear()
+
+
 class Room(models.Model):
     name = models.CharField(max_length=30, unique=True)
     description = models.TextField(null=True, blank=True)
@@ -32,18 +111,85 @@ class Room(models.Model):
     updated = models.DateTimeField(auto_now=True)
     created = models.DateTimeField(auto_now_add=True)
     closed = models.DateTimeField(null=True, blank=True)
+    message_count = models.PositiveIntegerField(default=0)
+    participant_count = models.PositiveIntegerField(default=0)
+    viewer_count = models.PositiveIntegerField(default=0)
+
+    objects = RoomQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['updated']), models.Index(fields=['host', 'created', 'id'])]
+
+    def delete(self, *args, **kwargs):
+        try:
+            return super().delete(*args, **kwargs)
+        finally:
+            deleted_rooms.ids.clear()
 
     @staticmethod
-    def get_popular():
-        if Room.objects.all().count() > 5:
-            return Room.objects.annotate(p_count=Count('participants')).order_by('-p_count')[:5]
-        else:
+    def get_popular_version():
+        return cache.get_or_set('popular_rooms_version', 1, None)
+
+    @staticmethod
+    def get_popular(refresh=False):
+        # The list is cached under a version that is bumped on every change of participants
+        version = Room.get_popular_version()
+        rooms = None if refresh else cache.get('popular_rooms', version=version)
+        if rooms is None:
+            rooms = Room.compute_popular()
+            cache.set('popular_rooms', rooms, settings.POPULAR_ROOMS_TTL, version=version)
+        return rooms
+
+    @staticmethod
+    def compute_popular():
+        # Only recently active rooms are ranked, so the cost does not grow with the total number of rooms
+        # The list is shared by all users, rooms of restricted topics are left out
+        rooms = Room.objects.filter(Q(topic=None) | Q(topic__is_restricted=False))
+        candidates = list(rooms.select_related('host').order_by('-updated')[:settings.POPULAR_ROOMS_CANDIDATES])
+        if len(candidates) <= 5:
             return []
+        now = timezone.now()
+        candidates.sort(key=lambda room: room.hot_score(now), reverse=True)
+        return candidates[:5]
+
+    @staticmethod
+    def invalidate_popular():
+        try:
+            cache.incr('popular_rooms_version')
+        except ValueError:
+            cache.set('popular_rooms_version', 1, None)
+
+    def get_thread_count(self):
+        # Keyed on the message counter, so any posted or deleted message makes the cached value stale
+        return cache.get_or_set('room_%s_threads_%s' % (self.id, self.message_count),
+                                lambda: self.message_set.filter(answer_to=None).count(),
+                                settings.ROOM_THREAD_COUNT_TTL)
+
+    def hot_score(self, now):
+        # Participants count decayed by hours since the last activity in the room
+        age_hours = max((now - self.updated).total_seconds(), 0) / 3600
+        return self.participant_count / (age_hours + 2) ** settings.POPULAR_ROOMS_GRAVITY
+
+    @staticmethod
+    def update_counters(rooms=None):
+        rooms = Room.objects.all() if rooms is None else rooms
+        rooms.update(
+            message_count=count_subquery(Message.objects.filter(room=OuterRef('pk')), 'room'),
+            participant_count=count_subquery(
+                Room.participants.through.objects.filter(room=OuterRef('pk')), 'room'),
+            viewer_count=count_subquery(Room.viewers.through.objects.filter(room=OuterRef('pk')), 'room'),
+        )
 
     def __str__(self):
         return self.name
 
 
+class MessageQuerySet(models.QuerySet):
+    def for_rendering(self):
+        # Answers are not loaded with their threads, pages fetch them on demand (message-replies-page)
+        return self.select_related('user')
+
+
 class Message(models.Model):
     content = models.TextField()
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -51,13 +197,207 @@ class Message(models.Model):
     answer_to = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True)
     is_changed = models.BooleanField(default=False)
-    pluses = models.ManyToManyField(User, related_name='pluses', blank=True)
-    minuses = models.ManyToManyField(User, related_name='minuses', blank=True)
+    plus_count = models.PositiveIntegerField(default=0)
+    minus_count = models.PositiveIntegerField(default=0)
+    score = models.IntegerField(default=0)
+    # Number of answers, only kept for thread roots
+    reply_count = models.PositiveIntegerField(default=0)
+    # Bumped on every change of the rendered message, cached cards are keyed on it
+    version = models.PositiveIntegerField(default=0)
+
+    objects = MessageQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created']
         get_latest_by = ['created']
+        # The second one serves the activity feed of profile pages (base.activity)
+        indexes = [
+            models.Index(fields=['room', 'answer_to', 'created']),
+            models.Index(fields=['user', 'created', 'id']),
+        ]
+
+    @staticmethod
+    def edit(message_id, content):
+        """Replaces the content of the message, keeping the old one as a revision. Returns False if unchanged."""
+        with transaction.atomic():
+            message = Message.objects.select_for_update().get(id=message_id)
+            if message.content == content:
+                return False
+            MessageRevision.objects.create(message=message, **MessageRevision.pack(message.content))
+            message.content = content
+            message.is_changed = True
+            # Only the card of this message is rendered again, see base.fragments
+            message.version = F('version') + 1
+            message.save(update_fields=['content', 'is_changed', 'version'])
+            # Changes the validators of the room page (base.conditional)
+            Room.objects.filter(id=message.room_id).update(updated=timezone.now())
+        return True
+
+    @staticmethod
+    def update_counters(messages=None):
+        messages = Message.objects.all() if messages is None else messages
+        messages.update(
+            plus_count=count_subquery(Vote.objects.filter(message=OuterRef('pk'), value=Vote.PLUS), 'message'),
+            minus_count=count_subquery(Vote.objects.filter(message=OuterRef('pk'), value=Vote.MINUS), 'message'),
+            reply_count=count_subquery(Message.objects.filter(answer_to=OuterRef('pk')), 'answer_to'),
+            version=F('version') + 1,
+        )
+        messages.update(score=F('plus_count') - F('minus_count'))
 
     def __str__(self):
         return self.content
 
+
+class MessageRevision(models.Model):
+    # Content a message had before an edit, rows are only ever inserted.
+    # Content is stored zlib-compressed when that makes it smaller, short messages rarely are.
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='revisions')
+    content = models.BinaryField()
+    is_compressed = models.BooleanField(default=False)
+    # When the content was replaced
+    created = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def pack(text):
+        data = text.encode()
+        compressed = zlib.compress(data, 9)
+        if len(compressed) < len(data):
+            return {'content': compressed, 'is_compressed': True}
+        return {'content': data, 'is_compressed': False}
+
+    @property
+    def text(self):
+        # PostgreSQL returns memoryview
+        data = bytes(self.content)
+        return (zlib.decompress(data) if self.is_compressed else data).decode()
+
+    def __str__(self):
+        return self.text
+
+
+class Vote(models.Model):
+    PLUS = 1
+    MINUS = -1
+
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='votes')
+    value = models.SmallIntegerField(choices=[(PLUS, '+'), (MINUS, '-')])
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['message', 'user'], name='unique_vote')]
+        indexes = [models.Index(fields=['user', 'created', 'id'])]
+
+    @staticmethod
+    def toggle(message_id, user, value):
+        """
+        Votes for the message with value, takes the vote back if it was already given,
+        returns the user's vote after the change (0 if there is none).
+        """
+        try:
+            with transaction.atomic():
+                if Vote.objects.filter(message_id=message_id, user=user, value=value).delete()[0]:
+                    changes, vote = {value: -1}, 0
+                elif Vote.objects.filter(message_id=message_id, user=user).update(value=value, created=timezone.now()):
+                    changes, vote = {value: 1, -value: -1}, value
+                else:
+                    Vote.objects.create(message_id=message_id, user=user, value=value)
+                    changes, vote = {value: 1}, value
+                Message.objects.filter(id=message_id).update(
+                    plus_count=F('plus_count') + changes.get(Vote.PLUS, 0),
+                    minus_count=F('minus_count') + changes.get(Vote.MINUS, 0),
+                    score=F('score') + sum(sign * change for sign, change in changes.items()),
+                    version=F('version') + 1,
+                )
+        except IntegrityError:
+            # A concurrent request of the same user has just voted, the unique constraint kept a single vote
+            vote = Vote.objects.filter(message_id=message_id, user=user).values_list('value', flat=True).first() or 0
+        return vote
+
+    def __str__(self):
+        return '%s%s' % ('+' if self.value == Vote.PLUS else '-', self.message_id)
+
+
+class Notification(models.Model):
+    # Replies to a thread the user started or answered. In digest mode (NOTIFICATIONS_DIGEST) replies
+    # arriving while the user's notification of the thread is unread are added to it, so there is
+    # at most one unread row per user and thread.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    thread = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='+')
+    # Latest of the replies
+    message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, related_name='+')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=1)
+    is_read = models.BooleanField(default=False)
+    updated = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-updated']
+        indexes = [models.Index(fields=['user', 'is_read', 'thread']), models.Index(fields=['user', 'updated'])]
+
+    @staticmethod
+    def notify(user_ids, thread_id, message_id, actor_id):
+        """Notifies users of the reply message_id to thread_id, with one bulk insert."""
+        now = timezone.now()
+        user_ids = set(user_ids)
+        if settings.NOTIFICATIONS_DIGEST:
+            unread = Notification.objects.filter(user__in=user_ids, thread=thread_id, is_read=False)
+            digested = set(unread.values_list('user_id', flat=True))
+            if digested:
+                unread.update(count=F('count') + 1, message=message_id, actor=actor_id, updated=now)
+            new = user_ids - digested
+        else:
+            new = user_ids
+        Notification.objects.bulk_create([Notification(user_id=user_id, thread_id=thread_id, message_id=message_id,
+                                                        actor_id=actor_id, updated=now) for user_id in new])
+        Notification.invalidate_unread_count(user_ids)
+        transaction.on_commit(lambda: Notification.invalidate_unread_count(user_ids))
+
+    @staticmethod
+    def get_unread_count(user):
+        # Number of unread replies, cached until the user's notifications change
+        return cache.get_or_set('notifications_unread_%s' % user.id, lambda: Notification.objects.filter(
+            user=user.id, is_read=False).aggregate(count=Coalesce(Sum('count'), 0))['count'],
+            settings.NOTIFICATIONS_COUNT_TTL)
+
+    @staticmethod
+    def invalidate_unread_count(user_ids):
+        cache.delete_many(['notifications_unread_%s' % user_id for user_id in user_ids])
+
+    @staticmethod
+    def mark_all_read(user):
+        Notification.objects.filter(user=user.id, is_read=False).update(is_read=True)
+        Notification.invalidate_unread_count([user.id])
+        transaction.on_commit(lambda: Notification.invalidate_unread_count([user.id]))
+
+    def __str__(self):
+        return '%s replies to %s' % (self.count, self.thread_id)
+
+
+class Job(models.Model):
+    # Queued call of a task of base.tasks, deleted once it succeeded
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, default=PENDING,
+                              choices=[(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')])
+    # When the job is due, while running when the lease of its worker expires
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    @staticmethod
+    def due(now):
+        # Jobs a worker may claim: pending ones and running ones whose worker has died
+        return Job.objects.filter(status__in=[Job.PENDING, Job.RUNNING], run_at__lte=now)
+
+    def __str__(self):
+        return '%s #%s' % (self.name, self.id)
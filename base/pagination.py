@@ -0,0 +1,63 @@
+import base64
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+# Keyset pagination over querysets ordered newest first by (created, id).
+# Cursors are opaque to clients: urlsafe base64 of [direction, created, id].
+# Bounds are written as `created <= x AND (created < x OR id < y)`, a plain OR of both
+# conditions makes SQLite give up the index range scan.
+
+def encode_cursor(direction, obj):
+    data = json.dumps([direction, obj.created.isoformat(), obj.id])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        direction, created, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created = parse_datetime(created)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    if direction not in ('next', 'prev') or created is None or not isinstance(key, int):
+        return None
+    return direction, created, key
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_page(queryset, cursor, per_page):
+    """Returns page of `queryset` after (older than) or before (newer than) the position in `cursor`."""
+    position = decode_cursor(cursor) if cursor else None
+    if position is None:
+        items = list(queryset.order_by('-created', '-id')[:per_page + 1])
+        has_more, has_less = len(items) > per_page, False
+        items = items[:per_page]
+    else:
+        direction, created, key = position
+        if direction == 'next':
+            items = list(queryset.filter(Q(created__lt=created) | Q(id__lt=key), created__lte=created)
+                         .order_by('-created', '-id')[:per_page + 1])
+            has_more, has_less = len(items) > per_page, True
+            items = items[:per_page]
+        else:
+            items = list(queryset.filter(Q(created__gt=created) | Q(id__gt=key), created__gte=created)
+                         .order_by('created', 'id')[:per_page + 1])
+            has_more, has_less = True, len(items) > per_page
+            items = items[:per_page][::-1]
+
+    next_cursor = encode_cursor('next', items[-1]) if items and has_more else None
+    prev_cursor = encode_cursor('prev', items[0]) if items and has_less else None
+    return KeysetPage(items, next_cursor, prev_cursor)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template import TemplateDoesNotExist
+from django.utils.decorators import sync_and_async_middleware
+
+
+# Per-view query count, database time, connection setup time, template render time and latency.
+# Every request collects its numbers in a RequestMetrics bound to a context variable, which follows
+# the request into the worker threads of async views. Numbers of the last PERFORMANCE_WINDOW requests
+# of every URL name are kept in memory and published to the cache for `manage.py performance_report`.
+
+logger = logging.getLogger(__name__)
+
+# Sent when a request runs more queries than the budget of its view
+query_budget_exceeded = Signal()
+
+METRICS = ('queries', 'db_time', 'connect_time', 'render_time', 'total_time')
+PROCESSES_KEY = 'performance_processes'
+SNAPSHOT_KEY = 'performance_%s'
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.connections = 0
+        self.connect_time = 0.0
+        self.render_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_query(self, duration):
+        # Queries of async views run concurrently, so db_time may exceed the latency
+        with self._lock:
+            self.queries += 1
+            self.db_time += duration
+
+    def add_connection(self, duration):
+        with self._lock:
+            self.connections += 1
+            self.connect_time += duration
+
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection (see base.signals), only counts queries made while handling a request
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(time.perf_counter() - start)
+
+
+def record_connection(duration):
+    # Called by the backends of base.backends for new, pooled and health checked connections
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.add_connection(duration)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            # Includes queries of querysets evaluated by the template
+            metrics.render_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend measuring render time of templates rendered by views."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def percentile(samples, percent):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class ViewStats:
+    """Rolling window of request metrics per URL name."""
+
+    def __init__(self):
+        self._samples = defaultdict(lambda: deque(maxlen=settings.PERFORMANCE_WINDOW))
+        self._requests = defaultdict(int)
+        self._over_budget = defaultdict(int)
+        self._published = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, view_name, metrics, total_time, over_budget=False):
+        with self._lock:
+            self._samples[view_name].append((metrics.queries, metrics.db_time, metrics.connect_time,
+                                             metrics.render_time, total_time))
+            self._requests[view_name] += 1
+            self._over_budget[view_name] += over_budget
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._requests.clear()
+            self._over_budget.clear()
+
+    def summary(self):
+        """Returns {view_name: {'requests': n, 'over_budget': n, metric: (p50, p95, p99, max)}}."""
+        with self._lock:
+            samples = {view_name: list(window) for view_name, window in self._samples.items()}
+        report = {}
+        for view_name, rows in samples.items():
+            report[view_name] = {'requests': self._requests[view_name], 'over_budget': self._over_budget[view_name]}
+            for index, metric in enumerate(METRICS):
+                values = [row[index] for row in rows]
+                report[view_name][metric] = (percentile(values, 50), percentile(values, 95),
+                                             percentile(values, 99), max(values))
+        return report
+
+    def publish_if_due(self):
+        if time.monotonic() - self._published >= settings.PERFORMANCE_PUBLISH_INTERVAL:
+            self.publish()
+
+    def publish(self):
+        self._published = time.monotonic()
+        process = '%s:%s' % (socket.gethostname(), os.getpid())
+        cache.set(SNAPSHOT_KEY % process, self.summary(), settings.PERFORMANCE_SNAPSHOT_TTL)
+        processes = cache.get(PROCESSES_KEY, set())
+        if process not in processes:
+            cache.set(PROCESSES_KEY, processes | {process}, None)
+
+    @staticmethod
+    def read():
+        """Returns {process: summary} of the published snapshots."""
+        processes = sorted(cache.get(PROCESSES_KEY, set()))
+        snapshots = cache.get_many([SNAPSHOT_KEY % process for process in processes])
+        return {process: snapshots[SNAPSHOT_KEY % process] for process in processes
+                if SNAPSHOT_KEY % process in snapshots}
+
+
+view_stats = ViewStats()
+
+
+def query_budget(view_name):
+    return settings.PERFORMANCE_QUERY_BUDGETS.get(view_name, settings.PERFORMANCE_QUERY_BUDGET)
+
+
+def server_timing(metrics, total_time):
+    return 'db;dur=%.1f;desc="%s queries", tpl;dur=%.1f, total;dur=%.1f, conn;dur=%.1f;desc="%s connections"' % (
+        metrics.db_time * 1000, metrics.queries, metrics.render_time * 1000, total_time * 1000,
+        metrics.connect_time * 1000, metrics.connections)
+
+
+def finish_request(request, response, metrics, start):
+    total_time = time.perf_counter() - start
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match else '<unresolved>'
+    budget = query_budget(view_name)
+    over_budget = budget is not None and metrics.queries > budget
+    if over_budget:
+        logger.warning('%s ran %s queries, the budget is %s (%s)', view_name, metrics.queries, budget, request.path)
+        query_budget_exceeded.send(sender=ViewStats, view_name=view_name, request=request,
+                                   queries=metrics.queries, budget=budget)
+    view_stats.add(view_name, metrics, total_time, over_budget)
+    if settings.PERFORMANCE_SERVER_TIMING:
+        response['Server-Timing'] = server_timing(metrics, total_time)
+
+
+@sync_and_async_middleware
+def performance_middleware(get_response):
+    """Records query count, database time, render time and latency of every request, should come first."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics, start = RequestMetrics(), time.perf_counter()
+            token = current_metrics.set(metrics)
+            try:
+                response = await get_response(request)
+            finally:
+                current_metrics.reset(token)
+            finish_request(request, response, metrics, start)
+            return response
+    else:
+        def middleware(request):
+            metrics, start = RequestMetrics(), time.perf_counter()
+            token = current_metrics.set(metrics)
+            try:
+                response = get_response(request)
+            finally:
+                current_metrics.reset(token)
+            finish_request(request, response, metrics, start)
+            return response
+    return middleware
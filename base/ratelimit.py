@@ -0,0 +1,112 @@
+import logging
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+
+# Token buckets limiting how often users (by id) and anonymous clients (by IP address) may post,
+# vote, create rooms or try to log in. RATE_LIMITS maps a scope to (requests, seconds): bursts of
+# up to `requests`, refilled at requests / seconds. A bucket is stored as a single timestamp,
+# the time it will be full again (GCRA), in the RATE_LIMIT_CACHE cache so every process shares it,
+# or in process memory when the setting is None or the cache fails.
+# Decisions run before the view, they only need request.user (see base.auth) and one cache round trip.
+# Concurrent requests may both pass the last token, the limits are for abuse, not for accounting.
+
+logger = logging.getLogger(__name__)
+
+KEY = 'ratelimit_%s_%s'
+
+
+class LocalBuckets:
+    """In-process bucket storage, also the fallback when the cache is unavailable."""
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._buckets.get(key)
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            if len(self._buckets) >= self.max_size:
+                # Buckets refilled by now are the same as missing ones
+                now = time.time()
+                self._buckets = {key: value for key, value in self._buckets.items() if value > now}
+            self._buckets[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+local_buckets = LocalBuckets()
+
+
+def storage():
+    if settings.RATE_LIMIT_CACHE is None:
+        return local_buckets
+    return caches[settings.RATE_LIMIT_CACHE]
+
+
+def take(scope, key, now=None):
+    """Takes a token from the bucket of key in scope, returns 0 or the seconds to wait for one."""
+    if scope not in settings.RATE_LIMITS:
+        return 0
+    requests, seconds = settings.RATE_LIMITS[scope]
+    now = time.time() if now is None else now
+    bucket_key = KEY % (scope, key)
+    buckets = storage()
+    try:
+        full_at = buckets.get(bucket_key)
+    except Exception:
+        logger.warning('Rate limit cache unavailable, using in-process buckets', exc_info=True)
+        buckets = local_buckets
+        full_at = buckets.get(bucket_key)
+    # Every request moves the time the bucket is full again by one refill interval
+    full_at = max(full_at or now, now) + seconds / requests
+    # With a margin for the rounding of the intervals added up by a burst
+    if full_at - now > seconds * (1 + 1e-9):
+        return full_at - now - seconds
+    try:
+        buckets.set(bucket_key, full_at, math.ceil(seconds) + 1)
+    except Exception:
+        logger.warning('Rate limit cache unavailable, using in-process buckets', exc_info=True)
+        local_buckets.set(bucket_key, full_at, math.ceil(seconds) + 1)
+    return 0
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return 'user%s' % request.user.id
+    return 'ip%s' % request.META.get('REMOTE_ADDR', '')
+
+
+def too_many_requests(request, retry_after):
+    if request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', ''):
+        response = JsonResponse({'error': 'Too many requests'}, status=429)
+    else:
+        response = HttpResponse('Too many requests, try again in %s seconds' % math.ceil(retry_after), status=429)
+    response['Retry-After'] = math.ceil(retry_after)
+    return response
+
+
+def rate_limit(scope, methods=None):
+    """Rejects requests (of the given methods) over the RATE_LIMITS of scope with 429 Too Many Requests."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                retry_after = take(scope, client_key(request))
+                if retry_after:
+                    logger.info('Rate limit of %s exceeded by %s', scope, client_key(request))
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
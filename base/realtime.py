@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest, parse_cookie
+from django.utils.module_loading import import_string
+from .models import Topic, Room, Message
+
+
+# Live updates of rooms over WebSockets.
+# Views publish events synchronously, every connected socket of the room waits on its own queue.
+# Events are serialized once per publish, not once per connection.
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBroadcaster:
+    """
+    Fan-out inside a single process, publishers and sockets have to live in the same ASGI worker.
+    Every socket queues at most queue_size events, a client that can't keep up loses the oldest ones.
+    """
+
+    def __init__(self, queue_size=100, **options):
+        self._groups = defaultdict(set)
+        self._lock = threading.Lock()
+        self._queue_size = queue_size
+
+    def publish(self, group, text):
+        by_loop = defaultdict(list)
+        with self._lock:
+            for loop, queue in self._groups.get(group, ()):
+                by_loop[loop].append(queue)
+        for loop, queues in by_loop.items():
+            # Publishers are usually sync views running in a thread, so every event loop is woken up once
+            loop.call_soon_threadsafe(self._deliver, queues, text)
+
+    @staticmethod
+    def _deliver(queues, text):
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(text)
+
+    def subscribers_count(self, group):
+        return len(self._groups.get(group, ()))
+
+    @asynccontextmanager
+    async def subscribe(self, group):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self._queue_size))
+        with self._lock:
+            self._groups[group].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._groups[group].discard(subscriber)
+                if not self._groups[group]:
+                    del self._groups[group]
+
+
+class RedisBroadcaster(InProcessBroadcaster):
+    """
+    Fan-out between processes over Redis pub/sub (or any server speaking its protocol, e.g. a local one for
+    development). Each process keeps a single subscription per group and dispatches to its sockets locally.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='forum:', **options):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroadcaster requires the redis package')
+        super().__init__(**options)
+        self._errors = (redis.RedisError, OSError)
+        self._prefix = prefix
+        self._publisher = redis.Redis.from_url(url)
+        self._async_client = redis.asyncio.Redis.from_url(url)
+        self._pubsub = None
+        self._reader = None
+        # {group: [lock, number of tasks holding or waiting for it]}, see _group_lock
+        self._group_locks = {}
+
+    def publish(self, group, text):
+        # Called after the commit of a write, which must not fail because live updates are unavailable
+        try:
+            self._publisher.publish(self._prefix + group, text)
+        except self._errors:
+            logger.warning('Publishing to %s failed', group, exc_info=True)
+
+    async def _read(self):
+        async for message in self._pubsub.listen():
+            if message['type'] == 'message':
+                super().publish(message['channel'].decode()[len(self._prefix):], message['data'].decode())
+
+    @asynccontextmanager
+    async def _group_lock(self, group):
+        # Held while a group is (un)subscribed, its subscriber count can't change across the awaits.
+        # A lock is dropped once no task holds or waits for it, the next one gets a new lock.
+        entry = self._group_locks.setdefault(group, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._group_locks[group]
+
+    @asynccontextmanager
+    async def subscribe(self, group):
+        local = super().subscribe(group)
+        async with self._group_lock(group):
+            if self._pubsub is None:
+                self._pubsub = self._async_client.pubsub()
+            if not self.subscribers_count(group):
+                await self._pubsub.subscribe(self._prefix + group)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.ensure_future(self._read())
+            queue = await local.__aenter__()
+        try:
+            yield queue
+        finally:
+            async with self._group_lock(group):
+                await local.__aexit__(None, None, None)
+                if not self.subscribers_count(group):
+                    await self._pubsub.unsubscribe(self._prefix + group)
+
+
+@lru_cache(maxsize=None)
+def get_broadcaster():
+    config = settings.REALTIME_BROADCASTER
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def room_group(room_id):
+    return 'room_%s' % room_id
+
+
+def publish(room_id, event):
+    get_broadcaster().publish(room_group(room_id), json.dumps(event))
+
+
+def publish_message(message):
+    publish(message.room_id, {
+        'type': 'message',
+        'id': message.id,
+        'answer_to': message.answer_to_id,
+        'user': message.user.username,
+        'content': message.content,
+        'created': message.created.isoformat(),
+    })
+
+
+def publish_rating(message_id):
+    message = Message.objects.filter(id=message_id).values('room_id', 'plus_count', 'minus_count').first()
+    if message:
+        publish(message['room_id'], {
+            'type': 'rating',
+            'id': message_id,
+            'plus_count': message['plus_count'],
+            'minus_count': message['minus_count'],
+        })
+
+
+def publish_room_status(room):
+    publish(room.id, {'type': 'status', 'is_closed': room.is_closed})
+
+
+ROOM_SOCKET_PATH = re.compile(r'^/ws/room/(?P<key>\d+)$')
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI application for ws/room/<id>, pushes events of the room to the client."""
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    match = ROOM_SOCKET_PATH.match(scope['path'])
+    visible = await sync_to_async(room_visible)(match['key'], scope) if match else None
+    if not visible:
+        await send({'type': 'websocket.close', 'code': 4404 if visible is None else 4403})
+        return
+    await send({'type': 'websocket.accept'})
+
+    async with get_broadcaster().subscribe(room_group(match['key'])) as queue:
+        # An idle connection costs a task waiting for the next room event and a pending receive()
+        forwarding = asyncio.ensure_future(forward(queue, send))
+        try:
+            # Clients have nothing to say, incoming frames are ignored
+            while (await receive())['type'] != 'websocket.disconnect':
+                pass
+        finally:
+            forwarding.cancel()
+
+
+def socket_user(scope):
+    # The user of the session cookie sent with the handshake
+    headers = dict(scope.get('headers', []))
+    request = HttpRequest()
+    request.COOKIES = parse_cookie(headers.get(b'cookie', b'').decode('latin1'))
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    return auth.get_user(request)
+
+
+def room_visible(room_id, scope):
+    """None if the room does not exist, whether the user of the socket may see it otherwise."""
+    room = Room.objects.filter(id=room_id).values('topic_id', 'topic__is_restricted').first()
+    if room is None:
+        return None
+    # Sessions are only loaded for rooms of restricted topics
+    return not room['topic__is_restricted'] or Topic.is_visible(room['topic_id'], True, socket_user(scope))
+
+
+async def forward(queue, send):
+    while True:
+        await send({'type': 'websocket.send', 'text': await queue.get()})
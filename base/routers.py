@@ -0,0 +1,21 @@
+from django.db import connections
+
+
+class ReadWriteRouter:
+    """
+    Sends writes to the `default` database and reads to `reader`, a read-only connection
+    to the same SQLite file (WAL lets it read while `default` writes).
+    Reads made inside a transaction of `default` stay there, they must see its uncommitted rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        return 'default' if connections['default'].in_atomic_block else 'reader'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
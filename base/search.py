@@ -0,0 +1,236 @@
+import re
+from django.db import connection, transaction
+
+
+# Full-text index over topics, rooms and messages, kept in a table outside of the ORM:
+# an FTS5 virtual table on SQLite, a tsvector column with a GIN index on PostgreSQL.
+# Every document is addressed by kind and object id, combined into one integer key, and carries
+# the topic it belongs to, so matches in restricted topics are filtered out by the index query itself.
+
+KINDS = {'topic': 1, 'room': 2, 'message': 3}
+KIND_NAMES = {code: kind for kind, code in KINDS.items()}
+
+
+def document_key(kind, object_id):
+    return object_id * 4 + KINDS[kind]
+
+
+def split_key(key):
+    return KIND_NAMES[key % 4], key // 4
+
+
+def query_words(query):
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+class SqliteSearchBackend:
+    def install(self, cursor):
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS base_search USING fts5("
+                       "room_id UNINDEXED, topic_id UNINDEXED, title, body, "
+                       "tokenize='unicode61 remove_diacritics 2')")
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS base_search')
+
+    def index(self, cursor, documents):
+        # documents: (key, room_id, topic_id, title, body)
+        cursor.executemany('DELETE FROM base_search WHERE rowid = %s', [(document[0],) for document in documents])
+        cursor.executemany('INSERT INTO base_search (rowid, room_id, topic_id, title, body) '
+                           'VALUES (%s, %s, %s, %s, %s)', documents)
+
+    def remove(self, cursor, keys):
+        cursor.executemany('DELETE FROM base_search WHERE rowid = %s', [(key,) for key in keys])
+
+    def remove_room(self, cursor, room_id):
+        # FTS5 can't index room_id, this scans the table, once per deleted room
+        cursor.execute('DELETE FROM base_search WHERE room_id = %s', [room_id])
+
+    def topic_of(self, cursor, key):
+        cursor.execute('SELECT topic_id FROM base_search WHERE rowid = %s', [key])
+        return cursor.fetchone()
+
+    def move_room(self, cursor, room_id, topic_id):
+        cursor.execute('UPDATE base_search SET topic_id = %s WHERE room_id = %s', [topic_id, room_id])
+
+    def search(self, cursor, words, limit, offset, hidden_topic_ids):
+        # Every word has to match, the last one may be incomplete
+        match = ' '.join('"%s"' % word for word in words) + '*'
+        where, params = 'base_search MATCH %s', [match]
+        if hidden_topic_ids:
+            placeholders = ', '.join(['%s'] * len(hidden_topic_ids))
+            where += ' AND (topic_id IS NULL OR topic_id NOT IN (%s))' % placeholders
+            params += hidden_topic_ids
+        cursor.execute('SELECT count(*) FROM base_search WHERE ' + where, params)
+        total = cursor.fetchone()[0]
+        # Matches in titles weigh more than matches in bodies
+        cursor.execute('SELECT rowid FROM base_search WHERE ' + where +
+                       ' ORDER BY bm25(base_search, 0, 0, 5.0, 1.0) LIMIT %s OFFSET %s', params + [limit, offset])
+        return [row[0] for row in cursor.fetchall()], total
+
+
+class PostgresSearchBackend:
+    def install(self, cursor):
+        cursor.execute("CREATE TABLE IF NOT EXISTS base_search ("
+                       "key bigint PRIMARY KEY, room_id bigint, topic_id bigint, "
+                       "title text NOT NULL, body text NOT NULL, "
+                       "document tsvector GENERATED ALWAYS AS ("
+                       "setweight(to_tsvector('simple', title), 'A') || "
+                       "setweight(to_tsvector('simple', body), 'B')) STORED)")
+        cursor.execute('CREATE INDEX IF NOT EXISTS base_search_document ON base_search USING GIN (document)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS base_search_room ON base_search (room_id)')
+
+    def drop(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS base_search')
+
+    def index(self, cursor, documents):
+        cursor.executemany('INSERT INTO base_search (key, room_id, topic_id, title, body) '
+                           'VALUES (%s, %s, %s, %s, %s) ON CONFLICT (key) DO UPDATE SET room_id = EXCLUDED.room_id, '
+                           'topic_id = EXCLUDED.topic_id, title = EXCLUDED.title, body = EXCLUDED.body', documents)
+
+    def remove(self, cursor, keys):
+        cursor.execute('DELETE FROM base_search WHERE key = ANY(%s)', [list(keys)])
+
+    def remove_room(self, cursor, room_id):
+        cursor.execute('DELETE FROM base_search WHERE room_id = %s', [room_id])
+
+    def topic_of(self, cursor, key):
+        cursor.execute('SELECT topic_id FROM base_search WHERE key = %s', [key])
+        return cursor.fetchone()
+
+    def move_room(self, cursor, room_id, topic_id):
+        cursor.execute('UPDATE base_search SET topic_id = %s WHERE room_id = %s', [topic_id, room_id])
+
+    def search(self, cursor, words, limit, offset, hidden_topic_ids):
+        match = ' & '.join(words) + ':*'
+        # NULL <> ALL(...) is NULL, documents without a topic have to be let through explicitly
+        visible = '(topic_id IS NULL OR topic_id <> ALL(%s))'
+        cursor.execute("SELECT key, count(*) OVER () FROM base_search, to_tsquery('simple', %s) query "
+                       "WHERE document @@ query AND " + visible + " ORDER BY ts_rank(document, query) DESC "
+                       "LIMIT %s OFFSET %s", [match, hidden_topic_ids, limit, offset])
+        rows = cursor.fetchall()
+        if not rows and offset:
+            cursor.execute("SELECT count(*) FROM base_search WHERE document @@ to_tsquery('simple', %s) AND " +
+                           visible, [match, hidden_topic_ids])
+            return [], cursor.fetchone()[0]
+        return [row[0] for row in rows], rows[0][1] if rows else 0
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    # None for databases without a supported full-text engine, indexing is skipped there
+    backend = BACKENDS.get(connection.vendor)
+    return backend() if backend else None
+
+
+def topic_document(topic):
+    return document_key('topic', topic.id), None, topic.id, topic.name, topic.description or ''
+
+
+def room_document(room):
+    return document_key('room', room.id), room.id, room.topic_id, room.name, room.description or ''
+
+
+def message_document(message):
+    # message.room is read for its topic, load it with select_related('room')
+    return document_key('message', message.id), message.room_id, message.room.topic_id, '', message.content
+
+
+def index_documents(documents):
+    backend = get_backend()
+    if backend and documents:
+        with connection.cursor() as cursor:
+            backend.index(cursor, documents)
+
+
+def index_room(room):
+    # Messages carry the topic of their room, they are moved along when it changed
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            indexed = backend.topic_of(cursor, document_key('room', room.id))
+            if indexed is not None and indexed[0] != room.topic_id:
+                backend.move_room(cursor, room.id, room.topic_id)
+            backend.index(cursor, [room_document(room)])
+
+
+def remove_documents(kind, ids):
+    backend = get_backend()
+    if backend and ids:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, [document_key(kind, object_id) for object_id in ids])
+
+
+def remove_room_documents(room_id):
+    # The room and its messages, all of them carry its id
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            backend.remove_room(cursor, room_id)
+
+
+def install():
+    backend = get_backend()
+    if backend:
+        with connection.cursor() as cursor:
+            backend.install(cursor)
+
+
+def rebuild(batch_size=2000):
+    """Recreates the index from scratch, returns number of indexed documents."""
+    from .models import Topic, Room, Message
+    backend = get_backend()
+    if backend is None:
+        return 0
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.drop(cursor)
+        backend.install(cursor)
+        for queryset, to_document in ((Topic.objects.all(), topic_document),
+                                      (Room.objects.all(), room_document),
+                                      (Message.objects.select_related('room'), message_document)):
+            batch = []
+            for obj in queryset.order_by().iterator(chunk_size=batch_size):
+                batch.append(to_document(obj))
+                if len(batch) == batch_size:
+                    backend.index(cursor, batch)
+                    total, batch = total + len(batch), []
+            backend.index(cursor, batch)
+            total += len(batch)
+    return total
+
+
+def search(query, page, per_page, user):
+    """
+    Returns topics, rooms and messages matching all words of query that user may see, best matches first,
+    and the total number of them. Matches in restricted topics user isn't whitelisted for are left out
+    by the index query, before the page is cut, so pages are full and the total counts visible matches only.
+    """
+    from .models import Topic, Room, Message
+    backend = get_backend()
+    words = query_words(query)
+    if backend is None or not words:
+        return [], 0
+    hidden_topic_ids = [] if user.is_superuser else sorted(Topic.get_restricted_ids() - Topic.get_whitelisted_ids(user))
+    with connection.cursor() as cursor:
+        keys, total = backend.search(cursor, words, per_page, (page - 1) * per_page, hidden_topic_ids)
+
+    ids = {kind: [] for kind in KINDS}
+    for key in keys:
+        kind, object_id = split_key(key)
+        ids[kind].append(object_id)
+    # Checked again on the rows, the index is only updated once the tasks of a write have run
+    objects = {}
+    for kind, queryset in (('topic', Topic.objects.filter(Topic.visible_filter(user))),
+                           ('room', Room.objects.filter(Topic.visible_filter(user, 'topic__')).select_related('host')),
+                           ('message', Message.objects.filter(Topic.visible_filter(user, 'room__topic__'))
+                            .select_related('user', 'room'))):
+        if ids[kind]:
+            objects.update({(kind, obj.id): obj for obj in queryset.filter(id__in=ids[kind])})
+    results = [(kind, objects[(kind, object_id)]) for kind, object_id in map(split_key, keys)
+               if (kind, object_id) in objects]
+    return results, total
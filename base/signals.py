@@ -0,0 +1,252 @@
+from django.db import transaction
+from django.db.models import F
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import User, Topic, Room, Message, Notification, deleted_rooms
+from . import realtime, search
+from .tasks import task
+from .tracking import view_recorder
+from .fragments import fragment_stats
+from .performance import record_query, view_stats
+from .auth import CachedModelBackend
+
+
+# Counter columns are incremented with F-expressions, so concurrent writers never overwrite each other.
+# Removals are rare and recount the affected rows instead. `manage.py rebuild_counters` fixes any drift.
+# Side effects of new messages and search indexing run as tasks (base.tasks), after the response
+# unless TASKS_EAGER is set. Tasks only get ids and tolerate rows deleted in the meantime.
+# Messages deleted with their room are skipped by the message handlers, the room is handled as a whole.
+
+@receiver(pre_delete, sender=Room)
+def room_deleting(sender, instance, **kwargs):
+    # Sent before the messages of the room are deleted, Room.delete() drops the id again
+    deleted_rooms.ids.add(instance.id)
+
+
+@receiver(post_save, sender=Room)
+def room_created(sender, instance, created, **kwargs):
+    if created and instance.topic_id:
+        Topic.objects.filter(id=instance.topic_id).update(room_count=F('room_count') + 1)
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    if instance.topic_id:
+        Topic.objects.filter(id=instance.topic_id).update(room_count=F('room_count') - 1)
+
+
+@task()
+def message_posted(room_id, answer_to_id):
+    # Counters are incremented even if the message was deleted since, its removal has decremented them
+    Room.objects.filter(id=room_id).update(message_count=F('message_count') + 1)
+    if answer_to_id:
+        Message.objects.filter(id=answer_to_id).update(reply_count=F('reply_count') + 1)
+
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, **kwargs):
+    if created:
+        message_posted.enqueue(instance.room_id, instance.answer_to_id)
+        if instance.answer_to_id:
+            reply_notified.enqueue(instance.id)
+
+
+@task()
+def reply_notified(message_id):
+    # The author of the thread and everyone who answered it are notified, except the author of the reply
+    reply = Message.objects.filter(id=message_id).values('user_id', 'answer_to_id', 'answer_to__user_id').first()
+    if reply is None:
+        return
+    users = set(Message.objects.filter(answer_to=reply['answer_to_id']).values_list('user_id', flat=True).distinct())
+    users.add(reply['answer_to__user_id'])
+    users.discard(reply['user_id'])
+    if users:
+        Notification.notify(users, reply['answer_to_id'], message_id, reply['user_id'])
+
+
+@task()
+def participant_added(room_id, user_id):
+    # Queued by room_view for the author of a new message
+    if Room.objects.filter(id=room_id).exists() and User.objects.filter(id=user_id).exists():
+        Room(id=room_id).participants.add(user_id)
+
+
+@task()
+def message_removed(room_id, answer_to_id):
+    # Queued after message_posted of the same message, a worker running it first fails on the
+    # positive counter constraint and retries
+    Room.objects.filter(id=room_id).update(message_count=F('message_count') - 1)
+    if answer_to_id:
+        Message.objects.filter(id=answer_to_id).update(reply_count=F('reply_count') - 1)
+
+
+@receiver(post_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    # Answers and counters of a deleted room go with it
+    if instance.room_id not in deleted_rooms.ids:
+        message_removed.enqueue(instance.room_id, instance.answer_to_id)
+
+
+def m2m_counter(model, counters):
+    # Returns m2m_changed handler keeping `counters` ({field: delta per added user}) of `model` up to date
+    def handler(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'post_add' and pk_set:
+            # pk_set only contains rows that were actually inserted
+            if reverse:
+                queryset, step = model.objects.filter(pk__in=pk_set), 1
+            else:
+                queryset, step = model.objects.filter(pk=instance.pk), len(pk_set)
+            queryset.update(**{field: F(field) + delta * step for field, delta in counters.items()})
+        elif action == 'post_remove':
+            model.update_counters(model.objects.filter(pk__in=pk_set if reverse else [instance.pk]))
+        elif action == 'pre_clear' and reverse:
+            instance._cleared_ids = list(sender.objects.filter(user=instance.pk)
+                                         .values_list(model._meta.model_name, flat=True))
+        elif action == 'post_clear':
+            ids = getattr(instance, '_cleared_ids', []) if reverse else [instance.pk]
+            model.update_counters(model.objects.filter(pk__in=ids))
+    return handler
+
+
+m2m_changed.connect(m2m_counter(Room, {'participant_count': 1}), sender=Room.participants.through,
+                    dispatch_uid='room_participant_count')
+m2m_changed.connect(m2m_counter(Room, {'viewer_count': 1}), sender=Room.viewers.through,
+                    dispatch_uid='room_viewer_count')
+
+
+@receiver(m2m_changed, sender=Room.participants.through)
+def room_participants_changed(sender, action, pk_set, **kwargs):
+    if action == 'post_clear' or action in ('post_add', 'post_remove') and pk_set:
+        transaction.on_commit(Room.invalidate_popular)
+
+
+@receiver(post_delete, sender=Room)
+def popular_room_deleted(sender, **kwargs):
+    transaction.on_commit(Room.invalidate_popular)
+
+
+@receiver(post_save, sender=Message)
+def message_published(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: realtime.publish_message(instance))
+
+
+@receiver(post_save, sender=Room)
+def room_status_published(sender, instance, created, update_fields, **kwargs):
+    if not created and (update_fields is None or 'is_closed' in update_fields):
+        transaction.on_commit(lambda: realtime.publish_room_status(instance))
+
+
+def install_search_index(sender, **kwargs):
+    # Connected to post_migrate, the index table is not a model
+    search.install()
+
+
+DOCUMENTS = {
+    'topic': (Topic.objects.all(), search.topic_document),
+    'room': (Room.objects.all(), search.room_document),
+    'message': (Message.objects.select_related('room'), search.message_document),
+}
+
+
+@task()
+def document_indexed(model_name, object_id):
+    queryset, document = DOCUMENTS[model_name]
+    instance = queryset.filter(id=object_id).first()
+    if instance is None:
+        return
+    if model_name == 'room':
+        search.index_room(instance)
+    else:
+        search.index_documents([document(instance)])
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=Room)
+def topic_or_room_indexed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or {'name', 'description', 'topic'} & set(update_fields):
+        document_indexed.enqueue(sender._meta.model_name, instance.id)
+
+
+@receiver(post_save, sender=Message)
+def message_indexed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        document_indexed.enqueue('message', instance.id)
+
+
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Message)
+def document_removed(sender, instance, **kwargs):
+    if sender is Topic or instance.room_id not in deleted_rooms.ids:
+        search.remove_documents(sender._meta.model_name, [instance.id])
+
+
+@task()
+def room_documents_removed(room_id):
+    search.remove_room_documents(room_id)
+
+
+@receiver(post_delete, sender=Room)
+def room_documents_deleted(sender, instance, **kwargs):
+    # Sent after the messages of the room were deleted, one statement removes the room and all of them
+    room_documents_removed.enqueue(instance.id)
+
+
+@receiver(m2m_changed, sender=Topic.whitelist.through)
+def topic_whitelist_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.id]
+    elif action == 'pre_clear':
+        user_ids = list(instance.whitelist.values_list('id', flat=True))
+    else:
+        user_ids = list(pk_set)
+    Topic.invalidate_whitelisted_ids(user_ids)
+    transaction.on_commit(lambda: Topic.invalidate_whitelisted_ids(user_ids))
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def restricted_topics_changed(sender, **kwargs):
+    Topic.invalidate_restricted_ids()
+    transaction.on_commit(Topic.invalidate_restricted_ids)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    # Notifications go with their threads, counts of unread ones change
+    if not instance.is_read:
+        transaction.on_commit(lambda: Notification.invalidate_unread_count([instance.user_id]))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def cached_user_invalidated(sender, instance, **kwargs):
+    CachedModelBackend.invalidate(instance.id)
+    # Again after the commit, a request running meanwhile could have cached the old row
+    transaction.on_commit(lambda: CachedModelBackend.invalidate(instance.id))
+
+
+@receiver(request_finished)
+def room_views_flushed(sender, **kwargs):
+    # Runs after the response was sent
+    view_recorder.flush_if_due()
+
+
+@receiver(request_finished)
+def card_stats_flushed(sender, **kwargs):
+    fragment_stats.flush()
+
+
+@receiver(request_finished)
+def performance_published(sender, **kwargs):
+    view_stats.publish_if_due()
+
+
+@receiver(connection_created)
+def query_recorder_installed(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
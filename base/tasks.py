@@ -0,0 +1,121 @@
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+from .models import Job
+from .performance import RequestMetrics, current_metrics, view_stats
+
+
+# Side effects of writes (counters, participants, search indexing) run as tasks, after the response.
+# enqueue() inserts a Job row in the transaction of the write, so jobs exist exactly for committed writes,
+# and `manage.py run_worker` runs them, retrying failures TASK_RETRIES times with exponential backoff.
+# Jobs are delivered at least once: the job of a worker that died runs again after TASK_TIMEOUT seconds.
+# With TASKS_EAGER tasks run right away in the caller, as before, and no worker is needed.
+# Worker runs are recorded by base.performance as 'task:<name>'.
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class Task:
+    def __init__(self, func, name, retries=None):
+        self.func = func
+        self.name = name
+        self.retries = retries
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, **kwargs):
+        # Arguments are stored as JSON, eager calls get them the same way
+        args, kwargs = json.loads(json.dumps([args, kwargs]))
+        if settings.TASKS_EAGER:
+            self.func(*args, **kwargs)
+        else:
+            Job.objects.create(name=self.name, args=args, kwargs=kwargs)
+
+
+def task(retries=None):
+    """Registers the decorated function as a task, called later with .enqueue(*args, **kwargs)."""
+    def decorator(func):
+        name = '%s.%s' % (func.__module__, func.__qualname__)
+        registry[name] = Task(func, name, retries)
+        return registry[name]
+    return decorator
+
+
+def claim(limit):
+    """Marks up to limit due jobs as running, oldest first, and returns them."""
+    now = timezone.now()
+    claimed = []
+    with transaction.atomic():
+        # Other workers skip the locked rows (PostgreSQL), the run_at condition keeps two
+        # workers from claiming the same job where rows can't be locked
+        for job in Job.due(now).select_for_update(skip_locked=True).order_by('run_at')[:limit]:
+            if Job.objects.filter(id=job.id, run_at=job.run_at).update(
+                    status=Job.RUNNING, attempts=F('attempts') + 1,
+                    run_at=now + timedelta(seconds=settings.TASK_TIMEOUT)):
+                job.lag = (now - job.run_at).total_seconds()
+                job.attempts += 1
+                claimed.append(job)
+    return claimed
+
+
+def run(job):
+    """Runs a claimed job, deletes it on success and schedules a retry or marks it failed otherwise."""
+    if job.lag > settings.TASK_LAG_WARNING:
+        logger.warning('Job %s started %.1f seconds after it was due', job, job.lag)
+    task = registry.get(job.name)
+    metrics, start = RequestMetrics(), time.perf_counter()
+    token = current_metrics.set(metrics)
+    try:
+        if task is None:
+            raise LookupError('Unknown task %s' % job.name)
+        with transaction.atomic():
+            task.func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+    else:
+        error = None
+    finally:
+        current_metrics.reset(token)
+        view_stats.add('task:%s' % job.name, metrics, time.perf_counter() - start)
+
+    if error is None:
+        Job.objects.filter(id=job.id).delete()
+        return True
+    retries = settings.TASK_RETRIES if task is None or task.retries is None else task.retries
+    if task is not None and job.attempts <= retries:
+        delay = settings.TASK_RETRY_DELAY * 2 ** (job.attempts - 1)
+        logger.warning('Job %s failed, retrying in %s seconds\n%s', job, delay, error)
+        Job.objects.filter(id=job.id).update(status=Job.PENDING, error=error,
+                                             run_at=timezone.now() + timedelta(seconds=delay))
+    else:
+        logger.error('Job %s failed after %s attempts\n%s', job, job.attempts, error)
+        Job.objects.filter(id=job.id).update(status=Job.FAILED, error=error)
+    return False
+
+
+def work(batch_size=None):
+    """Runs one batch of due jobs, returns the number of jobs run."""
+    close_old_connections()
+    jobs = claim(batch_size or settings.TASK_BATCH_SIZE)
+    for job in jobs:
+        run(job)
+    close_old_connections()
+    view_stats.publish_if_due()
+    return len(jobs)
+
+
+def queue_lag():
+    """Seconds the oldest due job has been waiting for a worker, 0 when the queue is drained."""
+    now = timezone.now()
+    oldest = Job.due(now).aggregate(oldest=Min('run_at'))['oldest']
+    return 0.0 if oldest is None else (now - oldest).total_seconds()
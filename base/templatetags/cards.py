@@ -0,0 +1,30 @@
+from django import template
+from ..fragments import render_card
+
+register = template.Library()
+
+
+class CardNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return render_card(self.name, vary_on, lambda: self.nodelist.render(context))
+
+
+@register.tag('card')
+def do_card(parser, token):
+    """
+    Caches the enclosed part of a card, the key depends on every following variable:
+
+        {% card room room.id room.updated room.message_count %} ... {% endcard %}
+    """
+    nodelist = parser.parse(('endcard',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError("'%s' tag requires a card name and at least one variable." % bits[0])
+    return CardNode(nodelist, bits[1], [parser.compile_filter(bit) for bit in bits[2:]])
@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+
+
+class TestRestrictedTopics(TestCase):
+
+    def setUp(self):
+        for i in (1, 2):
+            user = User.objects.create(
+                id=i,
+                email='TestEmail%s@gmail.com' % i,
+                username='TestUser%s' % i,
+            )
+            user.set_password('1234Test5678')
+            user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Open Topic',
+        )
+        Topic.objects.create(
+            id=2,
+            name='Restricted Topic',
+            is_restricted=True,
+        )
+        Topic.objects.get(id=2).whitelist.add(1)
+        Room.objects.create(
+            id=1,
+            name='Open Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Room.objects.create(
+            id=2,
+            name='Restricted Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=2),
+        )
+        Message.objects.create(
+            id=1,
+            content='restricted thread',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=2),
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def client_of(self, user_id):
+        client = Client()
+        client.login(email='TestEmail%s@gmail.com' % user_id, password='1234Test5678')
+        return client
+
+    def test_restricted_pages_are_forbidden(self):
+        pages = [
+            reverse('topic-page', args=[2]),
+            reverse('room-page', args=[2]),
+            reverse('room-create-page', args=[2]),
+            reverse('topic-export-page', args=[2]),
+            reverse('room-export-page', args=[2]),
+            reverse('message-replies-page', args=[1]),
+            reverse('message-rating-page', args=[1]) + '?action=p',
+        ]
+        client = self.client_of(2)
+        for page in pages:
+            self.assertEqual(client.get(page).status_code, 403, page)
+        self.assertEqual(Client().get(reverse('topic-page', args=[2])).status_code, 403)
+        self.assertEqual(Client().get(reverse('room-page', args=[2])).status_code, 403)
+        self.assertEqual(client.get(reverse('room-page', args=[1])).status_code, 200)
+
+    def test_whitelisted_user_has_access(self):
+        client = self.client_of(1)
+        self.assertEqual(client.get(reverse('topic-page', args=[2])).status_code, 200)
+        self.assertEqual(client.get(reverse('room-page', args=[2])).status_code, 200)
+        self.assertEqual(client.get(reverse('message-replies-page', args=[1])).status_code, 200)
+
+    def test_superuser_has_access(self):
+        User.objects.filter(id=2).update(is_superuser=True)
+        client = self.client_of(2)
+        self.assertEqual(client.get(reverse('room-page', args=[2])).status_code, 200)
+
+    def test_home_lists_visible_topics(self):
+        self.assertNotContains(Client().get(reverse('home-page')), 'Restricted Topic')
+        self.assertNotContains(self.client_of(2).get(reverse('home-page')), 'Restricted Topic')
+        self.assertContains(self.client_of(1).get(reverse('home-page')), 'Restricted Topic')
+
+    def test_whitelist_changes_invalidate_cache(self):
+        user = User.objects.get(id=2)
+        self.assertEqual(Topic.get_whitelisted_ids(user), frozenset())
+
+        Topic.objects.get(id=2).whitelist.add(2)
+        with self.assertNumQueries(1):
+            self.assertEqual(Topic.get_whitelisted_ids(user), {2})
+        with self.assertNumQueries(0):
+            self.assertEqual(Topic.get_whitelisted_ids(user), {2})
+
+        user.whitelist.remove(2)
+        self.assertEqual(Topic.get_whitelisted_ids(user), frozenset())
+
+        Topic.objects.get(id=2).whitelist.add(2)
+        Topic.objects.get(id=2).whitelist.clear()
+        self.assertEqual(Topic.get_whitelisted_ids(user), frozenset())
+        self.assertEqual(Topic.get_whitelisted_ids(User.objects.get(id=1)), frozenset())
+
+    def test_visible_filter(self):
+        anonymous = Client().get(reverse('home-page')).wsgi_request.user
+        self.assertEqual(list(Room.objects.filter(Topic.visible_filter(anonymous, 'topic__'))
+                              .values_list('id', flat=True)), [1])
+        user = User.objects.get(id=1)
+        self.assertEqual(sorted(Room.objects.filter(Topic.visible_filter(user, 'topic__'))
+                                .values_list('id', flat=True)), [1, 2])
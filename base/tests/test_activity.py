@@ -0,0 +1,105 @@
+from datetime import timedelta
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import User, Topic, Room, Message, Vote
+from .. import activity
+
+
+class TestActivity(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Topic.objects.create(
+            id=2,
+            name='Restricted Topic',
+            is_restricted=True,
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Room.objects.create(
+            id=2,
+            name='Restricted Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=2),
+        )
+        for i in range(1, 8):
+            Message.objects.create(
+                id=i,
+                content='message %s' % i,
+                user=User.objects.get(id=1),
+                room=Room.objects.get(id=1),
+            )
+        Message.objects.create(
+            id=8,
+            content='hidden message',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=2),
+        )
+        Vote.objects.create(id=1, message_id=1, user_id=1, value=Vote.PLUS)
+        # Ties between kinds and within a kind
+        now = timezone.now()
+        Message.objects.filter(id__lte=4).update(created=now)
+        Message.objects.filter(id__gt=4).update(created=now - timedelta(minutes=1))
+        Room.objects.filter(id=1).update(created=now)
+        Vote.objects.update(created=now)
+
+    def entries(self, viewer, per_page):
+        pages, cursor = [], None
+        while True:
+            page = activity.feed_page(1, viewer, cursor, per_page)
+            pages.append([(kind, obj.id) for kind, obj in page])
+            cursor = page.next_cursor
+            if cursor is None:
+                return pages
+
+    def test_feed_order_and_paging(self):
+        expected = [('vote', 1), ('room', 1), ('message', 4), ('message', 3), ('message', 2), ('message', 1),
+                    ('message', 7), ('message', 6), ('message', 5)]
+        self.assertEqual(self.entries(AnonymousUser(), 20), [expected])
+        for per_page in (1, 2, 4):
+            pages = self.entries(AnonymousUser(), per_page)
+            self.assertEqual(sum(pages, []), expected)
+            self.assertTrue(all(len(page) == per_page for page in pages[:-1]))
+
+    def test_restricted_entries(self):
+        user = User.objects.get(id=1)
+        self.assertNotIn(('message', 8), sum(self.entries(user, 20), []))
+        Topic.objects.get(id=2).whitelist.add(1)
+        entries = sum(self.entries(user, 20), [])
+        self.assertIn(('message', 8), entries)
+        self.assertIn(('room', 2), entries)
+
+    def test_queries_per_page(self):
+        page = activity.feed_page(1, AnonymousUser(), None, 3)
+        with self.assertNumQueries(3):
+            activity.feed_page(1, AnonymousUser(), page.next_cursor, 3)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(len(activity.feed_page(1, AnonymousUser(), 'invalid', 3)), 3)
+
+    @override_settings(ACTIVITY_PER_PAGE=3)
+    def test_profile_page(self):
+        response = Client().get(reverse('profile-page', args=[1]))
+        self.assertContains(response, 'Test Room')
+        self.assertContains(response, 'message 4')
+        self.assertNotContains(response, 'message 7')
+        response = Client().get(reverse('profile-page', args=[1]), {'cursor': response.context['activity'].next_cursor})
+        self.assertContains(response, 'message 3')
+        self.assertNotContains(response, 'hidden message')
@@ -0,0 +1,122 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TransactionTestCase, AsyncClient, Client, override_settings
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+from ..tracking import view_recorder
+from ..performance import view_stats
+
+
+# Async views query the database from worker threads, so the data has to be committed
+@override_settings(ROOT_URLCONF='forum.async_urls')
+class TestAsyncViews(TransactionTestCase):
+    # Committed data is read through the read-only connection, see base.routers
+    databases = {'default', 'reader'}
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+
+        self.client = AsyncClient()
+
+    async def test_home_view_GET(self):
+        response = await self.client.get(reverse('home-page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Test Topic')
+
+    async def test_topic_view_GET_correct(self):
+        response = await self.client.get(reverse('topic-page', args=['1']))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Test Room')
+
+    async def test_topic_view_GET_incorrect(self):
+        response = await self.client.get(reverse('topic-page', args=['25']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_room_view_GET_correct(self):
+        response = await self.client.get(reverse('room-page', args=['1']))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'test')
+
+    async def test_room_view_GET_incorrect(self):
+        response = await self.client.get(reverse('room-page', args=['24']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_room_and_topic_view_GET_not_modified(self):
+        for url in (reverse('room-page', args=['1']), reverse('topic-page', args=['1'])):
+            response = await self.client.get(url)
+            # The async test client of Django 3.2 takes extra arguments as raw header names
+            revalidated = await self.client.get(url, **{'if-none-match': response['ETag']})
+            self.assertEqual(revalidated.status_code, 304)
+
+    async def test_room_view_GET_queries_of_worker_threads_recorded(self):
+        view_stats.clear()
+        await self.client.get(reverse('room-page', args=['1']))
+        self.assertGreater(view_stats.summary()['room-page']['queries'][0], 0)
+
+    async def test_profile_view_GET(self):
+        response = await self.client.get(reverse('profile-page', args=['1']))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'TestEmail@gmail.com')
+        # Activity feed, merged from queries run in worker threads
+        self.assertContains(response, 'Created a room')
+
+    def test_room_view_GET_and_POST_authenticated(self):
+        # Login and sessions are sync, the sync client still goes through the async views
+        client = Client()
+        client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        response = client.get(reverse('room-page', args=['1']))
+        view_recorder.flush()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Room.objects.get(id=1).viewers.count(), 1)
+
+        response = client.post(reverse('room-page', args=['1']), {'content': 'Test message text'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Room.objects.get(id=1).message_set.count(), 2)
+
+    async def test_streaming_export_over_asgi(self):
+        # The test client does not go through forum.asgi, the handler is driven directly
+        from forum.asgi import django_application
+        await sync_to_async(self.client_login)()
+        scope = {'type': 'http', 'method': 'GET', 'path': reverse('room-export-page', args=['1']),
+                 'query_string': b'format=csv',
+                 'headers': [(b'host', b'testserver'), (b'cookie', self.cookie.encode())]}
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+        await django_application(scope, receive, send)
+        self.assertEqual(messages[0]['status'], 200)
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def client_login(self):
+        client = Client()
+        client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        self.cookie = 'sessionid=%s' % client.cookies['sessionid'].value
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from ..auth import USER_KEY
+from ..models import User
+
+
+class TestCachedSessionsAndUsers(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        self.client = Client()
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+
+    def test_logged_in_request_without_queries(self):
+        self.client.get(reverse('login-page'))
+        self.assertIsNotNone(cache.get(USER_KEY % 1))
+        # Session and user both come from the cache
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('login-page'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.wsgi_request.user.id, 1)
+
+    def test_profile_change_invalidates_cached_user(self):
+        self.client.get(reverse('login-page'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('profile-page', args=['1']),
+                             {'username': 'NewName', 'first_name': 'First', 'last_name': 'Last'})
+        response = self.client.get(reverse('login-page'))
+        self.assertEqual(response.wsgi_request.user.username, 'NewName')
+
+    def test_password_change_logs_out(self):
+        self.client.get(reverse('login-page'))
+        user = User.objects.get(id=1)
+        user.set_password('New1234Test5678')
+        user.save()
+        response = self.client.get(reverse('login-page'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_inactive_user(self):
+        User.objects.filter(id=1).update(is_active=False)
+        response = self.client.get(reverse('login-page'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        client = Client()
+        client.post(reverse('login-page'), {'email': 'TestEmail@gmail.com', 'password': '1234Test5678'})
+        client.get(reverse('login-page'))
+        with self.assertNumQueries(0):
+            response = client.get(reverse('login-page'))
+        self.assertEqual(response.wsgi_request.user.id, 1)
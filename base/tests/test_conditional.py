@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+from ..tracking import view_recorder
+
+
+class TestConditionalGet(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+
+        cache.clear()
+        # Views of earlier tests could be flushed after a measured request
+        view_recorder.flush()
+        self.client = Client()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_room_page_not_modified(self):
+        url = reverse('room-page', args=['1'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        # Only the room is read
+        with self.assertNumQueries(1):
+            revalidated = self.revalidate(url, response)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+        self.assertNotEqual(self.client.get(url + '?page=2')['ETag'], response['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_room_page_changes(self):
+        url = reverse('room-page', args=['1'])
+        response = self.client.get(url)
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        # Logged in users get their own version of the page, without Last-Modified
+        logged_in = self.revalidate(url, response)
+        self.assertEqual(logged_in.status_code, 200)
+        self.assertFalse(logged_in.has_header('Last-Modified'))
+
+        self.client.get('%s?action=p' % reverse('message-rating-page', args=['1']))
+        rated = self.revalidate(url, logged_in)
+        self.assertEqual(rated.status_code, 200)
+        self.assertContains(rated, '+1')
+
+        self.client.post(url, {'content': 'new message'})
+        posted = self.revalidate(url, rated)
+        self.assertEqual(posted.status_code, 200)
+        self.assertContains(posted, 'new message')
+        self.assertEqual(self.revalidate(url, posted).status_code, 304)
+
+    def test_room_page_changes_with_popular_rooms(self):
+        url = reverse('room-page', args=['1'])
+        response = self.client.get(url)
+        Room.invalidate_popular()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    @override_settings(CONDITIONAL_GET_INTERVAL=0.001)
+    def test_validators_expire(self):
+        url = reverse('room-page', args=['1'])
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_room_updated_on_post(self):
+        updated = Room.objects.get(id=1).updated
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        self.client.post(reverse('room-page', args=['1']), {'content': 'new message'})
+        self.assertGreater(Room.objects.get(id=1).updated, updated)
+
+    def test_topic_page(self):
+        url = reverse('topic-page', args=['1'])
+        response = self.client.get(url)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        Message.objects.create(
+            id=2,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
@@ -0,0 +1,84 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message, Vote
+from ..tracking import view_recorder
+
+
+class TestCounters(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+
+        self.client = Client()
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+
+    def test_room_counters_on_post(self):
+        self.client.post(reverse('room-page', args=['1']), {'content': 'First'})
+        self.client.post(reverse('room-page', args=['1']), {'content': 'Second', 'answer_to': '1'})
+        view_recorder.flush()
+        room = Room.objects.get(id=1)
+        self.assertEqual(room.message_count, 3)
+        self.assertEqual(room.participant_count, 1)
+        self.assertEqual(room.viewer_count, 1)
+
+    def test_message_counters_on_rating(self):
+        self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'p'))
+        message = Message.objects.get(id=1)
+        self.assertEqual((message.plus_count, message.minus_count, message.score), (1, 0, 1))
+
+        self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'm'))
+        message = Message.objects.get(id=1)
+        self.assertEqual((message.plus_count, message.minus_count, message.score), (0, 1, -1))
+
+        self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'm'))
+        message = Message.objects.get(id=1)
+        self.assertEqual((message.plus_count, message.minus_count, message.score), (0, 0, 0))
+
+    def test_topic_counter_on_room_create_and_delete(self):
+        self.client.post(reverse('room-create-page', args=['1']), {
+            'name': 'Test',
+            'description': 'Test description',
+        })
+        self.assertEqual(Topic.objects.get(id=1).room_count, 2)
+
+        self.client.get(reverse('room-delete-page', args=[Room.objects.get(name='Test').id]))
+        self.assertEqual(Topic.objects.get(id=1).room_count, 1)
+
+    def test_rebuild_counters_command(self):
+        Room.objects.update(message_count=42, participant_count=42, viewer_count=42)
+        Topic.objects.update(room_count=42)
+        Message.objects.update(plus_count=42, minus_count=42, score=42)
+        Vote.objects.create(message_id=1, user_id=1, value=Vote.MINUS)
+
+        call_command('rebuild_counters', stdout=StringIO())
+
+        room = Room.objects.get(id=1)
+        message = Message.objects.get(id=1)
+        self.assertEqual((room.message_count, room.participant_count, room.viewer_count), (1, 0, 0))
+        self.assertEqual(Topic.objects.get(id=1).room_count, 1)
+        self.assertEqual((message.plus_count, message.minus_count, message.score), (0, 1, -1))
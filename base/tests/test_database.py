@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from ..backends.pool import ConnectionPool, PoolTimeout
+from ..models import Room
+from ..performance import RequestMetrics, current_metrics
+
+
+class TestDatabaseSetup(TransactionTestCase):
+    databases = {'default', 'reader'}
+
+    def test_reads_go_to_reader_outside_of_transactions(self):
+        self.assertEqual(Room.objects.all().db, 'reader')
+        with transaction.atomic():
+            self.assertEqual(Room.objects.all().db, 'default')
+        self.assertEqual(Room.objects.create(name='Test Room')._state.db, 'default')
+        self.assertTrue(Room.objects.filter(name='Test Room').exists())
+
+    def test_immediate_transactions(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                Room.objects.create(name='Test Room')
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_init_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -32000)
+
+
+class TestConnections(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.wrapper = type(connections['default'])(
+            {**connection.settings_dict, 'NAME': os.path.join(self.directory.name, 'db.sqlite3'),
+             'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}, alias='health')
+
+    def tearDown(self):
+        self.wrapper.close()
+        self.directory.cleanup()
+
+    def test_persistent_connection_is_checked_once_per_request(self):
+        self.wrapper.ensure_connection()
+        first = self.wrapper.connection
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(self.wrapper, 'is_usable', return_value=True) as is_usable:
+            self.wrapper.ensure_connection()
+            self.wrapper.ensure_connection()
+        self.assertEqual(is_usable.call_count, 1)
+        self.assertIs(self.wrapper.connection, first)
+
+    def test_unusable_connection_is_replaced(self):
+        self.wrapper.ensure_connection()
+        first = self.wrapper.connection
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(self.wrapper, 'is_usable', return_value=False):
+            self.wrapper.ensure_connection()
+        self.assertIsNotNone(self.wrapper.connection)
+        self.assertIsNot(self.wrapper.connection, first)
+
+    def test_no_health_checks(self):
+        self.wrapper.settings_dict['CONN_HEALTH_CHECKS'] = False
+        self.wrapper.ensure_connection()
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(self.wrapper, 'is_usable') as is_usable:
+            self.wrapper.ensure_connection()
+        is_usable.assert_not_called()
+
+    def test_connection_time_recorded(self):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            self.wrapper.ensure_connection()
+        finally:
+            current_metrics.reset(token)
+        self.assertEqual(metrics.connections, 1)
+        self.assertGreater(metrics.connect_time, 0)
+
+
+class TestConnectionPool(SimpleTestCase):
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(size=2)
+        first = pool.acquire(lambda: sqlite3.connect(':memory:'))
+        pool.release(first)
+        self.assertIs(pool.acquire(lambda: sqlite3.connect(':memory:')), first)
+        self.assertEqual(pool.stats()['opened'], 1)
+
+    def test_waits_for_a_free_connection(self):
+        pool = ConnectionPool(size=1, timeout=5)
+        first = pool.acquire(lambda: sqlite3.connect(':memory:', check_same_thread=False))
+        threading.Timer(0.05, pool.release, [first]).start()
+        self.assertIs(pool.acquire(lambda: None), first)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_timeout(self):
+        pool = ConnectionPool(size=1, timeout=0.01)
+        pool.acquire(lambda: sqlite3.connect(':memory:'))
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(lambda: sqlite3.connect(':memory:'))
+
+    def test_discarded_and_stale_connections_are_closed(self):
+        pool = ConnectionPool(size=1, max_idle=0)
+        first = pool.acquire(lambda: sqlite3.connect(':memory:'))
+        pool.release(first, discard=True)
+        second = pool.acquire(lambda: sqlite3.connect(':memory:'))
+        self.assertIsNot(second, first)
+        pool.release(second)
+        time.sleep(0.01)
+        self.assertIsNot(pool.acquire(lambda: sqlite3.connect(':memory:')), second)
+        self.assertEqual(pool.stats(), {'size': 1, 'open': 1, 'idle': 0, 'opened': 3, 'waits': 0, 'wait_time': 0.0})
+        with self.assertRaises(sqlite3.ProgrammingError):
+            second.execute('SELECT 1')
@@ -0,0 +1,105 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+
+
+class TestExport(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Room.objects.create(
+            id=2,
+            name='Other Room',
+            host=User.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=2,
+            content='answer, with "quotes"',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+            answer_to=Message.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=3,
+            content='other room',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=2),
+        )
+
+        self.client = Client()
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_messages', *args, stdout=out)
+        return out.getvalue()
+
+    def test_export_command_jsonl(self):
+        rows = [json.loads(line) for line in self.export('--room', '1').splitlines()]
+        self.assertEqual([row['id'] for row in rows], [1, 2])
+        self.assertEqual(rows[1]['answer_to'], 1)
+        self.assertEqual(rows[1]['content'], 'answer, with "quotes"')
+
+    def test_export_command_csv_resumed(self):
+        lines = self.export('--topic', '1', '--format', 'csv', '--after', '1').splitlines()
+        self.assertEqual(lines[0], 'id,room,user,answer_to,content,created,is_changed,plus_count,minus_count')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('2,1,1,1,"answer, with ""quotes""",'))
+
+    def test_export_command_unknown_room(self):
+        with self.assertRaises(CommandError):
+            self.export('--room', '42')
+
+    def test_room_export_view(self):
+        response = self.client.get(reverse('room-export-page', args=['1']), {'after': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('room-1.jsonl', response['Content-Disposition'])
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [2])
+
+    def test_export_view_ignores_invalid_after(self):
+        response = self.client.get(reverse('room-export-page', args=['1']), {'after': '²'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [1, 2])
+
+    def test_topic_export_view_csv(self):
+        response = self.client.get(reverse('topic-export-page', args=['1']), {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
+    def test_export_view_incorrect(self):
+        response = self.client.get(reverse('room-export-page', args=['42']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_view_not_logged_in(self):
+        self.client.logout()
+        response = self.client.get(reverse('topic-export-page', args=['1']))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,87 @@
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message, Vote
+from ..fragments import fragment_stats, FragmentStats
+
+
+class TestCardCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        fragment_stats.flush()
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+
+        self.client = Client()
+
+    def stats(self, name):
+        # The test client sends request_finished, so the counters are already flushed
+        return FragmentStats.read([name])[name]
+
+    def test_unchanged_cards_are_cache_hits(self):
+        self.client.get(reverse('home-page'))
+        self.client.get(reverse('home-page'))
+        self.assertEqual(self.stats('topic'), (1, 1))
+
+        self.client.get(reverse('topic-page', args=['1']))
+        self.client.get(reverse('topic-page', args=['1']))
+        self.assertEqual(self.stats('room'), (1, 1))
+
+    def test_renamed_author_changes_message_card(self):
+        self.client.get(reverse('room-page', args=['1']))
+        User.objects.filter(id=1).update(username='RenamedUser')
+        response = self.client.get(reverse('room-page', args=['1']))
+        self.assertContains(response, 'by RenamedUser')
+        self.assertEqual(self.stats('message'), (0, 2))
+
+    def test_vote_changes_message_card(self):
+        self.client.get(reverse('room-page', args=['1']))
+        Vote.toggle(1, User.objects.get(id=1), Vote.PLUS)
+        response = self.client.get(reverse('room-page', args=['1']))
+        self.assertContains(response, '+1')
+        self.assertEqual(self.stats('message'), (0, 2))
+
+    def test_message_card_depends_on_authentication(self):
+        self.client.get(reverse('room-page', args=['1']))
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        response = self.client.get(reverse('room-page', args=['1']))
+        self.assertContains(response, 'set_answer_to(1)')
+
+    def test_posted_message_changes_room_card(self):
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        self.client.get(reverse('topic-page', args=['1']))
+        self.client.post(reverse('room-page', args=['1']), {'content': 'Test message text'})
+        response = self.client.get(reverse('topic-page', args=['1']))
+        self.assertContains(response, '2  posts')
+
+    def test_card_cache_stats_command(self):
+        self.client.get(reverse('home-page'))
+        out = StringIO()
+        call_command('card_cache_stats', '--reset', stdout=out)
+        self.assertIn('topic           0 hits        1 misses', out.getvalue())
+        self.assertEqual(self.stats('topic'), (0, 0))
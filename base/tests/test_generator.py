@@ -0,0 +1,45 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from ..models import User, Topic, Room, Message, Vote
+
+
+class TestGenerateData(TestCase):
+
+    def generate(self, **options):
+        call_command('generate_data', users=20, topics=3, rooms=5, messages=200, stdout=StringIO(), **options)
+
+    def counters(self):
+        return (list(Room.objects.order_by('id').values_list('message_count', 'participant_count', 'viewer_count')),
+                list(Message.objects.order_by('id').values_list('plus_count', 'minus_count', 'score')),
+                list(Topic.objects.order_by('id').values_list('room_count', flat=True)))
+
+    def test_generate_data(self):
+        self.generate()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Topic.objects.count(), 3)
+        self.assertEqual(Room.objects.count(), 5)
+        self.assertEqual(Message.objects.count(), 200)
+        self.assertTrue(Message.objects.exclude(answer_to=None).exists())
+        self.assertTrue(Vote.objects.exists())
+        # Answers always belong to a thread of the same room
+        self.assertFalse(Message.objects.exclude(answer_to=None).exclude(answer_to__room=F('room')).exists())
+
+        counters = self.counters()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), counters)
+
+    def test_create_after_generate_data(self):
+        self.generate()
+        # Sequences continue after the generated ids
+        user = User.objects.create(username='new', email='new@example.com')
+        room = Room.objects.create(name='New Room', host=user, topic=Topic.objects.create(name='New Topic'))
+        message = Message.objects.create(content='new', user=user, room=room)
+        self.assertEqual(message.id, Message.objects.order_by('-id').values_list('id', flat=True).first())
+
+    def test_generate_data_twice(self):
+        self.generate()
+        self.generate(seed=1)
+        self.assertEqual(Message.objects.count(), 400)
+        self.assertTrue(User.objects.get(id=21).check_password('password'))
@@ -0,0 +1,114 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from ..models import User, Topic, Room, Message, Vote
+
+
+class TestImportForum(TestCase):
+
+    def setUp(self):
+        User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_jsonl(self, name, rows):
+        (self.path / name).write_text(''.join(json.dumps(row) + '\n' for row in rows))
+
+    def write_archive(self):
+        (self.path / 'users.csv').write_text(
+            'id,email,username,first_name,last_name,password\n'
+            '10,TestEmail@gmail.com,existing,,,\n'
+            '11,new@example.com,NewUser,New,User,\n')
+        self.write_jsonl('topics.jsonl', [{'id': 1, 'name': 'Archive Topic', 'description': 'Imported'}])
+        self.write_jsonl('rooms.jsonl', [{'id': 5, 'name': 'Archive Room', 'host': 11, 'topic': 1,
+                                          'created': '2020-01-01T10:00:00'}])
+        self.write_jsonl('messages.jsonl', [
+            # Answer coming before its thread
+            {'id': 100, 'room': 5, 'user': 10, 'content': 'answer', 'answer_to': 101,
+             'created': '2020-01-01T10:05:00'},
+            {'id': 101, 'room': 5, 'user': 11, 'content': 'thread', 'created': '2020-01-01T10:01:00'},
+            {'id': 102, 'room': 404, 'user': 11, 'content': 'unknown room'},
+        ])
+        (self.path / 'votes.csv').write_text('message,user,value\n101,10,+\n101,11,-1\n101,11,+\n')
+
+    def test_import_forum(self):
+        self.write_archive()
+        out = StringIO()
+        call_command('import_forum', str(self.path), '--chunk-size', '1', stdout=out)
+        self.assertIn('rows/s', out.getvalue())
+
+        self.assertEqual(User.objects.count(), 2)
+        new_user = User.objects.get(email='new@example.com')
+        self.assertFalse(new_user.has_usable_password())
+        room = Room.objects.get(name='Archive Room')
+        self.assertEqual((room.host, room.topic.name, room.created.year), (new_user, 'Archive Topic', 2020))
+        thread = Message.objects.get(content='thread')
+        answer = Message.objects.get(content='answer')
+        self.assertEqual(answer.answer_to, thread)
+        self.assertEqual(answer.user_id, 1)
+        self.assertFalse(Message.objects.filter(content='unknown room').exists())
+
+        self.assertEqual((room.message_count, room.participant_count), (2, 2))
+        self.assertEqual(Topic.objects.get(name='Archive Topic').room_count, 1)
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual((thread.plus_count, thread.minus_count, thread.score), (1, 1, 0))
+
+    def test_answers_are_attached_to_threads(self):
+        self.write_jsonl('users.jsonl', [{'id': 10, 'email': 'TestEmail@gmail.com'}])
+        self.write_jsonl('rooms.jsonl', [{'id': 5, 'name': 'Archive Room', 'host': 10}])
+        self.write_jsonl('messages.jsonl', [
+            {'id': 200, 'room': 5, 'user': 10, 'content': 'answer to an answer', 'answer_to': 201},
+            {'id': 201, 'room': 5, 'user': 10, 'content': 'answer', 'answer_to': 202},
+            {'id': 202, 'room': 5, 'user': 10, 'content': 'thread'},
+            {'id': 203, 'room': 5, 'user': 10, 'content': 'answer to an earlier answer', 'answer_to': 200},
+            {'id': 204, 'room': 5, 'user': 10, 'content': 'answer to a missing message', 'answer_to': 999},
+            {'id': 205, 'room': 5, 'user': 10, 'content': 'cycle', 'answer_to': 206},
+            {'id': 206, 'room': 5, 'user': 10, 'content': 'cycle', 'answer_to': 205},
+        ])
+        call_command('import_forum', str(self.path), '--chunk-size', '2', stdout=StringIO())
+
+        thread = Message.objects.get(content='thread')
+        self.assertEqual(sorted(Message.objects.filter(answer_to=thread).values_list('content', flat=True)),
+                         ['answer', 'answer to an answer', 'answer to an earlier answer'])
+        self.assertEqual(thread.reply_count, 3)
+        self.assertEqual(Message.objects.filter(answer_to=None).count(), 4)
+        # Sequences continue after the imported ids
+        Message.objects.create(content='new', user_id=1, room=Room.objects.get(name='Archive Room'))
+
+    def test_usernames_are_cut_and_made_unique(self):
+        User.objects.create(email='taken@example.com', username='Taken_6')
+        self.write_jsonl('users.jsonl', [
+            {'id': 1, 'email': 'first@example.com', 'username': 'TestUser'},
+            {'id': 2, 'email': 'a-very-long-address@example.com'},
+            {'id': 3, 'email': 'second@example.com', 'username': 'Taken'},
+            {'id': 4, 'email': 'third@example.com', 'username': 'Taken'},
+        ])
+        out = StringIO()
+        call_command('import_forum', str(self.path), stdout=out)
+        usernames = dict(User.objects.values_list('email', 'username'))
+        self.assertEqual(usernames['first@example.com'], 'TestUser_3')
+        self.assertEqual(usernames['a-very-long-address@example.com'], 'a-very-long-address@')
+        self.assertEqual(usernames['second@example.com'], 'Taken')
+        # Taken and Taken_6 both exist already
+        self.assertNotIn('third@example.com', usernames)
+        self.assertIn('1 skipped', out.getvalue())
+
+    def test_import_forum_empty_directory(self):
+        with self.assertRaises(CommandError):
+            call_command('import_forum', str(self.path), stdout=StringIO())
+
+    def test_import_forum_missing_column(self):
+        self.write_jsonl('topics.jsonl', [{'id': 1, 'description': 'No name'}])
+        with self.assertRaisesMessage(CommandError, "missing column 'name'"):
+            call_command('import_forum', str(self.path), stdout=StringIO())
@@ -0,0 +1,115 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from ..models import User, Topic, Room, Message, Notification
+
+
+class TestNotifications(TestCase):
+
+    def setUp(self):
+        for i in (1, 2, 3):
+            user = User.objects.create(
+                id=i,
+                email='TestEmail%s@gmail.com' % i,
+                username='TestUser%s' % i,
+            )
+            user.set_password('1234Test5678')
+            user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='thread',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+        cache.clear()
+
+    def reply(self, user_id, message_id=None):
+        return Message.objects.create(
+            id=message_id,
+            content='answer',
+            user=User.objects.get(id=user_id),
+            room=Room.objects.get(id=1),
+            answer_to=Message.objects.get(id=1),
+        )
+
+    def client_of(self, user_id):
+        client = Client()
+        client.login(email='TestEmail%s@gmail.com' % user_id, password='1234Test5678')
+        return client
+
+    def test_thread_participants_are_notified(self):
+        self.reply(2)
+        self.assertEqual(list(Notification.objects.values_list('user_id', flat=True)), [1])
+        self.reply(3)
+        self.assertEqual(sorted(Notification.objects.filter(actor=3).values_list('user_id', flat=True)), [1, 2])
+        # Own threads and messages are not notified
+        Message.objects.create(id=10, content='not an answer', user_id=2, room_id=1)
+        self.assertFalse(Notification.objects.filter(user=3).exists())
+
+    def test_digest(self):
+        for i in range(3):
+            self.reply(2)
+        notification = Notification.objects.get(user=1)
+        self.assertEqual((notification.count, notification.actor_id), (3, 2))
+        self.assertEqual(Notification.get_unread_count(User.objects.get(id=1)), 3)
+
+        Notification.mark_all_read(User.objects.get(id=1))
+        self.reply(3)
+        self.assertEqual(Notification.objects.filter(user=1).count(), 2)
+        self.assertEqual(Notification.get_unread_count(User.objects.get(id=1)), 1)
+
+    @override_settings(NOTIFICATIONS_DIGEST=False)
+    def test_without_digest(self):
+        for i in range(3):
+            self.reply(2)
+        self.assertEqual(Notification.objects.filter(user=1, count=1).count(), 3)
+
+    def test_unread_count_is_cached(self):
+        user = User.objects.get(id=1)
+        with self.assertNumQueries(1):
+            self.assertEqual(Notification.get_unread_count(user), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(Notification.get_unread_count(user), 0)
+        self.reply(2)
+        self.assertEqual(Notification.get_unread_count(user), 1)
+
+        with self.assertNumQueries(1):
+            Notification.mark_all_read(user)
+        self.assertEqual(Notification.get_unread_count(user), 0)
+
+        self.reply(2, message_id=5)
+        Message.objects.get(id=1).delete()
+        self.assertEqual(Notification.get_unread_count(user), 0)
+
+    def test_pages(self):
+        self.reply(2)
+        client = self.client_of(1)
+        response = client.get(reverse('notifications-page'))
+        self.assertContains(response, 'TestUser2')
+        self.assertContains(response, 'fa-bell"></i> 1')
+
+        client.post(reverse('notifications-page'))
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+        self.assertNotContains(client.get(reverse('home-page')), 'fa-bell"></i> 1')
+
+        self.assertEqual(Client().get(reverse('notifications-page')).status_code, 302)
+
+    def test_room_page_revalidated_with_new_notifications(self):
+        Room.objects.create(id=2, name='Other Room', host=User.objects.get(id=1), topic=Topic.objects.get(id=1))
+        client = self.client_of(1)
+        url = reverse('room-page', args=[2])
+        etag = client.get(url)['ETag']
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.reply(2)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,73 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from ..models import User, Topic, Room, Message
+from ..pagination import keyset_page
+
+
+class TestKeysetPagination(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=user,
+            topic=Topic.objects.get(id=1),
+        )
+        for i in range(1, 11):
+            Message.objects.create(
+                id=i,
+                content='test %s' % i,
+                user=user,
+                room=Room.objects.get(id=1),
+            )
+        # Messages 5 and 6 share the timestamp, ties are broken by id
+        now = timezone.now()
+        for i in range(1, 11):
+            Message.objects.filter(id=i).update(created=now + timedelta(seconds=min(i, 5)))
+
+        self.client = Client()
+
+    def ids(self, page):
+        return [message.id for message in page]
+
+    def test_keyset_page_forward_and_back(self):
+        messages = Message.objects.filter(room=1)
+        first = keyset_page(messages, None, 4)
+        self.assertEqual(self.ids(first), [10, 9, 8, 7])
+        self.assertIsNone(first.prev_cursor)
+
+        second = keyset_page(messages, first.next_cursor, 4)
+        self.assertEqual(self.ids(second), [6, 5, 4, 3])
+
+        third = keyset_page(messages, second.next_cursor, 4)
+        self.assertEqual(self.ids(third), [2, 1])
+        self.assertIsNone(third.next_cursor)
+
+        back = keyset_page(messages, third.prev_cursor, 4)
+        self.assertEqual(self.ids(back), [6, 5, 4, 3])
+        back = keyset_page(messages, back.prev_cursor, 4)
+        self.assertEqual(self.ids(back), [10, 9, 8, 7])
+        self.assertIsNone(back.prev_cursor)
+
+    def test_keyset_page_invalid_cursor(self):
+        page = keyset_page(Message.objects.filter(room=1), 'not a cursor', 4)
+        self.assertEqual(self.ids(page), [10, 9, 8, 7])
+
+    def test_room_view_GET_cursor(self):
+        response = self.client.get('%s?cursor=%s' % (reverse('room-page', args=['1']), ''))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['messages_to_render']), 10)
+        self.assertIsNone(response.context['messages_to_render'].next_cursor)
@@ -0,0 +1,88 @@
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+from ..performance import view_stats, query_budget_exceeded
+
+
+class TestPerformanceMiddleware(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        view_stats.clear()
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+
+        self.client = Client()
+
+    def test_metrics_recorded_per_url_name(self):
+        self.client.get(reverse('room-page', args=['1']))
+        self.client.get(reverse('room-page', args=['1']))
+        self.client.get(reverse('home-page'))
+        summary = view_stats.summary()
+        self.assertEqual(summary['room-page']['requests'], 2)
+        self.assertEqual(summary['home-page']['requests'], 1)
+        queries, db_time, render_time, total_time = (summary['room-page'][metric][0] for metric in
+                                                     ('queries', 'db_time', 'render_time', 'total_time'))
+        self.assertGreater(queries, 0)
+        self.assertGreater(render_time, 0)
+        self.assertGreaterEqual(total_time, render_time)
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('home-page'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, '
+                                                     r'total;dur=[\d.]+, conn;dur=[\d.]+;desc="\d+ connections"$')
+
+    def test_no_server_timing_header_by_default(self):
+        response = self.client.get(reverse('home-page'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PERFORMANCE_QUERY_BUDGETS={'room-page': 1})
+    def test_query_budget_alarm(self):
+        alarms = []
+
+        def receiver(sender, view_name, queries, budget, **kwargs):
+            alarms.append((view_name, budget))
+        query_budget_exceeded.connect(receiver)
+        try:
+            with self.assertLogs('base.performance', 'WARNING'):
+                self.client.get(reverse('room-page', args=['1']))
+            self.client.get(reverse('home-page'))
+        finally:
+            query_budget_exceeded.disconnect(receiver)
+        self.assertEqual(alarms, [('room-page', 1)])
+        self.assertEqual(view_stats.summary()['room-page']['over_budget'], 1)
+
+    def test_performance_report_command(self):
+        self.client.get(reverse('room-page', args=['1']))
+        view_stats.publish()
+        out = StringIO()
+        call_command('performance_report', '--view', 'room-page', stdout=out)
+        self.assertIn('room-page: 1 requests, 0 over the query budget', out.getvalue())
+        self.assertIn('render_time', out.getvalue())
+        self.assertNotIn('home-page', out.getvalue())
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from ..models import User, Topic, Room
+
+
+class TestPopularRooms(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        for i in range(1, 8):
+            Room.objects.create(
+                id=i,
+                name='Test Room %s' % i,
+                host=self.user,
+                topic=Topic.objects.get(id=1),
+            )
+
+    def test_get_popular_is_cached(self):
+        rooms = Room.get_popular()
+        self.assertEqual(len(rooms), 5)
+        with self.assertNumQueries(0):
+            self.assertEqual([room.id for room in Room.get_popular()], [room.id for room in rooms])
+
+    def test_get_popular_not_enough_rooms(self):
+        Room.objects.filter(id__gt=5).delete()
+        self.assertEqual(Room.get_popular(refresh=True), [])
+
+    def test_get_popular_invalidated_on_new_participant(self):
+        Room.get_popular()
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.get(id=7).participants.add(self.user)
+        self.assertEqual(Room.get_popular()[0].id, 7)
+
+    def test_get_popular_decays_old_rooms(self):
+        users = [User.objects.create(email='%s@gmail.com' % i, username='User%s' % i) for i in range(10)]
+        Room.objects.get(id=1).participants.add(*users)
+        Room.objects.get(id=2).participants.add(*users[:3])
+        Room.objects.filter(id=1).update(updated=timezone.now() - timedelta(days=7))
+
+        rooms = Room.get_popular(refresh=True)
+        self.assertEqual(rooms[0].id, 2)
+        self.assertIn(1, [room.id for room in rooms])
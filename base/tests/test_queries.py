@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message, Vote
+from ..tracking import view_recorder
+
+
+class TestRoomViewQueries(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        user2 = User.objects.create(
+            id=2,
+            email='TestEmail2@gmail.com',
+            username='TestUser2',
+        )
+        user2.set_password('1234Test5678')
+        user2.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+
+        # Popular rooms are served from the cache, warm it up so only the page itself is measured
+        cache.clear()
+        Room.get_popular()
+        # Views of earlier tests could be flushed after a measured request
+        view_recorder.flush()
+
+        self.client = Client()
+
+    def create_messages(self, count, answers_per_message):
+        room = Room.objects.get(id=1)
+        users = list(User.objects.all())
+        for i in range(count):
+            message = Message.objects.create(
+                content='test %s' % i,
+                user=users[i % 2],
+                room=room,
+            )
+            Vote.toggle(message.id, users[0], Vote.MINUS)
+            for user in users[1:]:
+                Vote.toggle(message.id, user, Vote.PLUS)
+            for j in range(answers_per_message):
+                answer = Message.objects.create(
+                    content='answer %s' % j,
+                    user=users[j % 2],
+                    room=room,
+                    answer_to=message,
+                )
+                Vote.toggle(answer.id, users[1], Vote.PLUS)
+
+    def test_room_view_GET_query_count_does_not_depend_on_messages(self):
+        self.create_messages(1, 0)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('room-page', args=['1']))
+        self.assertEqual(response.status_code, 200)
+
+        self.create_messages(20, 3)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('room-page', args=['1']))
+        self.assertEqual(response.status_code, 200)
+
+        # Number of threads is cached until the next message is posted
+        with self.assertNumQueries(2):
+            response = self.client.get('%s?page=%s' % (reverse('room-page', args=['1']), '2'))
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('%s?cursor=%s' % (reverse('room-page', args=['1']), ''))
+        self.assertEqual(response.status_code, 200)
+
+    def test_room_view_GET_renders_ratings_and_reply_counts(self):
+        self.create_messages(1, 2)
+        response = self.client.get(reverse('room-page', args=['1']))
+        message = response.context['messages_to_render'][0]
+        self.assertEqual(message.plus_count, 1)
+        self.assertEqual(message.minus_count, 1)
+        self.assertEqual(message.reply_count, 2)
+        self.assertContains(response, 'Show answers (2)')
+        # Answers are loaded on demand
+        self.assertNotContains(response, 'answer 1')
+
+    def test_replies_query_count_does_not_depend_on_replies(self):
+        self.create_messages(1, 3)
+        thread = Message.objects.get(answer_to=None)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('message-replies-page', args=[thread.id]))
+
+        self.create_messages(1, 30)
+        thread = Message.objects.filter(answer_to=None).latest()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('message-replies-page', args=[thread.id]))
+        self.assertContains(response, 'answer 29')
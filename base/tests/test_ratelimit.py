@@ -0,0 +1,94 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+from ..ratelimit import take, local_buckets
+
+
+@override_settings(RATE_LIMITS={'post': (2, 60), 'vote': (3, 60), 'room': (1, 60), 'login': (2, 60)})
+class TestRateLimit(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        local_buckets.clear()
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+
+        self.client = Client()
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+
+    def test_token_bucket(self):
+        self.assertEqual([take('post', 'user1', now=1000) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(take('post', 'user1', now=1000), 30)
+        # One token is back after 30 seconds, the bucket is full again after 60
+        self.assertEqual(take('post', 'user1', now=1030), 0)
+        self.assertGreater(take('post', 'user1', now=1030), 0)
+        self.assertEqual([take('post', 'user1', now=1120) for _ in range(2)], [0, 0])
+        self.assertEqual(take('post', 'user2', now=1120), 0)
+        self.assertEqual(take('search', 'user1', now=1120), 0)
+
+    def test_posting_limited_before_any_query(self):
+        for i in range(2):
+            self.client.post(reverse('room-page', args=['1']), {'content': 'message %s' % i})
+        self.client.get(reverse('login-page'))
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('room-page', args=['1']), {'content': 'too many'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertFalse(Message.objects.filter(content='too many').exists())
+        # Reading is not limited
+        self.assertEqual(self.client.get(reverse('room-page', args=['1'])).status_code, 200)
+
+    def test_voting_limited(self):
+        url = reverse('message-rating-page', args=['1']) + '?action=p&format=json'
+        statuses = [self.client.get(url).status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(self.client.get(url).json(), {'error': 'Too many requests'})
+
+    def test_room_creation_limited(self):
+        url = reverse('room-create-page', args=['1'])
+        self.client.post(url, {'name': 'First', 'description': ''})
+        self.assertEqual(self.client.post(url, {'name': 'Second', 'description': ''}).status_code, 429)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(Room.objects.filter(name='Second').exists())
+
+    def test_login_limited_by_ip(self):
+        client = Client()
+        for address, expected in (('10.0.0.1', 200), ('10.0.0.1', 200), ('10.0.0.1', 429), ('10.0.0.2', 200)):
+            response = client.post(reverse('login-page'), {'email': 'TestEmail@gmail.com', 'password': 'wrong'},
+                                   REMOTE_ADDR=address)
+            self.assertEqual(response.status_code, expected)
+
+    @override_settings(RATE_LIMIT_CACHE=None)
+    def test_in_process_buckets(self):
+        self.assertEqual([take('room', 'user1') for _ in range(2)][0], 0)
+        self.assertGreater(take('room', 'user1'), 0)
+        self.assertIsNone(cache.get('ratelimit_room_user1'))
+
+    def test_cache_failure_falls_back_to_in_process_buckets(self):
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError), self.assertLogs('base.ratelimit'):
+            self.assertEqual(take('room', 'user1'), 0)
+            self.assertGreater(take('room', 'user1'), 0)
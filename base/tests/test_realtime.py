@@ -0,0 +1,173 @@
+import asyncio
+import json
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, Client
+from forum.asgi import application
+from ..models import User, Topic, Room, Message
+from .. import realtime
+
+
+class WebSocketClient:
+    # Talks to the ASGI application directly, without a server
+
+    def __init__(self, path, headers=()):
+        self.scope = {'type': 'websocket', 'path': path, 'headers': list(headers)}
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+
+    async def connect(self):
+        self.task = asyncio.ensure_future(application(self.scope, self.incoming.get, self.outgoing.put))
+        await self.incoming.put({'type': 'websocket.connect'})
+        return await self.receive()
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outgoing.get(), 1)
+
+    async def disconnect(self):
+        await self.incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 1)
+
+
+class TestRealtime(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=user,
+            topic=Topic.objects.get(id=1),
+        )
+
+    async def test_room_socket_receives_events(self):
+        client = WebSocketClient('/ws/room/1')
+        self.assertEqual((await client.connect())['type'], 'websocket.accept')
+        self.assertEqual(realtime.get_broadcaster().subscribers_count(realtime.room_group(1)), 1)
+
+        realtime.publish(1, {'type': 'status', 'is_closed': True})
+        event = await client.receive()
+        self.assertEqual(json.loads(event['text']), {'type': 'status', 'is_closed': True})
+
+        await client.disconnect()
+        self.assertEqual(realtime.get_broadcaster().subscribers_count(realtime.room_group(1)), 0)
+
+    async def test_room_socket_unknown_room(self):
+        client = WebSocketClient('/ws/room/42')
+        self.assertEqual((await client.connect())['type'], 'websocket.close')
+
+    def session_cookie(self):
+        client = Client()
+        client.force_login(User.objects.get(id=1))
+        name = settings.SESSION_COOKIE_NAME
+        return ('%s=%s' % (name, client.cookies[name].value)).encode()
+
+    async def test_room_socket_restricted_topic(self):
+        await sync_to_async(Topic.objects.filter(id=1).update)(is_restricted=True)
+        client = WebSocketClient('/ws/room/1')
+        self.assertEqual(await client.connect(), {'type': 'websocket.close', 'code': 4403})
+
+        cookie = await sync_to_async(self.session_cookie)()
+        client = WebSocketClient('/ws/room/1', [(b'cookie', cookie)])
+        self.assertEqual((await client.connect())['code'], 4403)
+
+        await sync_to_async(lambda: Topic.objects.get(id=1).whitelist.add(1))()
+        client = WebSocketClient('/ws/room/1', [(b'cookie', cookie)])
+        self.assertEqual((await client.connect())['type'], 'websocket.accept')
+        await client.disconnect()
+
+    def test_new_message_is_published(self):
+        with mock.patch.object(realtime.get_broadcaster(), 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                Message.objects.create(
+                    id=1,
+                    content='test',
+                    user=User.objects.get(id=1),
+                    room=Room.objects.get(id=1),
+                )
+        group, text = publish.call_args[0]
+        self.assertEqual(group, 'room_1')
+        self.assertEqual(json.loads(text)['type'], 'message')
+        self.assertEqual(json.loads(text)['content'], 'test')
+
+
+class PausedPubSub:
+    """Pub/sub connection whose unsubscribe waits until released, the subscribed channels are in channels."""
+
+    def __init__(self):
+        self.channels = set()
+        self.unsubscribing = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def subscribe(self, channel):
+        await asyncio.sleep(0)
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.unsubscribing.set()
+        await self.release.wait()
+        self.channels.discard(channel)
+
+    async def listen(self):
+        await asyncio.Event().wait()
+        yield
+
+
+class TestRedisBroadcaster(SimpleTestCase):
+
+    def broadcaster(self):
+        redis = mock.Mock(RedisError=type('RedisError', (Exception,), {}))
+        with mock.patch.dict('sys.modules', {'redis': redis, 'redis.asyncio': redis.asyncio}):
+            return realtime.RedisBroadcaster()
+
+    def test_publish_errors_are_logged(self):
+        broadcaster = self.broadcaster()
+        broadcaster._publisher.publish.side_effect = ConnectionRefusedError
+        with self.assertLogs('base.realtime', 'WARNING'):
+            broadcaster.publish('room_1', '{}')
+
+    async def test_subscribe_while_the_last_subscriber_leaves(self):
+        broadcaster = self.broadcaster()
+        broadcaster._pubsub = pubsub = PausedPubSub()
+        entered, leave = asyncio.Event(), asyncio.Event()
+
+        async def first():
+            async with broadcaster.subscribe('room_1'):
+                pass
+
+        async def second():
+            async with broadcaster.subscribe('room_1'):
+                entered.set()
+                await leave.wait()
+
+        tasks = [asyncio.ensure_future(first())]
+        await pubsub.unsubscribing.wait()
+        # The second subscriber arrives while the channel of the first one is being unsubscribed
+        tasks.append(asyncio.ensure_future(second()))
+        await asyncio.sleep(0)
+        pubsub.release.set()
+        await asyncio.wait_for(entered.wait(), 1)
+        self.assertEqual(pubsub.channels, {'forum:room_1'})
+
+        leave.set()
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        self.assertEqual(pubsub.channels, set())
+        self.assertEqual(broadcaster._group_locks, {})
+        broadcaster._reader.cancel()
+
+    async def test_slow_socket_loses_the_oldest_events(self):
+        broadcaster = realtime.InProcessBroadcaster(queue_size=2)
+        async with broadcaster.subscribe('room_1') as queue:
+            for text in ('1', '2', '3'):
+                broadcaster.publish('room_1', text)
+            await asyncio.sleep(0)
+            self.assertEqual([queue.get_nowait() for _ in range(queue.qsize())], ['2', '3'])
@@ -0,0 +1,99 @@
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+
+
+class TestReplies(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Room.objects.create(
+            id=2,
+            name='Second Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='thread',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+        for i in range(2, 7):
+            Message.objects.create(
+                id=i,
+                content='answer %s' % i,
+                user=User.objects.get(id=1),
+                room=Room.objects.get(id=1),
+                answer_to=Message.objects.get(id=1),
+            )
+
+        self.client = Client()
+
+    def test_reply_count(self):
+        self.assertEqual(Message.objects.get(id=1).reply_count, 5)
+        Message.objects.get(id=6).delete()
+        self.assertEqual(Message.objects.get(id=1).reply_count, 4)
+
+    def test_reply_count_on_post(self):
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        self.client.post(reverse('room-page', args=['1']), {'content': 'answer', 'answer_to': '1'})
+        self.assertEqual(Message.objects.get(id=1).reply_count, 6)
+
+    def test_answers_only_to_threads_of_the_room(self):
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        self.client.post(reverse('room-page', args=['1']), {'content': 'to an answer', 'answer_to': '2'})
+        self.client.post(reverse('room-page', args=['2']), {'content': 'to another room', 'answer_to': '1'})
+        self.client.post(reverse('room-page', args=['1']), {'content': 'to nothing', 'answer_to': '100'})
+        self.assertFalse(Message.objects.filter(content__startswith='to ').exclude(answer_to=None).exists())
+        self.assertEqual(Message.objects.get(id=1).reply_count, 5)
+
+    @override_settings(MESSAGE_REPLIES_PER_PAGE=3)
+    def test_html_fragment(self):
+        response = self.client.get(reverse('message-replies-page', args=['1']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'base/components/message_replies.html')
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, 'answer 6')
+        self.assertNotContains(response, 'answer 3')
+        self.assertContains(response, 'More answers')
+
+        response = self.client.get(reverse('message-replies-page', args=['1']) + '?cursor=' +
+                                   response.context['replies'].next_cursor)
+        self.assertContains(response, 'answer 3')
+        self.assertNotContains(response, 'answer 6')
+        self.assertNotContains(response, 'More answers')
+
+    @override_settings(MESSAGE_REPLIES_PER_PAGE=3)
+    def test_json(self):
+        response = self.client.get(reverse('message-replies-page', args=['1']) + '?format=json')
+        data = response.json()
+        self.assertEqual(data['reply_count'], 5)
+        self.assertEqual([reply['id'] for reply in data['replies']], [6, 5, 4])
+        self.assertEqual(data['replies'][0]['username'], 'TestUser')
+
+        data = self.client.get(reverse('message-replies-page', args=['1']),
+                               {'cursor': data['next_cursor']}, HTTP_ACCEPT='application/json').json()
+        self.assertEqual([reply['id'] for reply in data['replies']], [3, 2])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_not_found(self):
+        self.assertEqual(self.client.get(reverse('message-replies-page', args=['2'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('message-replies-page', args=['100'])).status_code, 404)
@@ -0,0 +1,113 @@
+import json
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message, MessageRevision
+from .. import search
+
+
+class TestRevisions(TestCase):
+
+    def setUp(self):
+        for i in (1, 2):
+            user = User.objects.create(
+                id=i,
+                email='TestEmail%s@gmail.com' % i,
+                username='TestUser%s' % i,
+            )
+            user.set_password('1234Test5678')
+            user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='original thread',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=2,
+            content='answer',
+            user=User.objects.get(id=2),
+            room=Room.objects.get(id=1),
+            answer_to=Message.objects.get(id=1),
+        )
+        cache.clear()
+
+    def client_of(self, user_id):
+        client = Client()
+        client.login(email='TestEmail%s@gmail.com' % user_id, password='1234Test5678')
+        return client
+
+    def test_pack(self):
+        for text in ('short', 'long and repetitive ' * 50):
+            revision = MessageRevision(**MessageRevision.pack(text))
+            self.assertEqual(revision.text, text)
+        self.assertTrue(MessageRevision.pack('long and repetitive ' * 50)['is_compressed'])
+        self.assertFalse(MessageRevision.pack('short')['is_compressed'])
+
+    def test_edit(self):
+        client = self.client_of(1)
+        url = reverse('room-page', args=[1])
+        self.assertContains(client.get(url), 'original thread')
+        updated = Room.objects.get(id=1).updated
+
+        client.post(reverse('message-edit-page', args=[1]), {'content': 'edited thread'})
+        message = Message.objects.get(id=1)
+        self.assertEqual((message.content, message.is_changed, message.version), ('edited thread', True, 1))
+        self.assertEqual([revision.text for revision in message.revisions.all()], ['original thread'])
+        self.assertGreater(Room.objects.get(id=1).updated, updated)
+        # The cached card of the message was rendered again
+        response = client.get(url)
+        self.assertContains(response, 'edited thread')
+        self.assertContains(response, '(edited)')
+        self.assertEqual(search.search('edited', 1, 20, User.objects.get(id=1))[1], 1)
+        self.assertEqual(search.search('original', 1, 20, User.objects.get(id=1))[1], 0)
+
+        self.assertFalse(Message.edit(1, 'edited thread'))
+        self.assertEqual(MessageRevision.objects.count(), 1)
+
+    def test_only_authors_edit_and_delete(self):
+        client = self.client_of(2)
+        self.assertEqual(client.post(reverse('message-edit-page', args=[1]), {'content': 'x'}).status_code, 403)
+        self.assertEqual(client.post(reverse('message-delete-page', args=[1])).status_code, 403)
+        self.assertEqual(Client().get(reverse('message-edit-page', args=[1])).status_code, 302)
+        Room.objects.filter(id=1).update(is_closed=True)
+        self.assertEqual(self.client_of(1).post(reverse('message-edit-page', args=[1]), {'content': 'x'}).status_code,
+                         403)
+        self.assertEqual(Message.objects.get(id=1).content, 'original thread')
+
+    def test_history(self):
+        Message.edit(1, 'second')
+        Message.edit(1, 'third')
+        client = self.client_of(2)
+        response = client.get(reverse('message-history-page', args=[1]), {'format': 'jsonl'})
+        self.assertTrue(response.streaming)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([line['content'] for line in lines], ['second', 'original thread'])
+
+        html = b''.join(client.get(reverse('message-history-page', args=[1])).streaming_content).decode()
+        self.assertLess(html.index('second'), html.index('original thread'))
+
+        Topic.objects.filter(id=1).update(is_restricted=True)
+        self.assertEqual(client.get(reverse('message-history-page', args=[1])).status_code, 403)
+
+    def test_delete(self):
+        self.client_of(2).post(reverse('message-delete-page', args=[2]))
+        self.assertFalse(Message.objects.filter(id=2).exists())
+        self.assertEqual(Message.objects.get(id=1).reply_count, 0)
+        self.assertEqual(Room.objects.get(id=1).message_count, 1)
+
+        Message.edit(1, 'edited')
+        self.client_of(1).post(reverse('message-delete-page', args=[1]))
+        self.assertEqual(Room.objects.get(id=1).message_count, 0)
+        self.assertFalse(MessageRevision.objects.exists())
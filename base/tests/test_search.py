@@ -0,0 +1,125 @@
+from io import StringIO
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message
+from .. import search
+
+
+class TestSearch(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        Topic.objects.create(
+            id=1,
+            name='Python',
+            description='Everything about snakes and programming',
+        )
+        Room.objects.create(
+            id=1,
+            name='Django questions',
+            description='Ask about the python web framework',
+            host=user,
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='How do I write a python decorator?',
+            user=user,
+            room=Room.objects.get(id=1),
+        )
+        self.client = Client()
+
+    def found(self, query, user=AnonymousUser()):
+        results, total = search.search(query, 1, 20, user)
+        return [(kind, result.id) for kind, result in results]
+
+    def test_search_finds_all_kinds(self):
+        self.assertEqual(sorted(self.found('python')), [('message', 1), ('room', 1), ('topic', 1)])
+        self.assertEqual(self.found('decorator'), [('message', 1)])
+        self.assertEqual(self.found('Djan'), [('room', 1)])
+        self.assertEqual(self.found('python framework'), [('room', 1)])
+
+    def test_search_hides_restricted_topics(self):
+        Topic.objects.filter(id=1).update(is_restricted=True)
+        self.assertEqual(self.found('python'), [])
+        Topic.objects.get(id=1).whitelist.add(1)
+        self.assertEqual(sorted(self.found('python', User.objects.get(id=1))),
+                         [('message', 1), ('room', 1), ('topic', 1)])
+
+    def test_restricted_topics_are_cached_until_saved(self):
+        self.assertEqual(len(self.found('python')), 3)
+        topic = Topic.objects.get(id=1)
+        topic.is_restricted = True
+        topic.save()
+        with self.assertNumQueries(3):
+            self.assertEqual(self.found('python'), [])
+        with self.assertNumQueries(2):
+            self.assertEqual(self.found('python'), [])
+
+    def test_search_pages_and_total_leave_out_restricted_topics(self):
+        restricted = Topic.objects.create(id=2, name='Private', is_restricted=True)
+        room = Room.objects.create(id=2, name='Private python', host_id=1, topic=restricted)
+        for i in range(2, 30):
+            Message.objects.create(id=i, content='python secret %s' % i, user_id=1, room=room)
+        results, total = search.search('python', 1, 2, AnonymousUser())
+        self.assertEqual((len(results), total), (2, 3))
+        self.assertEqual(len(search.search('python', 2, 2, AnonymousUser())[0]), 1)
+        restricted.whitelist.add(1)
+        self.assertEqual(search.search('python', 1, 2, User.objects.get(id=1))[1], 32)
+
+    def test_search_follows_room_to_another_topic(self):
+        restricted = Topic.objects.create(id=2, name='Private', is_restricted=True)
+        room = Room.objects.get(id=1)
+        room.topic = restricted
+        room.save()
+        self.assertEqual(self.found('decorator'), [])
+        self.assertEqual(search.search('decorator', 1, 20, AnonymousUser())[1], 0)
+        room.topic_id = 1
+        room.save()
+        self.assertEqual(self.found('decorator'), [('message', 1)])
+
+    def test_search_ranks_titles_first(self):
+        self.assertEqual(self.found('python')[0], ('topic', 1))
+
+    def test_search_index_is_updated(self):
+        message = Message.objects.get(id=1)
+        message.content = 'Changed text about generators'
+        message.save()
+        self.assertEqual(self.found('decorator'), [])
+        self.assertEqual(self.found('generators'), [('message', 1)])
+
+        message.delete()
+        self.assertEqual(self.found('generators'), [])
+
+        Room.objects.get(id=1).delete()
+        self.assertEqual(self.found('Django'), [])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.found('"python" OR * NEAR('), [])
+        self.assertEqual(self.found('   '), [])
+
+    def test_rebuild_search_index_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM base_search')
+        self.assertEqual(self.found('python'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.found('python')), 3)
+
+    def test_search_view_GET(self):
+        response = self.client.get('%s?q=%s' % (reverse('search-page'), 'decorator'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'base/search.html')
+        self.assertEqual(response.context['total_results'], 1)
+        self.assertContains(response, 'How do I write a python decorator?')
+
+    def test_search_view_ignores_invalid_pages(self):
+        for page in ('0', 'x', '²'):
+            response = self.client.get(reverse('search-page'), {'q': 'decorator', 'page': page})
+            self.assertEqual(response.context['current_page'], 1)
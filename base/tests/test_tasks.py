@@ -0,0 +1,153 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from ..models import User, Topic, Room, Message, Job, deleted_rooms
+from ..tasks import task, claim, run, work, queue_lag
+from .. import search, signals
+
+calls = []
+
+
+@task(retries=1)
+def recorded(value):
+    if value == 'fail':
+        raise ValueError(value)
+    calls.append(value)
+
+
+@override_settings(TASKS_EAGER=False)
+class TestTasks(TestCase):
+
+    def setUp(self):
+        calls.clear()
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        work()
+
+    def test_eager(self):
+        with override_settings(TASKS_EAGER=True):
+            recorded.enqueue('now')
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_enqueue_and_work(self):
+        recorded.enqueue('later')
+        self.assertEqual(calls, [])
+        self.assertEqual(Job.objects.get().args, ['later'])
+        self.assertEqual(work(), 1)
+        self.assertEqual(calls, ['later'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_then_fail(self):
+        recorded.enqueue('fail')
+        with self.assertLogs('base.tasks', 'WARNING'):
+            self.assertEqual(work(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('ValueError', job.error)
+        # Not due before the retry delay
+        self.assertEqual(work(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('base.tasks', 'ERROR'):
+            self.assertEqual(work(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        Job.objects.update(run_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(work(), 0)
+
+    def test_unknown_task_fails(self):
+        Job.objects.create(name='base.missing')
+        with self.assertLogs('base.tasks', 'ERROR'):
+            work()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        recorded.enqueue('once')
+        jobs = claim(10)
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(claim(10), [])
+        # Until the lease of its worker expires
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(len(claim(10)), 1)
+        run(jobs[0])
+        self.assertEqual(calls, ['once'])
+
+    def test_queue_lag(self):
+        self.assertEqual(queue_lag(), 0)
+        Job.objects.create(name=recorded.name, args=['x'], run_at=timezone.now() - timedelta(seconds=30))
+        self.assertGreaterEqual(queue_lag(), 30)
+        with override_settings(TASK_LAG_WARNING=10), self.assertLogs('base.tasks', 'WARNING'):
+            work()
+        self.assertEqual(queue_lag(), 0)
+
+    def test_post_side_effects_are_queued(self):
+        client = Client()
+        client.login(email='TestEmail@gmail.com', password='1234Test5678')
+        client.post(reverse('room-page', args=[1]), {'content': 'queued message'})
+        room = Room.objects.get(id=1)
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertEqual((room.message_count, room.participant_count), (0, 0))
+        self.assertEqual(Job.objects.count(), 3)
+
+        call_command('run_worker', once=True, stdout=StringIO())
+        room = Room.objects.get(id=1)
+        self.assertEqual((room.message_count, room.participant_count), (1, 1))
+        self.assertEqual(search.search('queued', 1, 20, User.objects.get(id=1))[1], 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_deleted_message_is_not_indexed(self):
+        message = Message.objects.create(id=1, content='gone', user_id=1, room_id=1)
+        message.delete()
+        work()
+        room = Room.objects.get(id=1)
+        self.assertEqual(room.message_count, 0)
+        self.assertEqual(search.search('gone', 1, 20, User.objects.get(id=1))[1], 0)
+
+    def test_deleted_room_is_removed_at_once(self):
+        for i in range(1, 6):
+            Message.objects.create(id=i, content='doomed %s' % i, user_id=1, room_id=1,
+                                   answer_to_id=1 if i > 1 else None)
+        work()
+        Room.objects.get(id=1).delete()
+        # No job per message, one for the room and its documents
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['base.signals.room_documents_removed'])
+        self.assertEqual(search.search('doomed', 1, 20, User.objects.get(id=1))[1], 5)
+        self.assertEqual(work(), 1)
+        self.assertEqual(search.search('doomed', 1, 20, User.objects.get(id=1))[1], 0)
+        self.assertEqual(search.search('room', 1, 20, User.objects.get(id=1))[1], 0)
+
+    def test_failed_room_delete_leaves_its_messages_handled(self):
+        Message.objects.create(id=1, content='kept', user_id=1, room_id=1)
+        work()
+        with mock.patch.object(signals.room_documents_removed, 'enqueue', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Room.objects.get(id=1).delete()
+        self.assertEqual(deleted_rooms.ids, set())
+        self.assertTrue(Message.objects.filter(id=1).exists())
+
+        Message.objects.get(id=1).delete()
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)), ['base.signals.message_removed'])
+        self.assertEqual(search.search('kept', 1, 20, User.objects.get(id=1))[1], 0)
@@ -0,0 +1,90 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from ..models import User, Topic, Room
+from ..tracking import ViewRecorder
+
+
+class TestViewRecorder(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        self.user2 = User.objects.create(
+            id=2,
+            email='TestEmail2@gmail.com',
+            username='TestUser2',
+        )
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=self.user,
+            topic=Topic.objects.get(id=1),
+        )
+        self.recorder = ViewRecorder()
+
+    def test_record_is_buffered_and_deduplicated(self):
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.recorder.record(1, 1)
+            self.recorder.record(1, 2)
+        self.assertEqual(Room.objects.get(id=1).viewers.count(), 0)
+
+        self.assertEqual(self.recorder.flush(), 2)
+        room = Room.objects.get(id=1)
+        self.assertEqual(room.viewers.count(), 2)
+        self.assertEqual(room.viewer_count, 2)
+
+    def test_flush_ignores_existing_and_deleted(self):
+        Room.objects.get(id=1).viewers.add(self.user)
+        self.recorder.record(1, 1)
+        self.recorder.record(42, 1)
+        self.recorder.flush()
+        room = Room.objects.get(id=1)
+        self.assertEqual(room.viewers.count(), 1)
+        self.assertEqual(room.viewer_count, 1)
+
+    @override_settings(VIEW_TRACKING_MAX_PENDING=2, VIEW_TRACKING_FLUSH_INTERVAL=60)
+    def test_flush_is_due_by_size(self):
+        self.recorder.record(1, 1)
+        self.assertFalse(self.recorder.is_due())
+        self.recorder.record(1, 2)
+        self.assertTrue(self.recorder.is_due())
+
+    @override_settings(VIEW_TRACKING_MAX_PENDING=100, VIEW_TRACKING_FLUSH_INTERVAL=0)
+    def test_flush_is_due_by_interval(self):
+        self.assertFalse(self.recorder.is_due())
+        self.recorder.record(1, 1)
+        self.recorder.flush_if_due()
+        self.assertEqual(Room.objects.get(id=1).viewer_count, 1)
+
+    @override_settings(VIEW_TRACKING_FLUSH_THREAD=True, VIEW_TRACKING_FLUSH_INTERVAL=60)
+    def test_timer_bounds_the_interval_without_requests(self):
+        self.recorder.record(1, 1)
+        timer = self.recorder._timer
+        self.addCleanup(timer.cancel)
+        self.assertTrue(timer.is_alive())
+        self.assertEqual(timer.interval, 60)
+        # One timer for the whole batch
+        self.recorder.record(1, 2)
+        self.assertIs(self.recorder._timer, timer)
+
+    @override_settings(VIEW_TRACKING_FLUSH_THREAD=False)
+    def test_no_timer_without_flush_thread(self):
+        self.recorder.record(1, 1)
+        self.assertIsNone(self.recorder._timer)
+
+    def test_failed_flush_keeps_the_views(self):
+        self.recorder.record(1, 1)
+        with mock.patch.object(ViewRecorder, '_write', side_effect=RuntimeError('database down')), \
+                self.assertLogs('base.tracking', 'ERROR'):
+            self.assertEqual(self.recorder.flush(), 0)
+        self.recorder.record(1, 2)
+        self.assertEqual(self.recorder.flush(), 2)
+        self.assertEqual(Room.objects.get(id=1).viewer_count, 2)
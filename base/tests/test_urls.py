@@ -75,3 +75,35 @@ class TestUrls(TestCase):
     def message_rating_url_is_resolved(self):
         url = reverse('message-rating-page', args=['1'])
         self.assertEquals(resolve(url).func, views.message_rating_view)
+
+    def test_search_url_is_resolved(self):
+        url = reverse('search-page')
+        self.assertEquals(resolve(url).func, views.search_view)
+
+    def test_room_export_url_is_resolved(self):
+        url = reverse('room-export-page', args=['1'])
+        self.assertEquals(resolve(url).func, views.room_export_view)
+
+    def test_topic_export_url_is_resolved(self):
+        url = reverse('topic-export-page', args=['1'])
+        self.assertEquals(resolve(url).func, views.topic_export_view)
+
+    def test_message_replies_url_is_resolved(self):
+        url = reverse('message-replies-page', args=['1'])
+        self.assertEquals(resolve(url).func, views.message_replies_view)
+
+    def test_notifications_url_is_resolved(self):
+        url = reverse('notifications-page')
+        self.assertEquals(resolve(url).func, views.notifications_view)
+
+    def test_message_edit_url_is_resolved(self):
+        url = reverse('message-edit-page', args=['1'])
+        self.assertEquals(resolve(url).func, views.message_edit_view)
+
+    def test_message_delete_url_is_resolved(self):
+        url = reverse('message-delete-page', args=['1'])
+        self.assertEquals(resolve(url).func, views.message_delete_view)
+
+    def test_message_history_url_is_resolved(self):
+        url = reverse('message-history-page', args=['1'])
+        self.assertEquals(resolve(url).func, views.message_history_view)
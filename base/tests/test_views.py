@@ -1,6 +1,7 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from ..models import User, Topic, Room, Message
+from ..tracking import view_recorder
 from django.contrib import auth
 
 
@@ -156,9 +157,12 @@ class TestViews(TestCase):
     def test_room_view_GET_authenticated(self):
         self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
         response = self.client.get(reverse('room-page', args=['1']))
+        # Views are written in batches
+        view_recorder.flush()
         room = Room.objects.get(id=1)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(room.viewers.count(), 1)
+        self.assertEqual(room.viewer_count, 1)
         self.client.logout()
 
     def test_room_view_POST_closed(self):
@@ -355,8 +359,8 @@ class TestViews(TestCase):
 
     def test_message_rating_view_GET_not_logged_in(self):
         response = self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'p'))
-        self.assertEqual(Message.objects.get(id=1).pluses.all().count(), 0)
-        self.assertEqual(Message.objects.get(id=1).minuses.all().count(), 0)
+        self.assertEqual(Message.objects.get(id=1).plus_count, 0)
+        self.assertEqual(Message.objects.get(id=1).minus_count, 0)
         self.assertEqual(response.status_code, 302)
 
     def test_message_rating_view_GET_incorrect(self):
@@ -367,23 +371,23 @@ class TestViews(TestCase):
     def test_message_rating_view_get(self):
         self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
         response = self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'p'))
-        self.assertEqual(Message.objects.get(id=1).pluses.all().count(), 1)
-        self.assertEqual(Message.objects.get(id=1).minuses.all().count(), 0)
+        self.assertEqual(Message.objects.get(id=1).plus_count, 1)
+        self.assertEqual(Message.objects.get(id=1).minus_count, 0)
         self.assertEqual(response.status_code, 302)
 
         response = self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'p'))
-        self.assertEqual(Message.objects.get(id=1).pluses.all().count(), 0)
-        self.assertEqual(Message.objects.get(id=1).minuses.all().count(), 0)
+        self.assertEqual(Message.objects.get(id=1).plus_count, 0)
+        self.assertEqual(Message.objects.get(id=1).minus_count, 0)
         self.assertEqual(response.status_code, 302)
 
         response = self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'm'))
-        self.assertEqual(Message.objects.get(id=1).pluses.all().count(), 0)
-        self.assertEqual(Message.objects.get(id=1).minuses.all().count(), 1)
+        self.assertEqual(Message.objects.get(id=1).plus_count, 0)
+        self.assertEqual(Message.objects.get(id=1).minus_count, 1)
         self.assertEqual(response.status_code, 302)
 
         response = self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'p'))
-        self.assertEqual(Message.objects.get(id=1).pluses.all().count(), 1)
-        self.assertEqual(Message.objects.get(id=1).minuses.all().count(), 0)
+        self.assertEqual(Message.objects.get(id=1).plus_count, 1)
+        self.assertEqual(Message.objects.get(id=1).minus_count, 0)
         self.assertEqual(response.status_code, 302)
         self.client.get('%s?action=%s' % (reverse('message-rating-page', args=['1']), 'p'))
         self.client.logout()
@@ -0,0 +1,88 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+from ..models import User, Topic, Room, Message, Vote
+
+
+class TestVotes(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(
+            id=1,
+            email='TestEmail@gmail.com',
+            username='TestUser',
+        )
+        user.set_password('1234Test5678')
+        user.save()
+        User.objects.create(
+            id=2,
+            email='TestEmail2@gmail.com',
+            username='TestUser2',
+        )
+
+        Topic.objects.create(
+            id=1,
+            name='Test Topic',
+        )
+        Room.objects.create(
+            id=1,
+            name='Test Room',
+            host=User.objects.get(id=1),
+            topic=Topic.objects.get(id=1),
+        )
+        Message.objects.create(
+            id=1,
+            content='test',
+            user=User.objects.get(id=1),
+            room=Room.objects.get(id=1),
+        )
+
+        self.client = Client()
+        self.client.login(email='TestEmail@gmail.com', password='1234Test5678')
+
+    def rating(self):
+        message = Message.objects.get(id=1)
+        return message.plus_count, message.minus_count, message.score
+
+    def test_toggle(self):
+        user = User.objects.get(id=1)
+        self.assertEqual(Vote.toggle(1, user, Vote.PLUS), Vote.PLUS)
+        self.assertEqual(self.rating(), (1, 0, 1))
+        self.assertEqual(Vote.toggle(1, user, Vote.MINUS), Vote.MINUS)
+        self.assertEqual(self.rating(), (0, 1, -1))
+        self.assertEqual(Vote.toggle(1, User.objects.get(id=2), Vote.MINUS), Vote.MINUS)
+        self.assertEqual(self.rating(), (0, 2, -2))
+        self.assertEqual(Vote.toggle(1, user, Vote.MINUS), 0)
+        self.assertEqual(self.rating(), (0, 1, -1))
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_toggle_query_count(self):
+        user = User.objects.get(id=1)
+        Vote.toggle(1, user, Vote.PLUS)
+        # Savepoint, delete attempt, update of the existing vote, update of the counters, release
+        with self.assertNumQueries(5):
+            Vote.toggle(1, user, Vote.MINUS)
+
+    def test_rating_view_json(self):
+        response = self.client.get(reverse('message-rating-page', args=['1']), {'action': 'p', 'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'id': 1, 'vote': 1, 'plus_count': 1, 'minus_count': 0, 'score': 1})
+
+        response = self.client.get(reverse('message-rating-page', args=['1']), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['vote'], 1)
+
+    def test_migrate_votes_command(self):
+        with connection.cursor() as cursor:
+            for name in ('pluses', 'minuses'):
+                cursor.execute('CREATE TABLE base_message_%s '
+                               '(id integer PRIMARY KEY, message_id integer, user_id integer)' % name)
+            cursor.execute('INSERT INTO base_message_pluses (message_id, user_id) VALUES (1, 1), (1, 2)')
+            cursor.execute('INSERT INTO base_message_minuses (message_id, user_id) VALUES (1, 1)')
+
+        call_command('migrate_votes', '--drop-old-tables', stdout=StringIO())
+
+        self.assertEqual(Vote.objects.filter(value=Vote.PLUS).count(), 2)
+        self.assertEqual(self.rating(), (2, 0, 2))
+        self.assertNotIn('base_message_pluses', connection.introspection.table_names())
@@ -0,0 +1,105 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef
+from .models import Room, User, count_subquery
+
+logger = logging.getLogger(__name__)
+
+
+class ViewRecorder:
+    """
+    Collects (room, user) views in memory and writes them in batches, outside of the request.
+    Viewer lists and counters are eventually consistent: a view is written at most
+    VIEW_TRACKING_FLUSH_INTERVAL seconds after it was recorded or once VIEW_TRACKING_MAX_PENDING
+    distinct views are waiting. Flushes run after responses and, with VIEW_TRACKING_FLUSH_THREAD,
+    from a timer thread when no request comes, and at exit.
+    """
+
+    def __init__(self):
+        self._pending = set()
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_used = False
+
+    def record(self, room_id, user_id):
+        # Never touches the database, safe to call from async code
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.add((room_id, user_id))
+            self._schedule()
+
+    def _schedule(self):
+        # Called with the lock held. Fires at most FLUSH_INTERVAL after the oldest pending view,
+        # a flush after a response meanwhile only makes it find less to write
+        if self._timer is None and settings.VIEW_TRACKING_FLUSH_THREAD:
+            self._timer = threading.Timer(settings.VIEW_TRACKING_FLUSH_INTERVAL, self.flush_in_thread)
+            self._timer.daemon = True
+            self._timer.start()
+            self._timer_used = True
+
+    def is_due(self):
+        return bool(self._pending) and (
+            len(self._pending) >= settings.VIEW_TRACKING_MAX_PENDING
+            or time.monotonic() - self._oldest >= settings.VIEW_TRACKING_FLUSH_INTERVAL)
+
+    def flush_if_due(self):
+        if self.is_due():
+            self.flush()
+
+    def flush(self):
+        """Writes the pending views, returns their number. Failed views are kept for the next flush."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0
+        try:
+            self._write(pending)
+        except Exception:
+            # Runs after responses and in the timer thread, where nobody could handle the error
+            logger.exception('Writing %s room views failed, retrying with the next flush', len(pending))
+            with self._lock:
+                if not self._pending:
+                    self._oldest = time.monotonic()
+                self._pending |= pending
+                self._schedule()
+            return 0
+        return len(pending)
+
+    @staticmethod
+    def _write(pending):
+        through = Room.viewers.through
+        with transaction.atomic():
+            # Rooms and users deleted since the view was recorded would fail the whole batch
+            rooms = set(Room.objects.filter(id__in={room_id for room_id, _ in pending}).values_list('id', flat=True))
+            users = set(User.objects.filter(id__in={user_id for _, user_id in pending}).values_list('id', flat=True))
+            through.objects.bulk_create([through(room_id=room_id, user_id=user_id) for room_id, user_id in pending
+                                         if room_id in rooms and user_id in users], ignore_conflicts=True)
+            # Rows that already existed were ignored, so the counters are recalculated instead of incremented
+            Room.objects.filter(id__in=rooms).update(
+                viewer_count=count_subquery(through.objects.filter(room=OuterRef('pk')), 'room'))
+
+    def flush_in_thread(self):
+        # Outside of requests nobody closes the connection of the thread
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def flush_at_exit(self):
+        # Only in processes that flush from the timer thread, others leave pending views to requests
+        if self._timer_used:
+            self.flush_in_thread()
+
+
+view_recorder = ViewRecorder()
+atexit.register(view_recorder.flush_at_exit)
+
@@ -11,10 +11,20 @@ urlpatterns = [
 
     path('topic/<int:key>', views.topic_view, name='topic-page'),
     path('topic/<int:key>/create_room', views.room_create_view, name='room-create-page'),
+    path('topic/<int:key>/export', views.topic_export_view, name='topic-export-page'),
 
     path('room/<int:key>', views.room_view, name='room-page'),
     path('room/<int:key>/delete', views.room_delete_view, name='room-delete-page'),
     path('room/<int:key>/change_status', views.room_change_status_view, name='room-change-status-page'),
+    path('room/<int:key>/export', views.room_export_view, name='room-export-page'),
+    path('message/<int:key>/replies', views.message_replies_view, name='message-replies-page'),
     path('message/<int:key>/rating', views.message_rating_view, name='message-rating-page'),
+    path('message/<int:key>/edit', views.message_edit_view, name='message-edit-page'),
+    path('message/<int:key>/delete', views.message_delete_view, name='message-delete-page'),
+    path('message/<int:key>/history', views.message_history_view, name='message-history-page'),
+
+    path('notifications', views.notifications_view, name='notifications-page'),
+
+    path('search', views.search_view, name='search-page'),
 
 ]
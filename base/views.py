@@ -1,15 +1,26 @@
+import json
 import math
 
+from django.conf import settings
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseNotFound
-from .models import Topic, Room, Message, User
+from django.db import transaction
+from django.http import HttpResponseForbidden, HttpResponseNotFound, JsonResponse, StreamingHttpResponse
+from .models import Topic, Room, Message, MessageRevision, User, Vote, Notification
 from .forms import RoomForm, UserCreationFormCustom
-from datetime import datetime
+from .pagination import keyset_page
+from .ratelimit import rate_limit
+from .signals import participant_added
+from django.utils import timezone
+from . import activity, conditional, export, realtime, search
+from .tracking import view_recorder
 
 
+@rate_limit('login', methods=['POST'])
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('home-page')
@@ -50,32 +61,88 @@ def logout_view(request):
 
 
 def home_view(request):
-    topics = Topic.objects.all()
+    topics = Topic.objects.filter(Topic.visible_filter(request.user))
     context = {'topics': topics, 'popular_rooms': Room.get_popular()}
     return render(request, 'base/home.html', context)
 
 
 def topic_view(request, key):
     try:
-        topic_name = Topic.objects.get(id=key).name
+        topic = Topic.objects.get(id=key)
     except:
         return HttpResponseNotFound()
-    description = Topic.objects.get(id=key).description
-    rooms = Room.objects.filter(topic=key)
+    if not Topic.is_visible(topic.id, topic.is_restricted, request.user):
+        return HttpResponseForbidden()
+    validators = conditional.topic_validators(request, topic)
+    response = conditional.not_modified(request, *validators)
+    if response is not None:
+        return response
+    rooms = Room.objects.filter(topic=key).select_related('host')
     context = {'rooms': rooms,
-               'topic_name': topic_name,
-               'description': description,
+               'topic_name': topic.name,
+               'description': topic.description,
                'topic_key': key,
                'popular_rooms': Room.get_popular()}
-    return render(request, 'base/topic_rooms.html', context)
+    return conditional.set_validators(render(request, 'base/topic_rooms.html', context), *validators)
 
 
+@rate_limit('post', methods=['POST'])
 def room_view(request, key):
     try:
-        room = Room.objects.get(id=key)
+        room = Room.objects.select_related('topic', 'host').get(id=key)
     except:
         return HttpResponseNotFound()
+    if room.topic and not Topic.is_visible(room.topic_id, room.topic.is_restricted, request.user):
+        return HttpResponseForbidden()
+
+    if request.user.is_authenticated:
+        view_recorder.record(room.id, request.user.id)
+    if request.method == 'GET':
+        validators = conditional.room_validators(request, room)
+        response = conditional.not_modified(request, *validators)
+        if response is not None:
+            return response
 
+    pagination = room_pagination(request, room)
+
+    if request.method == 'POST' and not room.is_closed and request.user.is_authenticated:
+        content = request.POST.get('content')
+        if not str.isspace(content):
+
+            # Getting id of message to answer to, if exists
+            answer_to_id = request.POST.get('answer_to') if request.POST.get('answer_to') else None
+            if answer_to_id and str.isdigit(answer_to_id):
+                answer_to_id = int(answer_to_id)
+            else:
+                answer_to_id = None
+
+            with transaction.atomic():
+                # Only thread roots of this room can be answered, anything else starts a new thread
+                if answer_to_id and not Message.objects.filter(id=answer_to_id, room=room, answer_to=None).exists():
+                    answer_to_id = None
+                # Counters and the search index are updated by tasks (base.signals)
+                Message.objects.create(
+                    user=request.user,
+                    room=room,
+                    content=content,
+                    answer_to_id=answer_to_id,
+                )
+                participant_added.enqueue(room.id, request.user.id)
+                room.updated = timezone.now()
+                # Counters are maintained with F-expressions, saving them from the loaded instance would undo that
+                room.save(update_fields=['updated'])
+
+    context = {'room': room,
+               'popular_rooms': Room.get_popular(),
+               **pagination}
+    response = render(request, 'base/room.html', context)
+    if request.method == 'GET':
+        conditional.set_validators(response, *validators)
+    return response
+
+
+def room_pagination(request, room):
+    # Page of root messages of the room, shared with the async room view
     # Getting number of page
     page = request.GET.get('page') if request.GET.get('page') else '1'
     if str.isdigit(page):
@@ -85,91 +152,152 @@ def room_view(request, key):
 
     # Calculations for pagination
     messages_on_page = 15
-    total_messages = Message.objects.filter(room=key, answer_to=None).count()
+    total_messages = room.get_thread_count()
     total_pages = math.ceil(total_messages/messages_on_page)
     if page > total_pages or page <= 0: page = 1
-    if page == total_pages:
+    root_messages = Message.objects.filter(room=room, answer_to=None).for_rendering()
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        # Keyset pagination (?cursor= for the first page), the cost of a page does not depend on how deep it is
+        messages_to_render = keyset_page(root_messages, cursor, messages_on_page)
+    elif page == total_pages:
         # if last page
-        messages_to_render = Message.objects.filter(room=key, answer_to=None)[(page - 1) * messages_on_page:]
+        messages_to_render = root_messages[(page - 1) * messages_on_page:]
     else:
-        messages_to_render = Message.objects.filter(room=key, answer_to=None)[(page - 1) * messages_on_page: page * messages_on_page]
+        messages_to_render = root_messages[(page - 1) * messages_on_page: page * messages_on_page]
 
-    if request.user.is_authenticated:
-        room.viewers.add(request.user)
-    if request.method == 'POST' and not room.is_closed and request.user.is_authenticated:
-        content = request.POST.get('content')
-        if not str.isspace(content):
+    return {'messages_to_render': messages_to_render,
+            'total_pages': total_pages,
+            'current_page': page,
+            'cursor': cursor}
 
-            # Getting id of message to answer to, if exists
-            answer_to_id = request.POST.get('answer_to') if request.POST.get('answer_to') else None
-            if answer_to_id and str.isdigit(answer_to_id):
-                answer_to_id = int(answer_to_id)
-            else:
-                answer_to_id = None
 
-            message = Message.objects.create(
-                user=request.user,
-                room=room,
-                content=content,
-            )
-            if answer_to_id and Message.objects.get(id=answer_to_id).answer_to is None:
-                message.answer_to = Message.objects.get(id=answer_to_id)
-                message.save()
+def message_replies_view(request, key):
+    # Answers of a thread, newest first, as an HTML fragment for the room page or as JSON (?format=json)
+    message = Message.objects.filter(id=key, answer_to=None).values(
+        'id', 'reply_count', 'room__topic_id', 'room__topic__is_restricted').first()
+    if message is None:
+        return HttpResponseNotFound()
+    if not Topic.is_visible(message['room__topic_id'], message['room__topic__is_restricted'], request.user):
+        return HttpResponseForbidden()
+    replies = keyset_page(Message.objects.filter(answer_to=message['id']).for_rendering(),
+                          request.GET.get('cursor'), settings.MESSAGE_REPLIES_PER_PAGE)
+    if request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse({
+            'id': message['id'],
+            'reply_count': message['reply_count'],
+            'replies': [{'id': reply.id, 'user': reply.user_id, 'username': reply.user.username,
+                         'content': reply.content, 'created': reply.created, 'is_changed': reply.is_changed,
+                         'plus_count': reply.plus_count, 'minus_count': reply.minus_count, 'score': reply.score}
+                        for reply in replies],
+            'next_cursor': replies.next_cursor,
+        })
+    context = {'message_id': message['id'], 'replies': replies}
+    return render(request, 'base/components/message_replies.html', context)
+
+
+def authored_message(request, key):
+    # Returns (message, None) if the logged in user wrote the message and may still see it, (None, response) otherwise
+    message = Message.objects.select_related('room__topic').filter(id=key).first()
+    if message is None:
+        return None, HttpResponseNotFound()
+    topic = message.room.topic
+    if message.user_id != request.user.id or message.room.is_closed or (
+            topic and not Topic.is_visible(topic.id, topic.is_restricted, request.user)):
+        return None, HttpResponseForbidden()
+    return message, None
 
-            room.participants.add(request.user)
-            room.updated = datetime.now
-            room.save()
 
-    context = {'room': room,
-               'popular_rooms': Room.get_popular(),
-               'messages_to_render': messages_to_render,
-               'total_pages': total_pages,
-               'current_page': page}
-    return render(request, 'base/room.html', context)
+@login_required(login_url='login-page')
+@rate_limit('post', methods=['POST'])
+def message_edit_view(request, key):
+    message, response = authored_message(request, key)
+    if response is not None:
+        return response
+    if request.method == 'POST':
+        content = request.POST.get('content', '')
+        if content and not str.isspace(content):
+            Message.edit(message.id, content)
+        return redirect(reverse('room-page', args=[message.room_id]) + '#message_%s' % message.id)
+    return render(request, 'base/edit_message.html', {'message': message})
+
+
+@login_required(login_url='login-page')
+def message_delete_view(request, key):
+    message, response = authored_message(request, key)
+    if response is not None:
+        return response
+    if request.method == 'POST':
+        with transaction.atomic():
+            # Answers go with their thread, counters are updated by tasks (base.signals)
+            message.delete()
+            Room.objects.filter(id=message.room_id).update(updated=timezone.now())
+    return redirect('room-page', key=message.room_id)
+
+
+def message_history_view(request, key):
+    # Earlier versions of a message, newest first, as an HTML fragment or as JSON Lines (?format=jsonl)
+    message = Message.objects.filter(id=key).values('id', 'room__topic_id', 'room__topic__is_restricted').first()
+    if message is None:
+        return HttpResponseNotFound()
+    if not Topic.is_visible(message['room__topic_id'], message['room__topic__is_restricted'], request.user):
+        return HttpResponseForbidden()
+    # Revisions are read in chunks while the response is sent
+    revisions = MessageRevision.objects.filter(message=key).order_by('-id').iterator(chunk_size=100)
+    if request.GET.get('format') == 'jsonl':
+        lines = (json.dumps({'created': revision.created.isoformat(), 'content': revision.text}) + '\n'
+                 for revision in revisions)
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+    lines = (render_to_string('base/components/message_revision.html', {'revision': revision})
+             for revision in revisions)
+    return StreamingHttpResponse(lines)
 
 
 @login_required(login_url='login-page')
+@rate_limit('vote')
 def message_rating_view(request, key):
-    try:
-        message = Message.objects.get(id=key)
-    except:
+    message = Message.objects.filter(id=key).values(
+        'id', 'room_id', 'room__topic_id', 'room__topic__is_restricted').first()
+    if message is None:
         return HttpResponseNotFound()
-    action = request.GET.get('action') if request.GET.get('action') else 'e'
-    if action == 'p':
-        if message.pluses.filter(id=request.user.id).exists():
-            message.pluses.remove(request.user)
-        elif message.minuses.filter(id=request.user.id).exists():
-            message.minuses.remove(request.user)
-            message.pluses.add(request.user)
-        else:
-            message.pluses.add(request.user)
-    if action == 'm':
-        if message.minuses.filter(id=request.user.id).exists():
-            message.minuses.remove(request.user)
-        elif message.pluses.filter(id=request.user.id).exists():
-            message.pluses.remove(request.user)
-            message.minuses.add(request.user)
-        else:
-            message.minuses.add(request.user)
-    return redirect('room-page', key=message.room.id)
+    if not Topic.is_visible(message['room__topic_id'], message['room__topic__is_restricted'], request.user):
+        return HttpResponseForbidden()
+    value = {'p': Vote.PLUS, 'm': Vote.MINUS}.get(request.GET.get('action'))
+    if value is not None:
+        vote = Vote.toggle(message['id'], request.user, value)
+        # Ratings are part of the room page, its validators (base.conditional) change with `updated`
+        Room.objects.filter(id=message['room_id']).update(updated=timezone.now())
+        transaction.on_commit(lambda: realtime.publish_rating(message['id']))
+    if request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', ''):
+        if value is None:
+            votes = Vote.objects.filter(message_id=message['id'], user=request.user)
+            vote = votes.values_list('value', flat=True).first() or 0
+        rating = Message.objects.filter(id=message['id']).values('plus_count', 'minus_count', 'score').get()
+        return JsonResponse({'id': message['id'], 'vote': vote, **rating})
+    return redirect('room-page', key=message['room_id'])
 
 
 @login_required(login_url='login-page')
+@rate_limit('room', methods=['POST'])
 def room_create_view(request, key):
     form = RoomForm()
     try:
-        topic_name = Topic.objects.get(id=key).name
+        topic = Topic.objects.get(id=key)
     except:
         return HttpResponseNotFound()
+    if not Topic.is_visible(topic.id, topic.is_restricted, request.user):
+        return HttpResponseForbidden()
+    topic_name = topic.name
     if request.method == 'POST':
         form = RoomForm(request.POST)
         if form.is_valid():
-            room = Room.objects.create(
-                name=form.cleaned_data['name'],
-                description=form.cleaned_data['description'],
-                host=request.user,
-                topic=Topic.objects.get(id=key)
-            )
+            with transaction.atomic():
+                room = Room.objects.create(
+                    name=form.cleaned_data['name'],
+                    description=form.cleaned_data['description'],
+                    host=request.user,
+                    topic=topic
+                )
             return redirect('room-page', key=room.id)
     return render(request, 'base/create_room.html', {'form': form, 'topic_name': topic_name})
 
@@ -196,7 +324,7 @@ def room_change_status_view(request, key):
             room.is_closed = False
         else:
             room.is_closed = True
-        room.save()
+        room.save(update_fields=['is_closed', 'updated'])
     return redirect('room-page', key=key)
 
 
@@ -224,5 +352,63 @@ def profile_view(request, key):
 
     context = {'profile_user': profile_user,
                'is_modifications_allowed': is_modifications_allowed,
+               'activity': activity.feed_page(profile_user.id, request.user, request.GET.get('cursor'),
+                                              settings.ACTIVITY_PER_PAGE),
                'popular_rooms': Room.get_popular()}
     return render(request, 'base/profile.html', context)
+
+
+@login_required(login_url='login-page')
+def notifications_view(request):
+    if request.method == 'POST':
+        Notification.mark_all_read(request.user)
+        return redirect('notifications-page')
+    notifications = Notification.objects.filter(user=request.user).select_related('actor', 'thread')
+    context = {'notifications': notifications[:settings.NOTIFICATIONS_PER_PAGE],
+               'popular_rooms': Room.get_popular()}
+    return render(request, 'base/notifications.html', context)
+
+
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    page = request.GET.get('page') if request.GET.get('page') else '1'
+    page = int(page) if page.isdecimal() and int(page) > 0 else 1
+    results_on_page = 20
+    results, total_results = search.search(query, page, results_on_page, request.user)
+    context = {'query': query,
+               'results': results,
+               'total_results': total_results,
+               'total_pages': math.ceil(total_results/results_on_page),
+               'current_page': page,
+               'popular_rooms': Room.get_popular()}
+    return render(request, 'base/search.html', context)
+
+
+def export_response(request, messages, name):
+    format = request.GET.get('format') if request.GET.get('format') in export.FORMATS else 'jsonl'
+    after = request.GET.get('after') if request.GET.get('after') else ''
+    after = int(after) if after.isdecimal() else None
+    response = StreamingHttpResponse(export.export_messages(messages, format, after),
+                                     content_type=export.FORMATS[format])
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (name, format)
+    return response
+
+
+@login_required(login_url='login-page')
+def room_export_view(request, key):
+    room = Room.objects.filter(id=key).values('topic_id', 'topic__is_restricted').first()
+    if room is None:
+        return HttpResponseNotFound()
+    if not Topic.is_visible(room['topic_id'], room['topic__is_restricted'], request.user):
+        return HttpResponseForbidden()
+    return export_response(request, export.room_messages(key), 'room-%s' % key)
+
+
+@login_required(login_url='login-page')
+def topic_export_view(request, key):
+    topic = Topic.objects.filter(id=key).values('id', 'is_restricted').first()
+    if topic is None:
+        return HttpResponseNotFound()
+    if not Topic.is_visible(topic['id'], topic['is_restricted'], request.user):
+        return HttpResponseForbidden()
+    return export_response(request, export.topic_messages(key), 'topic-%s' % key)
@@ -0,0 +1,120 @@
+"""
+Compares the read-heavy pages served by sync views through WSGI (a pool of worker threads)
+with the async views served through ASGI under the same number of concurrent clients.
+
+    python -m benchmarks.async_views --requests 400 --concurrency 16 --db-latency 2
+
+--db-latency adds the given number of milliseconds to every query, like a database
+on another host would, the in-process SQLite database has no network round-trip.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup, test_database, percentile
+
+PAGES = ['/', '/topic/1', '/room/1', '/profile/1']
+
+
+def add_latency(seconds):
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    from django.db import connections
+    for connection in connections.all():
+        if connection.connection is not None:
+            install(None, connection)
+
+
+def fill_database():
+    from base.models import User, Topic, Room, Message
+    users = [User.objects.create(id=i, email='bench%s@example.com' % i, username='bench%s' % i)
+             for i in range(1, 21)]
+    topics = [Topic.objects.create(id=i, name='Topic %s' % i) for i in range(1, 11)]
+    rooms = [Room.objects.create(name='Room %s' % i, host=users[i % 20], topic=topics[i % 10])
+             for i in range(1, 51)]
+    Room.objects.filter(id=rooms[0].id).update(id=1)
+    room = Room.objects.get(id=1)
+    for i in range(100):
+        message = Message.objects.create(content='Message %s' % i, user=users[i % 20], room=room)
+        for j in range(3):
+            Message.objects.create(content='Answer %s' % j, user=users[j], room=room, answer_to=message)
+        room.participants.add(users[i % 20])
+
+
+def report(name, latencies, elapsed):
+    print('%-5s %7.1f req/s   median %7.2f ms   p99 %7.2f ms' % (
+        name, len(latencies) / elapsed, statistics.median(latencies) * 1000, percentile(latencies, 99) * 1000))
+
+
+def run_wsgi(requests, concurrency):
+    from django.test import Client
+
+    def worker(count):
+        client = Client()
+        latencies = []
+        for i in range(count):
+            start = time.perf_counter()
+            assert client.get(PAGES[i % len(PAGES)]).status_code == 200
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(worker, [requests // concurrency] * concurrency))
+    report('WSGI', [latency for result in results for latency in result], time.perf_counter() - start)
+
+
+def run_asgi(requests, concurrency, threads):
+    from django.test import AsyncClient, override_settings
+
+    async def worker(count):
+        client = AsyncClient()
+        latencies = []
+        for i in range(count):
+            start = time.perf_counter()
+            assert (await client.get(PAGES[i % len(PAGES)])).status_code == 200
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(threads))
+        start = time.perf_counter()
+        results = await asyncio.gather(*[worker(requests // concurrency) for _ in range(concurrency)])
+        report('ASGI', [latency for result in results for latency in result], time.perf_counter() - start)
+
+    with override_settings(ROOT_URLCONF='forum.async_urls'):
+        asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=32, help='worker threads for queries of async views')
+    parser.add_argument('--db-latency', type=float, default=2, help='milliseconds added to every query')
+    args = parser.parse_args()
+
+    setup()
+    with test_database():
+        fill_database()
+        if args.db_latency:
+            add_latency(args.db_latency / 1000)
+        print('%s requests to %s, %s concurrent clients, %s ms per query' % (
+            args.requests, ', '.join(PAGES), args.concurrency, args.db_latency))
+        run_wsgi(args.requests, args.concurrency)
+        run_asgi(args.requests, args.concurrency, args.threads)
+
+
+if __name__ == '__main__':
+    main()
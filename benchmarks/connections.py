@@ -0,0 +1,112 @@
+"""
+Time spent opening (or taking from the pool) and health checking database connections per request,
+with a new connection for every request, persistent connections and, on PostgreSQL with
+FORUM_DB_POOL_SIZE set, the connection pool.
+
+    python -m benchmarks.connections --requests 500 --threads 4
+    FORUM_DB_ENGINE=postgresql FORUM_DB_POOL_SIZE=4 python -m benchmarks.connections --threads 16
+
+Numbers come from the Server-Timing header of base.performance. Requests are sent like a threaded
+WSGI server would, with close_old_connections() around each of them. `opened` is the number of
+connections made: persistent connections need one per thread and alias, a pool at most its size.
+"""
+import argparse
+import re
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup, test_database, percentile
+
+TIMING = re.compile(r'total;dur=([\d.]+), conn;dur=([\d.]+);desc="(\d+) connections"')
+
+
+def configure(options):
+    from django.db import connections
+    connections.close_all()
+    for alias in connections:
+        connections[alias].settings_dict.update(options)
+
+
+def run(path, requests, threads):
+    from django.db import close_old_connections, connections
+    from django.db.backends.signals import connection_created
+    from django.test import Client
+
+    lock = threading.Lock()
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        with lock:
+            opened.append(connection.alias)
+
+    def worker(number):
+        client, timings = Client(), []
+        for _ in range(requests // threads):
+            close_old_connections()
+            response = client.get(path)
+            close_old_connections()
+            total, connect, connected = TIMING.search(response['Server-Timing']).groups()
+            timings.append((float(total), float(connect), int(connected)))
+        connections.close_all()
+        return timings
+
+    connection_created.connect(count)
+    try:
+        with ThreadPoolExecutor(threads) as executor:
+            timings = [timing for part in executor.map(worker, range(threads)) for timing in part]
+    finally:
+        connection_created.disconnect(count)
+    return timings, len(opened)
+
+
+def report(label, timings, opened):
+    totals, connects, counts = zip(*timings)
+    print('%-28s total p50 %6.2f ms   connect mean %6.3f ms  p99 %6.3f ms   %.2f per request   opened %s' % (
+        label, statistics.median(totals), statistics.mean(connects), percentile(connects, 99),
+        statistics.mean(counts), opened))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    setup()
+    import tempfile
+    from io import StringIO
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+    from django.urls import reverse
+    from base.models import Room
+
+    settings.PERFORMANCE_SERVER_TIMING = True
+    with tempfile.TemporaryDirectory() as directory:
+        if connections['default'].vendor == 'sqlite':
+            # In-memory test databases ignore close(), every connection would be persistent
+            connections['default'].settings_dict['TEST']['NAME'] = '%s/db.sqlite3' % directory
+        with test_database():
+            call_command('generate_data', users=50, rooms=20, messages=2000, stdout=StringIO())
+            path = reverse('room-page', args=[Room.objects.order_by('-message_count').first().id])
+            pooled = 'pool' in connections['default'].settings_dict['OPTIONS']
+            pool = ', pool of %s' % settings.DATABASE_POOL_SIZE if pooled else ''
+            print('%s, %s requests from %s threads%s' % (
+                connections['default'].vendor, args.requests, args.threads, pool))
+            modes = [
+                ('new connection per request' if not pooled else 'pooled', {'CONN_MAX_AGE': 0,
+                                                                            'CONN_HEALTH_CHECKS': False}),
+                ('pooled, health checks' if pooled else 'persistent', {'CONN_MAX_AGE': 0 if pooled else 60,
+                                                                       'CONN_HEALTH_CHECKS': pooled}),
+            ]
+            if not pooled:
+                modes.append(('persistent, health checks', {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}))
+            for label, options in modes:
+                configure(options)
+                report(label, *run(path, args.requests, args.threads))
+            configure({'CONN_MAX_AGE': 0})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares keyset and OFFSET pagination of room messages on a large room.
+
+    python -m benchmarks.pagination --messages 1000000 --page 10000
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.utils import setup, test_database, explicit_timestamps, measure, summary
+
+
+def fill_room(messages, batch_size=10000):
+    from django.utils import timezone
+    from base.models import User, Topic, Room, Message
+
+    user = User.objects.create(email='bench@example.com', username='bench')
+    room = Room.objects.create(name='Benchmark', host=user, topic=Topic.objects.create(name='Benchmark'))
+    start = timezone.now() - timedelta(seconds=messages)
+    with explicit_timestamps(Message._meta.get_field('created')):
+        for offset in range(0, messages, batch_size):
+            Message.objects.bulk_create(
+                Message(content='Message %s' % i, user=user, room=room, created=start + timedelta(seconds=i))
+                for i in range(offset, min(offset + batch_size, messages))
+            )
+    return room
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--page', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connections, router
+    from django.test.utils import CaptureQueriesContext
+    from base.models import Message
+    from base.pagination import keyset_page, encode_cursor
+
+    per_page = 15
+    with test_database():
+        room = fill_room(args.messages)
+        threads = Message.objects.filter(room=room, answer_to=None).for_rendering()
+
+        # Cursor pointing right before the requested page, found once with OFFSET and not measured
+        previous = Message.objects.filter(room=room, answer_to=None).order_by('-created', '-id')[
+            (args.page - 1) * per_page - 1]
+        deep_cursor = encode_cursor('next', previous)
+
+        print('Room with %s messages, %s per page' % (args.messages, per_page))
+        print('keyset page 1:      ', summary(measure(lambda: list(keyset_page(threads, None, per_page)), args.repeat)))
+        print('keyset page %s:' % args.page,
+              summary(measure(lambda: list(keyset_page(threads, deep_cursor, per_page)), args.repeat)))
+        start = (args.page - 1) * per_page
+        print('offset page 1:      ', summary(measure(lambda: list(threads[:per_page]), args.repeat)))
+        print('offset page %s:' % args.page,
+              summary(measure(lambda: list(threads[start:start + per_page]), args.repeat)))
+
+        # Reads go to the reader alias with base.routers.ReadWriteRouter
+        connection = connections[router.db_for_read(Message)]
+        if connection.vendor == 'sqlite':
+            with CaptureQueriesContext(connection) as queries:
+                list(keyset_page(threads, deep_cursor, per_page))
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+                print('keyset plan:', '; '.join(row[-1] for row in cursor.fetchall()))
+
+
+if __name__ == '__main__':
+    main()
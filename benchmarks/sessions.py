@@ -0,0 +1,60 @@
+"""
+Per-request cost of loading the session and the logged in user, with each session engine,
+with the plain ModelBackend and with base.auth.CachedModelBackend.
+
+    python -m benchmarks.sessions --repeat 500
+
+Requests go to the login page of a logged in user, which only redirects, so nearly all of the
+measured time is spent in the session and authentication middleware.
+"""
+import argparse
+import statistics
+
+from benchmarks.utils import setup, test_database, measure, percentile
+
+ENGINES = ['db', 'cached_db', 'cache', 'signed_cookies']
+BACKENDS = ['django.contrib.auth.backends.ModelBackend', 'base.auth.CachedModelBackend']
+
+
+def run(engine, backend, repeat):
+    from contextlib import ExitStack
+    from django.db import connections
+    from django.test import Client, override_settings
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+    from base.models import User
+
+    with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.' + engine,
+                           AUTHENTICATION_BACKENDS=[backend]):
+        client = Client()
+        client.force_login(User.objects.get(email='bench@example.com'))
+        path = reverse('login-page')
+        # Warm-up fills the caches
+        client.get(path)
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+            client.get(path)
+        queries = sum(len(queries) for queries in captured)
+        samples = measure(lambda: client.get(path), repeat)
+    print('%-15s %-45s %7s %9.3f %9.3f' % (engine, backend, queries, statistics.median(samples) * 1000,
+                                           percentile(samples, 99) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+    from base.models import User
+
+    with test_database():
+        User.objects.create_user(username='bench', email='bench@example.com', password='password')
+        print('%-15s %-45s %7s %9s %9s' % ('session engine', 'authentication backend', 'queries', 'p50 ms', 'p99 ms'))
+        for engine in ENGINES:
+            for backend in BACKENDS:
+                run(engine, backend, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Concurrent readers and posters on a file SQLite database, with the stock sqlite3 backend
+(rollback journal, deferred transactions, one connection alias) and with the tuned setup
+of forum.settings (WAL, PRAGMAs, IMMEDIATE transactions, read-only reader alias).
+
+    python -m benchmarks.sqlite_concurrency --processes 8 --seconds 10 --write-share 0.2
+
+Every configuration runs in its own process on a fresh database file.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import percentile
+
+CONFIGS = ['stock', 'tuned']
+
+
+def configure(config, path):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'forum.settings')
+    from forum import settings
+    if config == 'stock':
+        settings.DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}}
+        settings.DATABASE_ROUTERS = []
+    else:
+        settings.DATABASES['default']['NAME'] = path
+        settings.DATABASES['reader']['NAME'] = 'file:%s?mode=ro' % path
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.RATE_LIMITS = {}
+    import django
+    django.setup()
+
+
+def run(config, processes, seconds, write_share):
+    from io import StringIO
+    from django.core.management import call_command
+    from django.db import connections
+    from base.models import User, Room
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    call_command('generate_data', users=processes, rooms=10, messages=2000, no_index=True, stdout=StringIO())
+    users = list(User.objects.order_by('id')[:processes])
+    rooms = list(Room.objects.values_list('id', flat=True))
+    connections.close_all()
+
+    deadline = time.perf_counter() + seconds
+    # Worker processes like those of a WSGI server, threads of one process would mostly wait for the GIL
+    with multiprocessing.get_context('fork').Pool(processes) as pool:
+        parts = pool.starmap(worker, [(number, users[number].id, rooms, deadline, write_share)
+                                      for number in range(processes)])
+    return {key: sum((part[key] for part in parts), [] if key in ('reads', 'writes') else 0) for key in parts[0]}
+
+
+def worker(number, user_id, rooms, deadline, write_share):
+    from random import Random
+    from django.db import OperationalError, connections
+    from django.test import Client
+    from base.models import User
+
+    results = {'reads': [], 'writes': [], 'locked': 0, 'errors': 0}
+    rng = Random(number)
+    client = Client()
+    client.force_login(User.objects.get(id=user_id))
+    while time.perf_counter() < deadline:
+        room = rng.choice(rooms)
+        write = rng.random() < write_share
+        start = time.perf_counter()
+        try:
+            if write:
+                status = client.post('/room/%s' % room, {'content': 'Benchmark message'}).status_code
+            else:
+                status = client.get('/room/%s' % room).status_code
+        except OperationalError as error:
+            results['locked' if 'locked' in str(error) else 'errors'] += 1
+            connections.close_all()
+            continue
+        if status == 200:
+            results['writes' if write else 'reads'].append(time.perf_counter() - start)
+        else:
+            results['errors'] += 1
+    connections.close_all()
+    return results
+
+
+def report(config, results, seconds):
+    def latency(samples):
+        if not samples:
+            return '-'
+        return 'p50 %6.1f ms  p99 %7.1f ms' % (percentile(samples, 50) * 1000, percentile(samples, 99) * 1000)
+    print('%-6s reads %6.1f/s (%s)   posts %6.1f/s (%s)   locked %s, other errors %s' % (
+        config, len(results['reads']) / seconds, latency(results['reads']),
+        len(results['writes']) / seconds, latency(results['writes']), results['locked'], results['errors']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-share', type=float, default=0.2, help='share of requests posting a message')
+    parser.add_argument('--config', choices=CONFIGS, help='run a single configuration in this process')
+    args = parser.parse_args()
+
+    if args.config:
+        with tempfile.TemporaryDirectory() as directory:
+            configure(args.config, os.path.join(directory, 'db.sqlite3'))
+            print(json.dumps(run(args.config, args.processes, args.seconds, args.write_share)))
+        return
+
+    print('%s processes for %s s, %d%% of requests post a message' % (
+        args.processes, args.seconds, args.write_share * 100))
+    for config in CONFIGS:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.sqlite_concurrency', '--config', config,
+                                 '--processes', str(args.processes), '--seconds', str(args.seconds),
+                                 '--write-share', str(args.write_share)],
+                                check=True, capture_output=True, text=True).stdout
+        report(config, json.loads(output.splitlines()[-1]), args.seconds)
+
+
+if __name__ == '__main__':
+    main()
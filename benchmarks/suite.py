@@ -0,0 +1,186 @@
+"""
+Drives every page of base.urls through the test client on generated data of several sizes
+and compares query counts, latency and memory with a stored baseline.
+
+    python -m benchmarks.suite --scales small,medium
+    python -m benchmarks.suite --scales small,medium --save-baseline
+
+Query counts must not grow over the baseline. Latency (median) and memory (peak allocated
+during one request) are allowed to grow by the given tolerances, latency baselines depend
+on the machine and should be saved on the one running the comparison.
+Exits with status 1 when a regression is found.
+"""
+import argparse
+import json
+from io import StringIO
+import resource
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.utils import setup, test_database, percentile
+
+SCALES = {
+    'small': {'users': 50, 'topics': 5, 'rooms': 20, 'messages': 1000},
+    'medium': {'users': 500, 'topics': 10, 'rooms': 200, 'messages': 20000},
+    'large': {'users': 2000, 'topics': 20, 'rooms': 1000, 'messages': 100000},
+}
+
+BASELINE = Path(__file__).with_name('baseline.json')
+
+
+def cases():
+    """Returns [(label, url name, path, log in)] for the generated data."""
+    from django.db.models import Count
+    from django.urls import reverse
+    from base.models import User, Topic, Room, Message
+
+    room = Room.objects.order_by('-message_count', 'id').first()
+    topic = Topic.objects.order_by('-room_count', 'id').first()
+    user = User.objects.annotate(messages=Count('message')).order_by('-messages', 'id').first()
+    message = Message.objects.filter(room=room, answer_to=None).order_by('-created', '-id').first()
+    thread = Message.objects.filter(room=room, answer_to=None).order_by('-reply_count', 'id').first()
+    return [
+        ('home-page', 'home-page', reverse('home-page'), False),
+        ('login-page', 'login-page', reverse('login-page'), False),
+        ('register-page', 'register-page', reverse('register-page'), False),
+        ('profile-page', 'profile-page', reverse('profile-page', args=[user.id]), False),
+        ('topic-page', 'topic-page', reverse('topic-page', args=[topic.id]), False),
+        ('room-create-page', 'room-create-page', reverse('room-create-page', args=[topic.id]), True),
+        ('room-page', 'room-page', reverse('room-page', args=[room.id]), True),
+        ('room-page (page 10)', 'room-page', reverse('room-page', args=[room.id]) + '?page=10', False),
+        ('room-page (cursor)', 'room-page', reverse('room-page', args=[room.id]) + '?cursor=', False),
+        # Every request toggles the vote, an even number of requests leaves it as it was
+        ('message-rating-page', 'message-rating-page',
+         reverse('message-rating-page', args=[message.id]) + '?action=p&format=json', True),
+        ('message-replies-page', 'message-replies-page', reverse('message-replies-page', args=[thread.id]), False),
+        ('search-page', 'search-page', reverse('search-page') + '?q=django', False),
+        ('room-export-page', 'room-export-page', reverse('room-export-page', args=[room.id]), True),
+        ('topic-export-page', 'topic-export-page',
+         reverse('topic-export-page', args=[topic.id]) + '?format=csv', True),
+    ]
+
+
+def fetch(client, path):
+    response = client.get(path)
+    assert response.status_code == 200, path
+    if response.streaming:
+        # Streaming responses run their queries while being read
+        b''.join(response.streaming_content)
+
+
+def run_case(client, path, repeat):
+    from contextlib import ExitStack
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    # Warm-up fills the caches, the numbers below are of the steady state
+    fetch(client, path)
+    with ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+        fetch(client, path)
+    # Captured queries are read from the connection's log, which the next request clears
+    query_count = sum(len(queries) for queries in captured)
+    tracemalloc.start()
+    fetch(client, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fetch(client, path)
+        samples.append(time.perf_counter() - start)
+    return {
+        'queries': query_count,
+        'p50_ms': round(statistics.median(samples) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+        'peak_kib': round(peak / 1024),
+    }
+
+
+def run_scale(name, repeat):
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.test import Client
+    from base import urls
+    from base.models import User
+
+    results = {}
+    with test_database():
+        start = time.perf_counter()
+        call_command('generate_data', stdout=StringIO(), **SCALES[name])
+        print('\n%s: %s generated in %.0f s' % (name, ', '.join('%s %s' % (count, model) for model, count in
+                                                               SCALES[name].items()), time.perf_counter() - start))
+        cache.clear()
+        anonymous, logged_in = Client(), Client()
+        logged_in.force_login(User.objects.order_by('id').first())
+        covered = set()
+        for label, url_name, path, login in cases():
+            results[label] = run_case(logged_in if login else anonymous, path, repeat)
+            covered.add(url_name)
+        # Logout, room deletion and closing change data in a way repeated requests would not undo
+        skipped = sorted({pattern.name for pattern in urls.urlpatterns} - covered)
+        print('skipped (not repeatable): %s' % ', '.join(skipped))
+    results['max_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+
+def compare(scale, results, baseline, latency_tolerance, memory_tolerance):
+    """Prints the results next to the baseline, returns the list of regressions."""
+    regressions = []
+    print('%-22s %7s %9s %9s %9s %9s' % ('', 'queries', 'p50 ms', 'p95 ms', 'p99 ms', 'peak KiB'))
+    for label, result in results.items():
+        if label == 'max_rss_kib':
+            continue
+        old = baseline.get(label)
+        flags = []
+        if old:
+            if result['queries'] > old['queries']:
+                flags.append('queries %s -> %s' % (old['queries'], result['queries']))
+            # Sub-millisecond differences are noise
+            if result['p50_ms'] > old['p50_ms'] * (1 + latency_tolerance) and result['p50_ms'] - old['p50_ms'] > 1:
+                flags.append('p50 %.2f -> %.2f ms' % (old['p50_ms'], result['p50_ms']))
+            if (result['peak_kib'] > old['peak_kib'] * (1 + memory_tolerance)
+                    and result['peak_kib'] - old['peak_kib'] > 64):
+                flags.append('memory %s -> %s KiB' % (old['peak_kib'], result['peak_kib']))
+        print('%-22s %7s %9.2f %9.2f %9.2f %9s  %s' % (
+            label, result['queries'], result['p50_ms'], result['p95_ms'], result['p99_ms'], result['peak_kib'],
+            'REGRESSION: ' + ', '.join(flags) if flags else '' if old else '(no baseline)'))
+        regressions += ['%s %s: %s' % (scale, label, flag) for flag in flags]
+    print('max RSS %s MiB' % (results['max_rss_kib'] // 1024))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', default='small,medium', help='comma separated, of %s' % ', '.join(SCALES))
+    parser.add_argument('--repeat', type=int, default=30, help='timed requests per page')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5)
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    setup()
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    regressions = []
+    for scale in args.scales.split(','):
+        results = run_scale(scale, args.repeat)
+        regressions += compare(scale, results, baseline.get(scale, {}), args.latency_tolerance, args.memory_tolerance)
+        baseline_results = {label: result for label, result in results.items() if label != 'max_rss_kib'}
+        if args.save_baseline:
+            baseline[scale] = baseline_results
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print('\nBaseline saved to %s' % args.baseline)
+    elif regressions:
+        print('\n%s regressions:\n  %s' % (len(regressions), '\n  '.join(regressions)))
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Latency of posting a message with its side effects run in the request (TASKS_EAGER) and queued
+for the worker, and the time the worker then needs per job.
+
+    python -m benchmarks.tasks --repeat 300
+
+Posts go to the room page with the most messages of generated data, the timings include
+rendering the page the view answers with.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.utils import setup, test_database, measure, percentile
+
+
+def run(client, path, eager, repeat):
+    from django.test import override_settings
+    from base import tasks
+    from base.models import Job
+
+    with override_settings(TASKS_EAGER=eager):
+        samples = measure(lambda: client.post(path, {'content': 'benchmark message'}), repeat)
+    jobs = Job.objects.count()
+    start = time.perf_counter()
+    while tasks.work(100):
+        pass
+    worker_time = time.perf_counter() - start
+    print('%-8s post p50 %6.2f ms  p99 %6.2f ms   %4d jobs, worker %6.3f ms per job' % (
+        'eager' if eager else 'queued', statistics.median(samples) * 1000, percentile(samples, 99) * 1000,
+        jobs, worker_time * 1000 / jobs if jobs else 0))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+
+    setup()
+    from io import StringIO
+    from django.core.management import call_command
+    from django.test import Client
+    from django.urls import reverse
+    from base.models import Room, User
+
+    with test_database():
+        call_command('generate_data', users=50, rooms=20, messages=2000, stdout=StringIO())
+        room = Room.objects.order_by('-message_count').first()
+        client = Client()
+        client.force_login(User.objects.first())
+        path = reverse('room-page', args=[room.id])
+        for eager in (True, False):
+            run(client, path, eager, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+
+# Same percentiles as the metrics of running servers
+from base.performance import percentile
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'forum.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    # Benchmarks never touch the real database, they run on a throwaway test one.
+    # The rest of the test environment is left out on purpose: its template instrumentation
+    # copies every rendered context and would dominate the measurements.
+    from django.conf import settings
+    from django.test.utils import setup_databases, teardown_databases
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    # Benchmarks repeat the same posts and votes far more often than users are allowed to
+    settings.RATE_LIMITS = {}
+    # Views left pending would be written by the exit handler after the test database is gone
+    settings.VIEW_TRACKING_FLUSH_THREAD = False
+    # Also points test mirrors (the read-only `reader` connection) at the test database
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def explicit_timestamps(*fields):
+    from base.generator import explicit_timestamps
+    return explicit_timestamps(*fields)
+
+
+def measure(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summary(samples):
+    return 'median %.2f ms, p99 %.2f ms' % (statistics.median(samples) * 1000, percentile(samples, 99) * 1000)
@@ -0,0 +1,99 @@
+"""
+Load test of room WebSocket broadcasting: opens many idle connections to one room through
+forum.asgi and measures how long it takes for published events to reach all of them.
+
+    python -m benchmarks.websocket_broadcast --connections 5000 --events 20 --interval 0.5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+
+from benchmarks.utils import setup, test_database, percentile
+
+
+async def run(application, room_id, connections, events, interval):
+    from base import realtime
+
+    latencies = []
+    completion = []
+    received = {}
+    done = asyncio.Event()
+
+    parsed = {}
+
+    def sender(index):
+        async def send(event):
+            if event['type'] == 'websocket.send':
+                if event['text'] not in parsed:
+                    parsed[event['text']] = json.loads(event['text'])
+                data = parsed[event['text']]
+                latency = time.perf_counter() - data['sent']
+                latencies.append(latency)
+                received[data['number']] = received.get(data['number'], 0) + 1
+                if received[data['number']] == connections:
+                    completion.append(latency)
+                    if len(completion) == events:
+                        done.set()
+        return send
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    disconnects = []
+    tasks = []
+    for index in range(connections):
+        incoming = asyncio.Queue()
+        incoming.put_nowait({'type': 'websocket.connect'})
+        disconnects.append(incoming)
+        scope = {'type': 'websocket', 'path': '/ws/room/%s' % room_id}
+        tasks.append(asyncio.ensure_future(application(scope, incoming.get, sender(index))))
+    group = realtime.room_group(room_id)
+    while realtime.get_broadcaster().subscribers_count(group) < connections:
+        await asyncio.sleep(0.05)
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+
+    def publisher():
+        # Publishing happens from a worker thread, like a sync view would do it
+        for number in range(events):
+            realtime.publish(room_id, {'type': 'status', 'number': number, 'sent': time.perf_counter()})
+            time.sleep(interval)
+
+    threading.Thread(target=publisher).start()
+    await asyncio.wait_for(done.wait(), 120)
+
+    for incoming in disconnects:
+        incoming.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+    await asyncio.gather(*tasks)
+    return latencies, completion, per_connection
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between published events')
+    args = parser.parse_args()
+
+    setup()
+    from forum.asgi import application
+    from base.models import User, Topic, Room
+
+    with test_database():
+        user = User.objects.create(email='bench@example.com', username='bench')
+        room = Room.objects.create(name='Benchmark', host=user, topic=Topic.objects.create(name='Benchmark'))
+        latencies, completion, per_connection = asyncio.run(
+            run(application, room.id, args.connections, args.events, args.interval))
+
+    print('%s idle connections, %.1f KiB each' % (args.connections, per_connection / 1024))
+    print('delivery latency: median %.2f ms, p99 %.2f ms' % (
+        statistics.median(latencies) * 1000, percentile(latencies, 99) * 1000))
+    print('broadcast to all connections: median %.2f ms, p99 %.2f ms' % (
+        statistics.median(completion) * 1000, percentile(completion, 99) * 1000))
+
+
+if __name__ == '__main__':
+    main()
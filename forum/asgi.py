@@ -2,6 +2,8 @@
 ASGI config for forum project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP is handled by Django with async views for the read-heavy pages,
+WebSocket connections by ``base.realtime``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +11,48 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'forum.settings')
+os.environ.setdefault('FORUM_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+
+class ForumASGIHandler(ASGIHandler):
+    """
+    Django 3.2 iterates streaming responses inside the event loop, where their queries are not allowed.
+    Here every part is produced in the thread the sync view ran in, like under WSGI.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [(header.encode('ascii'), value.encode('latin1')) for header, value in response.items()]
+        headers += [(b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+                    for cookie in response.cookies.values()]
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        parts = iter(response)
+        next_part = sync_to_async(lambda: next(parts, None), thread_sensitive=True)
+        while True:
+            part = await next_part()
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+django.setup(set_prefix=False)
+django_application = ForumASGIHandler()
+
+# Imported after the apps registry is ready
+from base.realtime import websocket_application
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from django.urls import path, include
+
+# URLconf of the ASGI application, see ASYNC_VIEWS in settings
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('base.async_urls')),
+]
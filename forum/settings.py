@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'base.User'
 
 MIDDLEWARE = [
+    'base.performance.performance_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,11 +54,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'forum.urls'
+# forum.asgi serves the read-heavy pages with async views
+ASYNC_VIEWS = os.environ.get('FORUM_ASYNC_VIEWS') == '1'
+
+ROOT_URLCONF = 'forum.async_urls' if ASYNC_VIEWS else 'forum.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates measuring render time for base.performance
+        'BACKEND': 'base.performance.TimedDjangoTemplates',
         'DIRS': [
             #BASE_DIR / 'templates',
         ],
@@ -67,6 +73,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'base.context_processors.notifications',
             ],
         },
     },
@@ -78,13 +85,118 @@ WSGI_APPLICATION = 'forum.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Configured with environment variables:
+#   FORUM_DB_ENGINE           sqlite (default) or postgresql
+#   FORUM_DB_NAME             file of the SQLite database, or PostgreSQL database name
+#   FORUM_DB_USER, FORUM_DB_PASSWORD, FORUM_DB_HOST, FORUM_DB_PORT
+#   FORUM_DB_CONN_MAX_AGE     seconds a connection is kept between requests, 0 closes it after every request
+#   FORUM_DB_HEALTH_CHECKS    1 (default) tests persistent connections before reusing them
+#   FORUM_DB_POOL_SIZE        PostgreSQL only, connections per process shared by its threads (base.backends.pool);
+#                             with a pool, connections go back to it after every request
+#   FORUM_DB_POOL_TIMEOUT     seconds a request waits for a free pooled connection
+# The Server-Timing header and `manage.py performance_report` show the time spent connecting per request.
+
+DATABASE_ENGINE = os.environ.get('FORUM_DB_ENGINE', 'sqlite')
+
+DATABASE_CONN_MAX_AGE = int(os.environ.get('FORUM_DB_CONN_MAX_AGE', 60))
+
+DATABASE_HEALTH_CHECKS = os.environ.get('FORUM_DB_HEALTH_CHECKS', '1') == '1'
+
+DATABASE_POOL_SIZE = int(os.environ.get('FORUM_DB_POOL_SIZE', 0))
+
+DATABASE_POOL_TIMEOUT = float(os.environ.get('FORUM_DB_POOL_TIMEOUT', 10))
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'base.backends.postgresql',
+            'NAME': os.environ.get('FORUM_DB_NAME', 'forum'),
+            'USER': os.environ.get('FORUM_DB_USER', ''),
+            'PASSWORD': os.environ.get('FORUM_DB_PASSWORD', ''),
+            'HOST': os.environ.get('FORUM_DB_HOST', ''),
+            'PORT': os.environ.get('FORUM_DB_PORT', ''),
+            'CONN_MAX_AGE': 0 if DATABASE_POOL_SIZE else DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DATABASE_HEALTH_CHECKS,
+            'OPTIONS': {
+                'pool': {'size': DATABASE_POOL_SIZE, 'timeout': DATABASE_POOL_TIMEOUT},
+            } if DATABASE_POOL_SIZE else {},
+        },
+    }
+
+    DATABASE_ROUTERS = []
+else:
+    # A single writer connection and a read-only one to the same file, see base.routers.
+    # WAL lets readers work while a write is in progress, IMMEDIATE transactions wait
+    # for the write lock (busy_timeout) instead of failing with "database is locked".
+
+    SQLITE_PRAGMAS = 'PRAGMA synchronous=NORMAL; PRAGMA mmap_size=268435456; PRAGMA cache_size=-32000; ' \
+                     'PRAGMA busy_timeout=5000'
+
+    SQLITE_PATH = os.environ.get('FORUM_DB_NAME') or BASE_DIR / 'db.sqlite3'
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'base.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DATABASE_HEALTH_CHECKS,
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; ' + SQLITE_PRAGMAS,
+                'transaction_mode': 'IMMEDIATE',
+            },
+        },
+        'reader': {
+            'ENGINE': 'base.backends.sqlite3',
+            'NAME': 'file:%s?mode=ro' % SQLITE_PATH,
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DATABASE_HEALTH_CHECKS,
+            'OPTIONS': {
+                'init_command': SQLITE_PRAGMAS,
+            },
+            'TEST': {
+                'MIRROR': 'default',
+            },
+        },
     }
+
+    DATABASE_ROUTERS = ['base.routers.ReadWriteRouter']
+
+
+# Sessions and the logged in user are read from the cache instead of the database on every request.
+# FORUM_SESSION_ENGINE selects the session backend of django.contrib.sessions:
+#   cached_db        (default) cache, with the database as the fallback and durable copy
+#   cache            cache only, sessions are lost with the cache
+#   signed_cookies   session data kept by the browser, nothing stored on the server
+#   db               database only
+# With several processes, the cache and cached_db engines and the user cache need a shared cache (not LocMem).
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get('FORUM_SESSION_ENGINE', 'cached_db')
+
+AUTHENTICATION_BACKENDS = ['base.auth.CachedModelBackend']
+
+USER_CACHE_TTL = 300
+
+# Ids of the restricted topics a user is whitelisted for, and of all restricted topics, are cached and dropped
+# when whitelists or topics change. These decide access: the drop only reaches other processes through a shared
+# cache, with the default per-process LocMem cache they keep the old ids until the TTL, so it stays a few seconds.
+# Raise it only with a shared cache.
+
+TOPIC_WHITELIST_TTL = 5
+
+# Token buckets of base.ratelimit, scope: (requests, seconds) allows bursts of `requests` refilled over `seconds`.
+# Logged in users are limited by id, anonymous clients by IP address. Scopes missing here are not limited.
+# Buckets live in the RATE_LIMIT_CACHE cache, shared by all processes unless it is LocMem, or in
+# process memory with None.
+
+RATE_LIMITS = {
+    'post': (20, 60),
+    'vote': (60, 60),
+    'room': (10, 3600),
+    'login': (10, 300),
 }
 
+RATE_LIMIT_CACHE = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -128,6 +240,109 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 
+# Popular rooms leaderboard
+# Rooms are ranked by participants / (hours since last activity + 2) ** gravity
+
+POPULAR_ROOMS_TTL = 300
+
+POPULAR_ROOMS_CANDIDATES = 200
+
+POPULAR_ROOMS_GRAVITY = 1.5
+
+# Live room updates over WebSockets (served by forum.asgi)
+# base.realtime.InProcessBroadcaster works within a single ASGI process,
+# base.realtime.RedisBroadcaster (OPTIONS: url, prefix) shares events between processes.
+# Both take queue_size, the events queued per socket before the oldest ones are dropped (100)
+
+REALTIME_BROADCASTER = {
+    'BACKEND': 'base.realtime.InProcessBroadcaster',
+}
+
+# Room views are written in batches, after at most FLUSH_INTERVAL seconds
+# or once MAX_PENDING distinct views are waiting
+
+VIEW_TRACKING_FLUSH_INTERVAL = 5
+
+VIEW_TRACKING_MAX_PENDING = 500
+
+# Flush pending room views from a timer thread too, so the interval holds when no request comes,
+# and when the process exits. The tests (base.tests.runner) and benchmarks turn it off, views of
+# a finished test would be written to whatever database is configured by then
+
+VIEW_TRACKING_FLUSH_THREAD = os.environ.get('FORUM_VIEW_TRACKING_FLUSH_THREAD', '1') == '1'
+
+TEST_RUNNER = 'base.tests.runner.TestRunner'
+
+# Number of threads in a room shown by the page-number pagination is cached
+
+ROOM_THREAD_COUNT_TTL = 600
+
+# Room and topic pages answer conditional GETs (ETag, Last-Modified, see base.conditional),
+# validators change at least this often so relative times and popular rooms stay current
+
+CONDITIONAL_GET_INTERVAL = 60
+
+# Answers of a thread are loaded on demand from message-replies-page, this many per request
+
+MESSAGE_REPLIES_PER_PAGE = 20
+
+# Entries of the activity feed of profile pages (base.activity) shown per page
+
+ACTIVITY_PER_PAGE = 20
+
+# Rendered room, topic and message cards are cached under keys that change with their content (base.fragments)
+
+CARD_CACHE_TTL = 3600
+
+# Authors of threads and of their answers are notified of new answers. With NOTIFICATIONS_DIGEST
+# answers to a thread are added to the unread notification of it, instead of one notification each.
+# The unread count of the navbar is cached until the user's notifications change.
+
+NOTIFICATIONS_DIGEST = True
+
+NOTIFICATIONS_COUNT_TTL = 3600
+
+NOTIFICATIONS_PER_PAGE = 50
+
+# Background tasks of base.tasks: side effects of writes are queued as Job rows and run by
+# `manage.py run_worker`, failing jobs are retried TASK_RETRIES times after RETRY_DELAY * 2 ** attempt seconds.
+# A job still running after TASK_TIMEOUT seconds is given to another worker.
+# FORUM_TASKS_EAGER=0 enables the queue, by default tasks run right away in the request that queued them.
+
+TASKS_EAGER = os.environ.get('FORUM_TASKS_EAGER', '1') == '1'
+
+TASK_RETRIES = 3
+
+TASK_RETRY_DELAY = 10
+
+TASK_TIMEOUT = 300
+
+TASK_BATCH_SIZE = 20
+
+TASK_POLL_INTERVAL = 1
+
+# Jobs waiting longer than this many seconds are logged as warnings
+
+TASK_LAG_WARNING = 60
+
+# Per-view metrics of base.performance: percentiles over the last WINDOW requests of every URL name,
+# published to the cache every PUBLISH_INTERVAL seconds for `manage.py performance_report`.
+# Requests running more queries than the budget of their view (None for no budget) are logged
+# and send base.performance.query_budget_exceeded.
+
+PERFORMANCE_WINDOW = 1000
+
+PERFORMANCE_PUBLISH_INTERVAL = 30
+
+PERFORMANCE_SNAPSHOT_TTL = 3600
+
+PERFORMANCE_SERVER_TIMING = os.environ.get('FORUM_SERVER_TIMING') == '1'
+
+PERFORMANCE_QUERY_BUDGET = 20
+
+PERFORMANCE_QUERY_BUDGETS = {}
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
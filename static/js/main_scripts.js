@@ -25,8 +25,25 @@ function clear_answer_to() {
     document.getElementById('container_for_answer').style.display = 'none';
 }
 
+function load_answers(id, url) {
+    // Appends a page of answers (message-replies-page) to the thread, replacing its "More answers" button
+    fetch(url)
+        .then(response => response.ok ? response.text() : Promise.reject(response.status))
+        .then(html => {
+            const more = document.getElementById('answers_more_' + id);
+            if (more) more.remove();
+            document.getElementById('answers_' + id).insertAdjacentHTML('beforeend', html);
+        })
+        .catch(() => { delete document.getElementById('answers_' + id).dataset.loaded; });
+}
+
 function show_answers(id) {
-    document.getElementById("answers_"+id).style.display = 'block';
+    const answers = document.getElementById("answers_"+id);
+    if (!answers.dataset.loaded) {
+        answers.dataset.loaded = '1';
+        load_answers(id, answers.dataset.url);
+    }
+    answers.style.display = 'block';
     document.getElementById("answers_button_show_"+id).style.display = 'none';
     document.getElementById("answers_button_hide_"+id).style.display = 'block';
 }
@@ -35,4 +52,44 @@ function hide_answers(id) {
     document.getElementById("answers_"+id).style.display = 'none';
     document.getElementById("answers_button_show_"+id).style.display = 'block';
     document.getElementById("answers_button_hide_"+id).style.display = 'none';
+}
+
+function show_history(id, url) {
+    // Earlier versions of an edited message (message-history-page), loaded on the first click
+    const history = document.getElementById('history_' + id);
+    if (history.dataset.loaded) {
+        history.style.display = history.style.display === 'none' ? 'block' : 'none';
+        return;
+    }
+    fetch(url)
+        .then(response => response.ok ? response.text() : Promise.reject(response.status))
+        .then(html => {
+            history.dataset.loaded = '1';
+            history.innerHTML = html;
+            history.style.display = 'block';
+        });
+}
+
+function show_room_update(text) {
+    document.getElementById('room_updates_text').textContent = text;
+    document.getElementById('room_updates').style.display = 'block';
+}
+
+function connect_room(id) {
+    if (!window.WebSocket) return;
+    const protocol = location.protocol === 'https:' ? 'wss://' : 'ws://';
+    const socket = new WebSocket(protocol + location.host + '/ws/room/' + id);
+    socket.onmessage = function (event) {
+        const data = JSON.parse(event.data);
+        if (data.type === 'rating') {
+            const pluses = document.getElementById('message_' + data.id + '_pluses');
+            const minuses = document.getElementById('message_' + data.id + '_minuses');
+            if (pluses) pluses.textContent = '+' + data.plus_count;
+            if (minuses) minuses.textContent = '-' + data.minus_count;
+        } else if (data.type === 'message') {
+            show_room_update('New messages, click to reload');
+        } else if (data.type === 'status') {
+            show_room_update(data.is_closed ? 'The room was closed, click to reload' : 'The room was opened, click to reload');
+        }
+    };
 }
\ No newline at end of file